@@ -0,0 +1,30 @@
+"""Running averages and periodic exploration shared by the self-tuning components.
+
+The model router, the generation mode selector and the token budgeter all
+learn from live calls the same way: every measurement moves an exponential
+moving average by LEARNING_RATE, and a choice made against an option because
+of its statistics still tries that option every EXPLORE_INTERVAL-th time, so
+the statistics can recover once it improves.
+"""
+from typing import Dict, Hashable, Optional
+
+# Weight of a new measurement in the running averages
+LEARNING_RATE = 0.2
+# Every this many choices made from the statistics, the other option is tried again
+EXPLORE_INTERVAL = 20
+
+def ema(current: Optional[float], value: float, rate: float = LEARNING_RATE) -> float:
+    """``current`` moved towards ``value``; the first measurement (``current`` None) is taken as is."""
+    return value if current is None else current + rate * (value - current)
+
+class Explorer:
+    """Counts choices per key and tells when the next one should explore."""
+
+    def __init__(self, interval: int = EXPLORE_INTERVAL):
+        self.interval = interval
+        self._choices: Dict[Hashable, int] = {}
+
+    def due(self, key: Hashable) -> bool:
+        """Count a choice for ``key``; True for every ``interval``-th one."""
+        self._choices[key] = self._choices.get(key, 0) + 1
+        return self._choices[key] % self.interval == 0
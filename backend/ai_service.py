@@ -1,78 +1,208 @@
 import ollama
-import json
 from loguru import logger
-from typing import Dict, List, Optional
-from config import AI_MODEL, OLLAMA_HOST, MAX_TOKENS, TEMPERATURE
+from typing import Dict, List, Optional, Tuple
+from config import (
+    AI_MODEL, OLLAMA_HOST, TEMPERATURE, AI_RECORD_DIR, MAX_LESSONS_PER_MODULE, MIN_LESSONS_PER_MODULE
+)
+from course_planner import DAY_PREFIX
+from deadline import Deadline, DeadlineExceeded
 from json_utils import parse_json_response, format_course_response
+from tracing import TRACER
+from ollama_replay import Recorder
+from section_cache import SECTION_CACHE
+from token_budget import TOKEN_BUDGETER, is_truncated, section_units
+from structured_output import OUTPUT_MODE_SELECTOR, build_prompt, is_format_unsupported, request_format
+from hedging import HEDGER
+from model_router import MODEL_ROUTER
+from metrics import (
+    AI_CANCELLATIONS, AI_GENERATE_SECONDS, AI_RETRIES, AI_FAILURES, AI_JSON_ATTEMPTS, AI_JSON_PARSE_FAILURES,
+    AI_MODEL_FALLBACKS, JSON_PARSE_SECONDS
+)
+
+# Course sections, each generated by its own LLM call or all by one (see generation_mode)
+COURSE_SECTIONS = ("modules", "tasks", "quizzes", "practice_plan")
+# Sections of a two-phase course: an outline replaces the modules and lesson bodies come later
+OUTLINE_SECTIONS = ("outline", "tasks", "quizzes", "practice_plan")
+
+def combined_section(sections: Tuple[str, ...]) -> str:
+    """Name under which several sections generated by one call are timed and counted."""
+    return "+".join(sections)
 
 class AIServiceError(Exception):
     """Custom exception for AI service errors"""
     pass
 
+_clients: Dict[str, ollama.AsyncClient] = {}
+
+# Running estimate of how long one generation of each section takes, used to
+# decide whether a retry still fits in a request's remaining time
+_expected_seconds: Dict[str, float] = {}
+
+def expected_seconds(section: str) -> float:
+    return _expected_seconds.get(section, 0.0)
+
+def _observe_seconds(section: str, seconds: float) -> None:
+    current = _expected_seconds.get(section)
+    _expected_seconds[section] = seconds if current is None else current + 0.2 * (seconds - current)
+
+def is_valid_response(response, expect_json: bool, num_predict: Optional[int]) -> bool:
+    """Whether a response is complete and, for JSON sections, parses."""
+    if is_truncated(response, num_predict):
+        return False
+    if not expect_json:
+        return True
+    try:
+        return bool(parse_json_response(response["response"]))
+    except Exception:
+        return False
+
+def get_client(host: str) -> ollama.AsyncClient:
+    """Return a shared async Ollama client for the given host."""
+    client = _clients.get(host)
+    if client is None:
+        client = _clients[host] = ollama.AsyncClient(host=host)
+    return client
+
 class AIService:
     def __init__(self):
         self.model = AI_MODEL
         self.host = OLLAMA_HOST
+        self.client = get_client(self.host)
+        self.recorder = Recorder(AI_RECORD_DIR) if AI_RECORD_DIR else None
+        self.budgeter = TOKEN_BUDGETER
+        self.output_modes = OUTPUT_MODE_SELECTOR
+        self.cache = SECTION_CACHE
+        self.router = MODEL_ROUTER
+        self.hedger = HEDGER
         
-    async def generate_content(self, prompt: str, expect_json: bool = False, max_retries: int = 3) -> Optional[str]:
-        """Generate content using Ollama with specified model."""
-        for attempt in range(max_retries):
+    async def _call_model(self, prompt: str, section: str, options: Dict, expect_json: bool, model: str,
+                          host: Optional[str] = None):
+        """Send one generate request, falling back to a weaker output mode if the format is rejected.
+
+        Returns the Ollama response, the prompt actually sent and the output mode used.
+        """
+        client = self.client if host in (None, self.host) else get_client(host)
+        while True:
+            mode = self.output_modes.mode_for(model) if expect_json else "text"
+            request_prompt = build_prompt(prompt, mode) if expect_json else prompt
             try:
-                if expect_json:
-                    prompt = f"""
-                    You are a JSON generator. Your task is to generate valid JSON based on the following requirements.
-                    Rules:
-                    1. Return ONLY valid JSON, no other text
-                    2. Include all necessary commas between elements
-                    3. Format the JSON properly with correct indentation
-                    4. Do not include any explanations or markdown
-                    5. Do not use code blocks or ```json markers
-                    6. Ensure all JSON is properly escaped
-                    7. Add commas after every object in arrays
-                    8. Add commas after every key-value pair except the last one in an object
-                    
-                    Requirements:
-                    {prompt}
-                    """
-                
-                response = ollama.generate(
-                    model=self.model,
-                    prompt=prompt,
+                response = await client.generate(
+                    model=model,
+                    prompt=request_prompt,
                     stream=False,
-                    options={
+                    format=request_format(section, mode) if expect_json else "",
+                    options=options
+                )
+                return response, request_prompt, mode
+            except ollama.ResponseError as e:
+                if mode in ("schema", "json") and is_format_unsupported(e):
+                    self.output_modes.downgrade(model, mode)
+                    continue
+                raise
+
+    async def generate_content(self, prompt: str, expect_json: bool = False, max_retries: int = 3,
+                               section: str = "content", units: int = 1,
+                               deadline: Optional[Deadline] = None,
+                               num_predict: Optional[int] = None,
+                               level: Optional[str] = None, days: Optional[int] = None) -> Optional[str]:
+        """Generate content using Ollama with the model the router picks.
+
+        The router chooses a model tier from the section, ``level`` and ``days``
+        and the models' live statistics; a failed attempt is retried on the
+        other tier. Output length is limited to the section's token budget for
+        ``units`` units, or to ``num_predict`` if given; a JSON failure caused
+        by hitting that limit is retried with a larger one. JSON sections use
+        the strongest output mode the model supports (schema-constrained,
+        JSON-constrained, then prompt-only).
+
+        A call still running after its usual duration is hedged with a
+        duplicate (see hedging). An in-flight generation is cancelled when
+        ``deadline`` passes or is cancelled, and a failed attempt is only
+        retried if the deadline leaves enough time for another one.
+        """
+        num_predict = num_predict or self.budgeter.budget(section, units)
+        deadline = deadline or Deadline()
+        models = self.router.route(section, level, days)
+
+        with TRACER.span("AIService.generate_content", section=section):
+            model = models[0]
+            for attempt in range(max_retries):
+                if attempt:
+                    AI_RETRIES.inc(section=section)
+                    failed, model = model, models[min(attempt, len(models) - 1)]
+                    if model != failed:
+                        AI_MODEL_FALLBACKS.inc(from_model=failed, to_model=model)
+                        logger.warning("Retrying {} on {} after {} failed", section, model, failed)
+                truncated = False
+                mode = "text"
+                seconds = None
+                outcome = "error"
+                try:
+                    options = {
                         "temperature": TEMPERATURE,
-                        "max_tokens": MAX_TOKENS
+                        "num_predict": num_predict
                     }
-                )
+                    with TRACER.span("ollama.generate", model=model, attempt=attempt + 1,
+                                     num_predict=num_predict) as span, \
+                            AI_GENERATE_SECONDS.time(section=section) as timer:
+                        response, request_prompt, mode = await deadline.run(self.hedger.run(
+                            section, units, self.host,
+                            lambda host: self._call_model(prompt, section, options, expect_json, model, host),
+                            lambda result: is_valid_response(result[0], expect_json, num_predict),
+                        ))
+                        span.set(output_mode=mode)
+                    seconds = timer.elapsed
+                    _observe_seconds(section, seconds)
+                    if self.recorder:
+                        await self.recorder.record(model, request_prompt, options, response, section, seconds)
+                    truncated = is_truncated(response, num_predict)
+                    if not truncated:
+                        self.budgeter.observe(section, units, response.get("eval_count"))
                 
-                if expect_json:
-                    try:
-                        result = parse_json_response(response['response'])
+                    if expect_json:
+                        AI_JSON_ATTEMPTS.inc(section=section, mode=mode)
+                        outcome = "truncated" if truncated else "invalid_json"
+                        try:
+                            with TRACER.span("parse_json_response"), JSON_PARSE_SECONDS.time():
+                                result = parse_json_response(response['response'])
+                        except Exception:
+                            AI_JSON_PARSE_FAILURES.inc(section=section, mode=mode)
+                            raise
                         if result:
+                            outcome = "ok"
                             return result
                         raise AIServiceError("Failed to parse JSON response")
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON parsing error: {e}")
-                        if attempt < max_retries - 1:
-                            logger.info(f"Retrying JSON generation (attempt {attempt + 2}/{max_retries})")
-                            continue
-                        raise AIServiceError("Failed to generate valid JSON after multiple attempts")
                 
-                return response['response']
+                    outcome = "ok"
+                    return response['response']
                 
-            except Exception as e:
-                logger.error(f"Error generating content with Ollama (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    continue
-                raise AIServiceError(f"Failed to generate content: {str(e)}")
+                except DeadlineExceeded as e:
+                    outcome = "cancelled"
+                    AI_CANCELLATIONS.inc(section=section, reason=str(e))
+                    logger.warning("Cancelled {} generation: {}", section, e)
+                    raise AIServiceError(f"Generation cancelled: {e}")
+                except Exception as e:
+                    logger.error("Error generating content with Ollama (attempt {}/{}): {}", attempt + 1, max_retries, e)
+                    if truncated:
+                        num_predict = self.budgeter.grow(section, num_predict)
+                        logger.warning("Section {} hit its token limit, retrying with num_predict={}", section, num_predict)
+                    if attempt < max_retries - 1:
+                        if deadline.allows(expected_seconds(section)):
+                            continue
+                        AI_CANCELLATIONS.inc(section=section, reason="no_time_to_retry")
+                        logger.warning("Not retrying {}: {:.1f}s left, a generation takes about {:.1f}s",
+                                       section, deadline.remaining(), expected_seconds(section))
+                    AI_FAILURES.inc(section=section)
+                    raise AIServiceError(f"Failed to generate content: {str(e)}")
+                finally:
+                    self.router.observe(model, section, outcome, seconds, units)
                 
-        return None
+            return None
 
-    async def generate_course_content(self, topic: str, level: str, days: int) -> Dict:
-        """Generate a complete course structure with content."""
-        try:
-            # Generate modules with lessons
-            modules_prompt = f"""
+    def section_prompt(self, section: str, topic: str, level: str, days: int) -> str:
+        """Build the generation prompt for one course section."""
+        if section == "modules":
+            return f"""
             Create a JSON object representing a {level} level course on {topic} with {days} days of content.
             The JSON must follow this exact structure, including all commas:
             {{
@@ -99,13 +229,8 @@ class AIService:
                 ]
             }}
             """
-            
-            modules_content = await self.generate_content(modules_prompt, expect_json=True)
-            if not modules_content:
-                raise AIServiceError("Failed to generate modules content")
-            
-            # Generate daily tasks
-            tasks_prompt = f"""
+        if section == "tasks":
+            return f"""
             Create a JSON array of {days} daily tasks for learning {topic} at {level} level.
             Format must be exactly:
             {{
@@ -116,13 +241,8 @@ class AIService:
                 ]
             }}
             """
-            
-            tasks = await self.generate_content(tasks_prompt, expect_json=True)
-            if not tasks:
-                raise AIServiceError("Failed to generate tasks")
-            
-            # Generate quizzes
-            quizzes_prompt = f"""
+        if section == "quizzes":
+            return f"""
             Create a JSON object with 5 quiz questions for {topic} at {level} level.
             Format must be exactly:
             {{
@@ -140,13 +260,8 @@ class AIService:
                 ]
             }}
             """
-            
-            quizzes = await self.generate_content(quizzes_prompt, expect_json=True)
-            if not quizzes:
-                raise AIServiceError("Failed to generate quizzes")
-            
-            # Generate practice plan
-            practice_prompt = f"""
+        if section == "practice_plan":
+            return f"""
             Create a JSON object with a practice plan for {topic} at {level} level.
             Format must be exactly:
             {{
@@ -157,37 +272,208 @@ class AIService:
                 ]
             }}
             """
-            
-            practice_plan = await self.generate_content(practice_prompt, expect_json=True)
-            if not practice_plan:
-                raise AIServiceError("Failed to generate practice plan")
-            
-            # Combine all content
-            course_content = {
-                "topic": topic,
-                "level": level,
-                "days": days,
-                "modules": modules_content.get("modules", []),
-                "tasks": tasks.get("tasks", []),
-                "quizzes": quizzes.get("quizzes", []),
-                "practice_plan": practice_plan.get("practice_plan", [])
-            }
-            
-            # Validate the combined content
-            if not course_content["modules"]:
-                raise AIServiceError("No modules were generated")
-            if not course_content["tasks"]:
-                raise AIServiceError("No tasks were generated")
-            if not course_content["quizzes"]:
-                raise AIServiceError("No quizzes were generated")
-            if not course_content["practice_plan"]:
-                raise AIServiceError("No practice plan was generated")
-            
+        if section == "outline":
+            return f"""
+            Create a JSON outline of a {level} level course on {topic} with {days} days of content.
+            Give one module per day with {MIN_LESSONS_PER_MODULE}-{MAX_LESSONS_PER_MODULE} lesson titles each; do not write the lessons themselves.
+            Format must be exactly:
+            {{
+                "outline": [
+                    {{
+                        "name": "Day 1: Module Name",
+                        "lessons": [
+                            {{"title": "Lesson Title"}},
+                            {{"title": "Another Lesson Title"}}
+                        ]
+                    }}
+                ]
+            }}
+            """
+        raise AIServiceError(f"Unknown course section: {section}")
+
+    def course_prompt(self, sections: Tuple[str, ...], topic: str, level: str, days: int) -> str:
+        """Build one prompt asking for several course sections in a single JSON object."""
+        keys = ", ".join(f'"{section}"' for section in sections)
+        parts = "".join(self.section_prompt(section, topic, level, days) for section in sections)
+        return f"""
+        Create a single JSON object for a {level} level course on {topic} with {days} days of content.
+        The object must have exactly the keys {keys}, each filled in as described below.
+        {parts}
+        """
+
+    def extension_prompt(self, section: str, topic: str, level: str, days: int, names: List[str]) -> str:
+        """Build the prompt for the days after ``names``, the modules a shorter version of the course has."""
+        first_day, missing = len(names) + 1, days - len(names)
+        # Stored names usually carry their own "Day N:" label already
+        outline = "\n        ".join(f"Day {day}: {DAY_PREFIX.sub('', name).strip() or name.strip()}"
+                                     for day, name in enumerate(names, start=1))
+        new_days = f"day {days}" if missing == 1 else f"days {first_day} to {days}"
+        noun = ("module" if section == "modules" else "daily task") + ("" if missing == 1 else "s")
+        example_days = range(first_day, min(days, first_day + 1) + 1)
+        if section == "modules":
+            example = ",".join(f"""
+                    {{
+                        "name": "Day {day}: Module Name",
+                        "lessons": [
+                            {{
+                                "title": "Lesson Title",
+                                "explanation": "Detailed explanation (5-10 lines)",
+                                "content": "Detailed lesson content",
+                                "coding_task": "Specific coding task with instructions",
+                                "key_takeaway": "Key points to remember"
+                            }}
+                        ]
+                    }}""" for day in example_days)
+        else:
+            example = ",".join(f"""
+                    "Day {day}: Detailed task description\"""" for day in example_days)
+        return f"""
+        A {level} level course on {topic} is being extended from {len(names)} to {days} days.
+        The existing days cover:
+        {outline}
+        Write only the new {new_days}: exactly {missing} {noun}, one per day, without repeating those topics.
+        Format must be exactly:
+        {{
+            "{section}": [{example}
+            ]
+        }}
+        """
+
+    def lesson_prompt(self, topic: str, level: str, module_name: str, title: str, titles: List[str]) -> str:
+        """Build the prompt for one lesson body of a course outline."""
+        others = ", ".join(f'"{other}"' for other in titles if other != title) or "none"
+        return f"""
+        Write the lesson "{title}" of the module "{module_name}" in a {level} level course on {topic}.
+        Other lessons in this module (do not repeat them): {others}.
+        Format must be exactly:
+        {{
+            "lesson": {{
+                "title": "{title}",
+                "explanation": "Detailed explanation (5-10 lines)",
+                "content": "Detailed lesson content",
+                "coding_task": "Specific coding task with instructions",
+                "key_takeaway": "Key points to remember"
+            }}
+        }}
+        """
+
+    async def generate_lesson(self, topic: str, level: str, module_name: str, title: str, titles: List[str],
+                              deadline: Optional[Deadline] = None) -> Dict:
+        """Generate the body of one lesson from a course outline."""
+        prompt = self.lesson_prompt(topic, level, module_name, title, titles)
+        content = await self.generate_content(prompt, expect_json=True, section="lesson", deadline=deadline,
+                                              level=level)
+        lesson = content.get("lesson") if isinstance(content, dict) else None
+        if not isinstance(lesson, dict):
+            raise AIServiceError(f"No lesson was generated for {title}")
+        return lesson
+
+    async def generate_extension(self, section: str, topic: str, level: str, days: int, names: List[str],
+                                 deadline: Optional[Deadline] = None) -> List:
+        """Generate the modules or tasks of the days after ``names`` for a ``days``-day course."""
+        prompt = self.extension_prompt(section, topic, level, days, names)
+        content = await self.generate_content(prompt, expect_json=True, section=section,
+                                              units=section_units(section, days - len(names)), deadline=deadline,
+                                              level=level, days=days)
+        items = content.get(section) if isinstance(content, dict) else None
+        if not items or not isinstance(items, list):
+            raise AIServiceError(f"No {section} were generated for days {len(names) + 1}-{days}")
+        return items
+
+    async def generate_section(self, section: str, topic: str, level: str, days: int,
+                               use_cache: bool = True, deadline: Optional[Deadline] = None) -> List:
+        """Generate one course section and return its list of items.
+
+        Cached sections are returned without calling the model unless
+        ``use_cache`` is False; valid generated sections are always cached.
+        """
+        if use_cache:
+            cached = self.cache.get(section, topic, level, days)
+            if cached is not None:
+                logger.info("Using cached {} section for {}", section, topic)
+                return cached
+        prompt = self.section_prompt(section, topic, level, days)
+        content = await self.generate_content(prompt, expect_json=True, section=section,
+                                              units=section_units(section, days), deadline=deadline,
+                                              level=level, days=days)
+        items = content.get(section) if isinstance(content, dict) else None
+        if not items or not isinstance(items, list):
+            raise AIServiceError(f"No {section} were generated")
+        self.cache.put(section, topic, level, days, items)
+        return items
+
+    async def generate_course_content(self, topic: str, level: str, days: int,
+                                      deadline: Optional[Deadline] = None,
+                                      sections: Tuple[str, ...] = COURSE_SECTIONS) -> Dict:
+        """Generate every course section, keeping whatever succeeds.
+
+        Sections that could not be generated (or were cut off by ``deadline``)
+        are set to None and their error is recorded under ``failures`` so the
+        caller can fill them in. Pass ``sections=OUTLINE_SECTIONS`` for the
+        first phase of a two-phase course.
+        """
+        course_content = self._content_from_cache(topic, level, days, sections)
+        for section in sections:
+            if section in course_content:
+                continue
+            try:
+                course_content[section] = await self.generate_section(section, topic, level, days,
+                                                                      use_cache=False, deadline=deadline)
+            except AIServiceError as e:
+                logger.error("AI service error in {}: {}", section, e)
+                course_content[section] = None
+                course_content["failures"][section] = str(e)
+            except Exception as e:
+                logger.error("Unexpected error generating {}: {}", section, e)
+                course_content[section] = None
+                course_content["failures"][section] = f"Failed to generate {section}: {str(e)}"
+        return course_content
+
+    def _content_from_cache(self, topic: str, level: str, days: int, sections: Tuple[str, ...]) -> Dict:
+        """Course content holding the cached sections, which are also listed under ``cached``."""
+        course_content = {"topic": topic, "level": level, "days": days, "failures": {}, "cached": []}
+        for section in sections:
+            cached = self.cache.get(section, topic, level, days)
+            if cached is not None:
+                logger.info("Using cached {} section for {}", section, topic)
+                course_content[section] = cached
+                course_content["cached"].append(section)
+        return course_content
+
+    async def generate_course_combined(self, topic: str, level: str, days: int,
+                                       deadline: Optional[Deadline] = None,
+                                       sections: Tuple[str, ...] = COURSE_SECTIONS) -> Dict:
+        """Generate every uncached section with a single LLM call.
+
+        Returns the same shape as generate_course_content. One prompt pays the
+        prompt evaluation and model setup once instead of per section, at the
+        price of one long output whose failure loses every section at once.
+        """
+        course_content = self._content_from_cache(topic, level, days, sections)
+        missing = tuple(section for section in sections if section not in course_content)
+        if not missing:
             return course_content
-            
-        except AIServiceError as e:
-            logger.error(f"AI service error: {e}")
-            raise
+        combined = combined_section(missing)
+        units = {section: section_units(section, days) for section in missing}
+        num_predict = min(self.budgeter.cap, sum(self.budgeter.budget(section, units[section]) for section in missing))
+        error = ""
+        try:
+            content = await self.generate_content(self.course_prompt(missing, topic, level, days),
+                                                  expect_json=True, section=combined,
+                                                  units=sum(units.values()), deadline=deadline,
+                                                  num_predict=num_predict, level=level, days=days)
+            if not isinstance(content, dict):
+                raise AIServiceError("No course sections were generated")
         except Exception as e:
-            logger.error(f"Unexpected error in course content generation: {e}")
-            raise AIServiceError(f"Failed to generate course content: {str(e)}")
+            logger.error("AI service error in {}: {}", combined, e)
+            content = {}
+            error = str(e)
+        for section in missing:
+            items = content.get(section)
+            if items and isinstance(items, list):
+                course_content[section] = items
+                self.cache.put(section, topic, level, days, items)
+            else:
+                course_content[section] = None
+                course_content["failures"][section] = error or f"No {section} were generated"
+        return course_content
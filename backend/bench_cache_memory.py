@@ -0,0 +1,92 @@
+"""Memory per cached course: pydantic models and dicts versus SectionCache's packed sections.
+
+Usage:
+    python bench_cache_memory.py [--courses 1000] [--days 7] [--topics 50] [--output run.json]
+
+Courses are built for a mix of topics and levels the way a busy cache would
+hold them. Sizes are deep sizes with objects shared between courses counted
+once, cross-checked with tracemalloc.
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+
+from bench_utils import make_course_data, new_run, save_run
+from compact_course import memory_per_course, pack_section, unpack_section
+from course_generator import generate_course_rule_based
+from models import CourseResponse
+
+LEVELS = ("beginner", "intermediate", "advanced")
+SECTIONS = ("modules", "tasks", "quizzes", "practice_plan")
+
+def pack_sections(course: CourseResponse) -> Dict:
+    """The sections of ``course`` in the form SectionCache keeps them."""
+    return {section: pack_section(section, getattr(course, section)) for section in SECTIONS}
+
+def build_courses(count: int, days: int, topics: int) -> List[CourseResponse]:
+    courses = []
+    for i in range(count):
+        topic = f"Topic {i % topics}"
+        level = LEVELS[i % len(LEVELS)]
+        if i % 2:
+            course = generate_course_rule_based(topic, level, days)
+        else:
+            # Round-trip through JSON so equal strings are distinct objects, as they are for LLM output
+            course = CourseResponse(**json.loads(json.dumps(make_course_data(days, topic, level))))
+        courses.append(course)
+    return courses
+
+def traced_bytes(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+def run_suite(count: int, days: int, topics: int) -> Dict:
+    run = new_run("cache_memory")
+    source = [course.json() for course in build_courses(count, days, topics)]
+
+    forms = {
+        "models": lambda: [CourseResponse.parse_raw(raw) for raw in source],
+        "dicts": lambda: [json.loads(raw) for raw in source],
+        "packed": lambda: [pack_sections(CourseResponse.parse_raw(raw)) for raw in source],
+    }
+    for name, build in forms.items():
+        result = memory_per_course(build())
+        result["tracemalloc_bytes_per_course"] = traced_bytes(build) / count
+        run["results"][name] = result
+        print(f"{name:<8} {result['bytes_per_course'] / 1024:9.1f} KiB/course (deep size)  "
+              f"{result['tracemalloc_bytes_per_course'] / 1024:9.1f} KiB/course (tracemalloc)")
+
+    before = run["results"]["models"]["bytes_per_course"]
+    after = run["results"]["packed"]["bytes_per_course"]
+    run["results"]["reduction"] = {"ratio": before / after if after else None}
+    print(f"Packed sections use {after / before:.1%} of the memory of pydantic models")
+
+    course = CourseResponse.parse_raw(source[0])
+    unpacked = {section: unpack_section(section, packed) for section, packed in pack_sections(course).items()}
+    assert CourseResponse(**dict(course.dict(), **unpacked)).dict() == course.dict()
+    return run
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure memory per cached course")
+    parser.add_argument("--courses", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--topics", type=int, default=50, help="Distinct topics among the courses")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    run = run_suite(args.courses, args.days, args.topics)
+    print(f"\nResults written to {save_run(run, args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
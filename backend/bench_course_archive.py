@@ -0,0 +1,113 @@
+"""Compression ratio and single-course read latency of the course archive.
+
+Usage:
+    python bench_course_archive.py [--courses 200] [--days 1,7,14,30] [--output run.json]
+
+Compares one plain JSON file per course, one gzip JSON file per course and
+the dictionary-compressed archive (with and without its dictionary). The
+dictionary is trained on a separate set of courses from the ones stored.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+from typing import Dict, List
+
+from bench_utils import format_seconds, make_course_data, measure, new_run, save_run
+from course_archive import CourseArchive, train_dictionary
+from course_generator import generate_course_rule_based
+
+LEVELS = ("beginner", "intermediate", "advanced")
+TOPICS = ("Python", "C++", "Web Development", "Rust", "SQL", "Go", "Machine Learning", "Docker")
+
+def build_corpus(count: int, days_list: List[int], seed: int) -> List[bytes]:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        topic, level, days = rng.choice(TOPICS), rng.choice(LEVELS), rng.choice(days_list)
+        if i % 2:
+            data = generate_course_rule_based(topic, level, days).dict()
+        else:
+            data = make_course_data(days, topic, level)
+        corpus.append(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    return corpus
+
+def run_suite(count: int, days_list: List[int], repeat: int = 5, min_time: float = 0.2) -> Dict:
+    run = new_run("course_archive")
+    training = build_corpus(count, days_list, seed=1)
+    corpus = build_corpus(count, days_list, seed=2)
+    raw_bytes = sum(len(document) for document in corpus)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_dir, gzip_dir = os.path.join(tmp, "plain"), os.path.join(tmp, "gzip")
+        os.makedirs(plain_dir)
+        os.makedirs(gzip_dir)
+        for i, document in enumerate(corpus):
+            with open(os.path.join(plain_dir, f"{i}.json"), "wb") as f:
+                f.write(document)
+            with gzip.open(os.path.join(gzip_dir, f"{i}.json.gz"), "wb") as f:
+                f.write(document)
+
+        archives = {
+            "archive": CourseArchive(os.path.join(tmp, "courses.cca"), train_dictionary(training)),
+            "archive_no_dictionary": CourseArchive(os.path.join(tmp, "plain.cca"), b""),
+        }
+        for archive in archives.values():
+            for i, document in enumerate(corpus):
+                archive.append(str(i), document)
+
+        sizes = {
+            "plain_json": sum(os.path.getsize(os.path.join(plain_dir, name)) for name in os.listdir(plain_dir)),
+            "gzip_json": sum(os.path.getsize(os.path.join(gzip_dir, name)) for name in os.listdir(gzip_dir)),
+        }
+        for name, archive in archives.items():
+            sizes[name] = archive.stats()["bytes"]
+
+        probe = count // 2
+
+        def read_plain():
+            with open(os.path.join(plain_dir, f"{probe}.json"), "rb") as f:
+                return f.read()
+
+        def read_gzip():
+            with gzip.open(os.path.join(gzip_dir, f"{probe}.json.gz"), "rb") as f:
+                return f.read()
+
+        readers = {
+            "plain_json": read_plain,
+            "gzip_json": read_gzip,
+            "archive": lambda: archives["archive"].get(str(probe)),
+            "archive_no_dictionary": lambda: archives["archive_no_dictionary"].get(str(probe)),
+        }
+        assert all(reader() == corpus[probe] for reader in readers.values())
+
+        for name, reader in readers.items():
+            result = measure(reader, repeat=repeat, min_time=min_time)
+            result["bytes"] = sizes[name]
+            result["ratio"] = raw_bytes / sizes[name]
+            run["results"][name] = result
+            print(f"{name:<22} {sizes[name] / 1024:10.1f} KiB  ratio {result['ratio']:6.2f}x  "
+                  f"read {format_seconds(result['median']):>10}")
+        for archive in archives.values():
+            archive.close()
+    run["results"]["corpus"] = {"courses": count, "raw_bytes": raw_bytes}
+    return run
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the dictionary-compressed course archive")
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--days", default="1,7,14,30", help="Comma-separated course sizes to mix")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    run = run_suite(args.courses, [int(value) for value in args.days.split(",") if value], args.repeat, args.min_time)
+    print(f"\nResults written to {save_run(run, args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
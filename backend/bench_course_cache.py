@@ -0,0 +1,102 @@
+"""Benchmark of shared course cache hits across processes.
+
+Usage:
+    python bench_course_cache.py [--days 1,7,14,30] [--processes 4] [--output run.json]
+                                 [--compare baseline.json] [--threshold 0.10]
+
+A parent process publishes one course per size, then separate reader
+processes (as uvicorn workers would be) time cache hits on them. Serialising
+the course from scratch is measured alongside as the cost a hit avoids.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+from typing import Dict, List
+
+from bench_utils import compare_runs, format_seconds, load_run, make_course_data, measure, new_run, print_comparison, save_run
+from course_cache import SharedCourseCache, course_key
+from fastapi.responses import JSONResponse
+from models import CourseResponse
+
+DEFAULT_DAYS = (1, 7, 14, 30)
+
+def _reader(path: str, keys: List[str], repeat: int, min_time: float, queue) -> None:
+    cache = SharedCourseCache(path)
+    results = {}
+    for key in keys:
+        assert cache.get(key) is not None, f"{key} not visible in reader process"
+        results[key] = measure(lambda: cache.get(key), repeat=repeat, min_time=min_time)
+    cache.close()
+    queue.put(results)
+
+def run_suite(days_list: List[int], processes: int, repeat: int = 5, min_time: float = 0.2) -> Dict:
+    run = new_run("course_cache")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "course_cache.sqlite3")
+        cache = SharedCourseCache(path)
+        keys = {}
+        for days in days_list:
+            course = CourseResponse(**make_course_data(days))
+            body = JSONResponse(content=course.dict()).body
+            keys[days] = course_key(course.topic, course.level, days)
+            cache.put(keys[days], body)
+
+            name = f"serialise[days={days}]"
+            run["results"][name] = measure(lambda: JSONResponse(content=course.dict()), repeat, min_time)
+            name = f"hit_same_process[days={days}]"
+            run["results"][name] = measure(lambda: cache.get(keys[days]), repeat, min_time)
+            run["results"][name]["bytes"] = len(body)
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        workers = [
+            context.Process(target=_reader, args=(path, list(keys.values()), repeat, min_time, queue))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        per_process = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        cache.close()
+
+    for days, key in keys.items():
+        medians = [results[key]["median"] for results in per_process]
+        run["results"][f"hit_other_process[days={days}]"] = {
+            "processes": processes,
+            "median": statistics.median(medians),
+            "min": min(medians),
+            "max": max(medians),
+        }
+    for name, result in run["results"].items():
+        print(f"{name:<40} {format_seconds(result['median']):>10}")
+    return run
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cross-process shared course cache hits")
+    parser.add_argument("--days", default=",".join(map(str, DEFAULT_DAYS)), help="Comma-separated course sizes")
+    parser.add_argument("--processes", type=int, default=4, help="Reader processes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as regression")
+    args = parser.parse_args(argv)
+
+    days_list = [int(value) for value in args.days.split(",") if value]
+    run = run_suite(days_list, args.processes, args.repeat, args.min_time)
+    print(f"\nResults written to {save_run(run, args.output)}")
+
+    if args.compare:
+        rows = compare_runs(load_run(args.compare), run, args.threshold)
+        print(f"\nComparison against {args.compare}:")
+        print_comparison(rows)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Benchmark single-call against multi-call course generation on a simulated Ollama.
+
+Usage:
+    python bench_generation_mode.py [--days 1,3,7] [--runs 10] [--latency fixed:0.05]
+                                    [--tokens-per-second 2000] [--malformed-rates 0,0.1]
+
+Every prompt is answered from exact recordings by the replay app, so a call
+costs the ``--latency`` delay (model setup and prompt evaluation) plus the
+output tokens at ``--tokens-per-second``. ``--malformed-rates`` breaks that
+share of responses. Sections are generated as configured (QUIZ_SOURCE,
+PLAN_SOURCE) without the section cache. Reported per mode: median seconds per
+course, the share of courses whose sections all came from the LLM without a
+fallback, and LLM calls per course (broken JSON is retried, so it shows up as
+calls and time). The last column is what GenerationModeSelector picks from
+those measurements; it still splits courses above SINGLE_CALL_MAX_LESSONS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+from typing import Dict, List
+
+import httpx
+import ollama
+import course_generator
+from ai_service import AIService, COURSE_SECTIONS
+from bench_utils import format_seconds, make_course_data, new_run, save_run
+from generation_mode import MODES, GenerationModeSelector
+from ollama_replay import create_replay_app, prompt_key
+from section_cache import SectionCache
+from structured_output import OutputModeSelector, build_prompt
+
+TOPIC, LEVEL = "Python", "beginner"
+
+def write_recordings(path: str, service: AIService, days_list: List[int], generated) -> None:
+    """Exact recordings of every per-section and combined prompt the benchmark sends."""
+    with open(path, "w") as f:
+        for days in days_list:
+            data = make_course_data(days)
+            prompts = [(section, service.section_prompt(section, TOPIC, LEVEL, days), (section,))
+                       for section in generated]
+            prompts.append(("+".join(generated), service.course_prompt(generated, TOPIC, LEVEL, days), generated))
+            for section, prompt, parts in prompts:
+                prompt = build_prompt(prompt, "schema")
+                f.write(json.dumps({
+                    "key": prompt_key(service.model, prompt), "model": service.model, "section": section,
+                    "prompt": prompt, "response": json.dumps({part: data[part] for part in parts}),
+                }) + "\n")
+
+class MeasuringSelector(GenerationModeSelector):
+    """Selector that also keeps every outcome it is told about."""
+
+    def __init__(self):
+        super().__init__("auto", min_samples=1)
+        self.outcomes: List = []
+
+    def record(self, mode: str, days: int, seconds: float, success: bool) -> None:
+        self.outcomes.append((seconds, success))
+        super().record(mode, days, seconds, success)
+
+def run_mode(recordings: str, mode: str, days: int, args, selector: MeasuringSelector) -> Dict:
+    """Generate ``args.runs`` courses in ``mode``; the outcomes also go to ``selector``."""
+    app = create_replay_app(recordings, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            malformed_rate=args.malformed_rate, seed=args.seed)
+    service = AIService()
+    service.client = ollama.AsyncClient(host="http://replay", transport=httpx.ASGITransport(app=app))
+    service.output_modes = OutputModeSelector("schema")
+    service.cache = SectionCache(max_entries=0)
+    course_generator.AIService = lambda: service
+    course_generator.GENERATION_MODE_SELECTOR = selector
+
+    selector.preferred, selector.outcomes = mode, []
+    for _ in range(args.runs):
+        asyncio.run(course_generator.generate_course_with_ai(TOPIC, LEVEL, days))
+    selector.preferred = "auto"
+    return {
+        "median": statistics.median(seconds for seconds, _ in selector.outcomes),
+        "success_rate": sum(success for _, success in selector.outcomes) / len(selector.outcomes),
+        "calls": app.state.stats["requests"] / args.runs,
+        "malformed": app.state.stats["malformed"],
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark single-call against multi-call course generation")
+    parser.add_argument("--days", default="1,3,7", help="Comma-separated course sizes")
+    parser.add_argument("--runs", type=int, default=10, help="Courses generated per mode and size")
+    parser.add_argument("--latency", default="fixed:0.05", help="Per-call delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=2000)
+    parser.add_argument("--malformed-rates", default="0,0.1", help="Comma-separated shares of broken responses")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    days_list = [int(value) for value in args.days.split(",") if value]
+    generated = course_generator.sections_to_generate(COURSE_SECTIONS, None, None)
+    run = new_run("generation_mode")
+    run["sections"] = list(generated)
+    with tempfile.TemporaryDirectory() as directory:
+        recordings = os.path.join(directory, "recordings.jsonl")
+        write_recordings(recordings, AIService(), days_list, generated)
+        print(f"Sections generated: {', '.join(generated)}")
+        print(f"{'malformed':>9} {'days':>4}  {'single':>10} {'ok':>5} {'calls':>5}  "
+              f"{'multi':>10} {'ok':>5} {'calls':>5}  selector")
+        for rate in (float(value) for value in args.malformed_rates.split(",") if value):
+            args.malformed_rate = rate
+            for days in days_list:
+                selector = MeasuringSelector()
+                results = {mode: run_mode(recordings, mode, days, args, selector) for mode in MODES}
+                choice = selector.choose(generated, days)
+                for mode, result in results.items():
+                    run["results"][f"{mode}[days={days},malformed={rate}]"] = dict(result, days=days)
+                run["results"][f"selector[days={days},malformed={rate}]"] = {"choice": choice}
+                single, multi = results["single"], results["multi"]
+                print(f"{rate:>9} {days:>4}  {format_seconds(single['median']):>10} {single['success_rate']:>5.2f} "
+                      f"{single['calls']:>5.1f}  {format_seconds(multi['median']):>10} "
+                      f"{multi['success_rate']:>5.2f} {multi['calls']:>5.1f}  {choice}")
+    print(f"\nResults written to {save_run(run, args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Microbenchmarks for the parse / validate / serialise hot path.
+
+Usage:
+    python bench_hot_path.py [--days 1,7,14,30] [--filter parse] [--output run.json]
+                             [--compare baseline.json] [--threshold 0.10]
+
+Results are written as JSON (bench_results/ by default). With --compare the
+run is checked against an earlier one and the exit status is 1 if any
+benchmark got slower than the threshold.
+"""
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from bench_utils import (
+    compare_runs, format_seconds, load_run, make_course_data, measure, new_run, print_comparison, save_run
+)
+from course_generator import generate_course_rule_based
+from custom_json import CustomJSONResponse
+from json_handler import CustomJSONResponse as OrjsonResponse
+from json_response import FormattedJSONResponse
+from json_utils import clean_json_string, parse_json_response, validate_json_structure
+from models import CourseResponse
+from fastapi.responses import JSONResponse
+
+DEFAULT_DAYS = (1, 7, 14, 30)
+
+def build_benchmarks(days: int) -> List[Tuple[str, Callable[[], object]]]:
+    """Return the (name, callable) pairs for one course size."""
+    data = make_course_data(days)
+    raw = f"```json\n{json.dumps(data, indent=2)}\n```"
+    cleaned = clean_json_string(raw)
+    course = CourseResponse(**data)
+    course_dict = course.dict()
+
+    return [
+        (f"clean_json_string[days={days}]", lambda: clean_json_string(raw)),
+        (f"parse_json_response[days={days}]", lambda: parse_json_response(cleaned)),
+        (f"validate_json_structure[days={days}]", lambda: validate_json_structure(data)),
+        (f"CourseResponse[days={days}]", lambda: CourseResponse(**data)),
+        (f"CourseResponse.dict[days={days}]", course.dict),
+        (f"generate_course_rule_based[days={days}]", lambda: generate_course_rule_based("C++", "beginner", days)),
+        (f"JSONResponse[days={days}]", lambda: JSONResponse(content=course_dict)),
+        (f"custom_json.CustomJSONResponse[days={days}]", lambda: CustomJSONResponse(content=course_dict)),
+        (f"json_handler.CustomJSONResponse[days={days}]", lambda: OrjsonResponse(content=course_dict)),
+        (f"json_response.FormattedJSONResponse[days={days}]", lambda: FormattedJSONResponse(content=course_dict)),
+    ]
+
+def run_suite(days_list: List[int], name_filter: str = "", repeat: int = 5, min_time: float = 0.2) -> Dict:
+    run = new_run("hot_path")
+    for days in days_list:
+        for name, func in build_benchmarks(days):
+            if name_filter and name_filter not in name:
+                continue
+            result = measure(func, repeat=repeat, min_time=min_time)
+            result["days"] = days
+            run["results"][name] = result
+            print(f"{name:<55} {format_seconds(result['median']):>10}  (+/- {format_seconds(result['stdev'])})")
+    return run
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the parse/validate/serialise hot path")
+    parser.add_argument("--days", default=",".join(map(str, DEFAULT_DAYS)), help="Comma-separated course sizes")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as regression")
+    args = parser.parse_args(argv)
+
+    days_list = [int(value) for value in args.days.split(",") if value]
+    run = run_suite(days_list, args.filter, args.repeat, args.min_time)
+    print(f"\nResults written to {save_run(run, args.output)}")
+
+    if args.compare:
+        rows = compare_runs(load_run(args.compare), run, args.threshold)
+        print(f"\nComparison against {args.compare}:")
+        print_comparison(rows)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
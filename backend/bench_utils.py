@@ -0,0 +1,156 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+# Default location for stored benchmark runs
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "bench_results")
+
+def measure(func: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> Dict:
+    """Time ``func`` and return per-call statistics in seconds.
+
+    The number of calls per sample is calibrated so that one sample takes at
+    least ``min_time``; ``repeat`` samples are then taken.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def new_run(suite: str) -> Dict:
+    """Create an empty result document for a benchmark suite."""
+    return {
+        "suite": suite,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {},
+    }
+
+def save_run(run: Dict, path: Optional[str] = None) -> str:
+    """Write a run to ``path`` (or a timestamped file in RESULTS_DIR)."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = run["created"].replace(":", "").replace("-", "")[:15]
+        path = os.path.join(RESULTS_DIR, f"{run['suite']}-{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    return path
+
+def load_run(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+def compare_runs(baseline: Dict, current: Dict, threshold: float = 0.10, stat: str = "median") -> List[Dict]:
+    """Compare two runs benchmark by benchmark.
+
+    Returns one entry per benchmark present in both runs with the relative
+    change of ``stat``; entries slower by more than ``threshold`` are flagged
+    as regressions.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before or stat not in result or not before.get(stat):
+            continue
+        change = result[stat] / before[stat] - 1
+        rows.append({
+            "name": name,
+            "baseline": before[stat],
+            "current": result[stat],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+def format_seconds(value: float) -> str:
+    if value >= 1:
+        return f"{value:.2f} s"
+    if value >= 1e-3:
+        return f"{value * 1e3:.2f} ms"
+    return f"{value * 1e6:.1f} us"
+
+def print_comparison(rows: List[Dict]) -> None:
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<55} {format_seconds(row['baseline']):>10} -> "
+            f"{format_seconds(row['current']):>10} ({row['change']:+.1%}){flag}"
+        )
+
+LESSON_EXPLANATION = "\n".join(
+    f"Line {n} of the explanation covers one idea of the lesson in plain words." for n in range(1, 7)
+)
+
+def make_course_data(days: int, topic: str = "Python Programming", level: str = "beginner") -> Dict:
+    """Build a valid course dict of realistic shape with one module per day."""
+    modules = []
+    for day in range(1, days + 1):
+        modules.append({
+            "name": f"Day {day}: {topic} part {day}",
+            "lessons": [
+                {
+                    "title": f"Lesson {day}.{n}: Concept {n}",
+                    "explanation": LESSON_EXPLANATION,
+                    "content": f"Detailed content for lesson {n} of day {day} on {topic}.",
+                    "coding_task": "Write a small program that applies the concept:\n```python\nprint('hello')\n```",
+                    "key_takeaway": f"Concept {n} of day {day} is a building block for the next lessons.",
+                }
+                for n in range(1, 4)
+            ],
+        })
+    return {
+        "topic": topic,
+        "level": level,
+        "days": days,
+        "modules": modules,
+        "tasks": [f"Day {day}: Complete the exercises for part {day}" for day in range(1, days + 1)],
+        "quizzes": [
+            {
+                "question": f"Which statement about concept {n} is correct?",
+                "options": [f"Statement {n}.{option}" for option in "ABCD"],
+                "correct_answer": f"Statement {n}.A",
+            }
+            for n in range(1, 6)
+        ],
+        "practice_plan": [
+            "Daily: Solve one exercise",
+            "Weekly: Build a small project",
+            "Monthly: Review and refactor",
+        ],
+    }
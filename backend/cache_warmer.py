@@ -0,0 +1,347 @@
+"""Background warmer that pre-generates popular courses into the shared cache.
+
+Popular (topic, level, days) combinations are mined from request history:
+"Generating course for topic" lines in the logs (api.jsonl, or text api.log) and
+JSONL workload files with topic/level/days per line, as used by loadgen.py.
+Recent requests count more than old ones. The history is read incrementally:
+each cycle only parses lines appended since the previous one.
+
+Live traffic is seen host-wide: every worker with requests in flight holds a
+file in a directory next to the cache (HostActivity), so the warmer in one
+worker yields to requests served by any of them.
+
+Ranking only:
+    python cache_warmer.py --history api.jsonl,workload.jsonl --top 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from fastapi.responses import JSONResponse
+from loguru import logger
+from config import (
+    DISCONNECT_POLL_INTERVAL,
+    REQUEST_DEADLINE_SECONDS,
+    WARMER_BUDGET_SECONDS_PER_HOUR,
+    WARMER_HALF_LIFE_HOURS,
+    WARMER_HISTORY_FILES,
+    WARMER_IDLE_SECONDS,
+    WARMER_INTERVAL,
+    WARMER_TOP_N,
+)
+from course_cache import SharedCourseCache, course_key, is_cacheable
+from deadline import Deadline
+from metrics import WARMER_COURSES
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+Combo = Tuple[str, str, int]
+
+REQUEST_PATTERN = re.compile(r"Generating course for topic: (?P<topic>.+?), level: (?P<level>\w+), days: (?P<days>\d+)")
+TEXT_TIME_PATTERN = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)")
+LEVELS = ("beginner", "intermediate", "advanced")
+# Requests remembered from the history; older ones have decayed to nothing by then
+MAX_HISTORY_REQUESTS = 100_000
+
+def _parse_time(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.replace(" ", "T")).timestamp()
+    except ValueError:
+        return None
+
+def parse_history_line(line: str) -> Optional[Tuple[Combo, Optional[float], str]]:
+    """Extract ((topic, level, days), timestamp, dedup id) from one history line."""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if {"topic", "level", "days"} <= entry.keys():
+            combo = (str(entry["topic"]), str(entry["level"]), int(entry["days"]))
+            return combo, None, ""
+        match = REQUEST_PATTERN.search(entry.get("message", ""))
+        if not match:
+            return None
+        timestamp = _parse_time(entry.get("time", ""))
+        dedup = entry.get("request_id") or entry.get("time", "")
+    else:
+        match = REQUEST_PATTERN.search(line)
+        if not match:
+            return None
+        stamp = TEXT_TIME_PATTERN.match(line)
+        timestamp = _parse_time(stamp.group(1)) if stamp else None
+        # Older logs wrote every record to two sinks; the same second and request collapse to one
+        dedup = stamp.group(1) if stamp else ""
+    combo = (match.group("topic").strip(), match.group("level"), int(match.group("days")))
+    return combo, timestamp, dedup
+
+class HistoryMiner:
+    """Requests found in the history files, read incrementally and deduplicated.
+
+    Each read() parses only the complete lines appended since the previous
+    one. A file that was replaced (rotated) or truncated is read again from
+    its start; requests read before stay remembered, up to
+    MAX_HISTORY_REQUESTS.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = list(paths)
+        self._positions: Dict[str, Tuple[int, int]] = {}  # path -> (inode, offset)
+        self._requests: Deque[Tuple[Combo, Optional[float]]] = deque(maxlen=MAX_HISTORY_REQUESTS)
+        self._seen: Set[Tuple[str, Combo]] = set()
+
+    def _new_lines(self, path: str) -> Iterator[str]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            logger.debug("History file {} not found", path)
+            return
+        inode, offset = self._positions.get(path, (stat.st_ino, 0))
+        if inode != stat.st_ino or stat.st_size < offset:
+            offset = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                offset += len(line)
+                yield line.decode("utf-8", errors="replace")
+        self._positions[path] = (stat.st_ino, offset)
+
+    def read(self) -> List[Tuple[Combo, Optional[float]]]:
+        """All requests read so far, oldest first."""
+        for path in self.paths:
+            for line in self._new_lines(path):
+                parsed = parse_history_line(line)
+                if parsed is None:
+                    continue
+                combo, timestamp, dedup = parsed
+                if combo[1] not in LEVELS or not 1 <= combo[2] <= 30:
+                    continue
+                if dedup:
+                    if (dedup, combo) in self._seen:
+                        continue
+                    if len(self._seen) >= MAX_HISTORY_REQUESTS:
+                        self._seen.clear()
+                    self._seen.add((dedup, combo))
+                self._requests.append((combo, timestamp))
+        return list(self._requests)
+
+def mine_history(paths: Iterable[str]) -> List[Tuple[Combo, Optional[float]]]:
+    """All requests found in the history files, deduplicated."""
+    return HistoryMiner(paths).read()
+
+def rank_combos(requests: Iterable[Tuple[Combo, Optional[float]]], half_life_hours: float = WARMER_HALF_LIFE_HOURS,
+                now: Optional[float] = None, top: int = WARMER_TOP_N) -> List[Tuple[Combo, float]]:
+    """Rank combinations by request count, each request decaying with its age."""
+    now = time.time() if now is None else now
+    half_life = half_life_hours * 3600
+    scores: Dict[Tuple[str, str, int], float] = defaultdict(float)
+    names: Dict[Tuple[str, str, int], str] = {}
+    for (topic, level, days), timestamp in requests:
+        key = (" ".join(topic.lower().split()), level, days)
+        names.setdefault(key, topic)
+        age = max(0.0, now - timestamp) if timestamp else 0.0
+        scores[key] += 0.5 ** (age / half_life) if half_life > 0 else 1.0
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [((names[key], key[1], key[2]), score) for key, score in ranked]
+
+class HostActivity:
+    """Whether any worker on the host is serving requests.
+
+    A worker with requests in flight holds an empty file named after its pid
+    in ``directory``; busy() lists the directory. Files of workers that died
+    are removed. The files only change when a worker goes from idle to busy
+    and back, so a burst of requests costs two small file operations.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._marker = os.path.join(directory, str(os.getpid()))
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            if self.in_flight == 1:
+                open(self._marker, "w").close()
+
+    def exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                try:
+                    os.remove(self._marker)
+                except FileNotFoundError:
+                    pass
+
+    def busy(self) -> bool:
+        for name in os.listdir(self.directory):
+            if not name.isdigit():
+                continue
+            try:
+                os.kill(int(name), 0)
+                return True
+            except PermissionError:
+                return True
+            except ProcessLookupError:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        return False
+
+_activities: Dict[str, HostActivity] = {}
+
+def host_activity(cache: SharedCourseCache) -> HostActivity:
+    """The activity of the workers sharing ``cache``; one instance per process."""
+    activity = _activities.get(cache.path)
+    if activity is None:
+        activity = _activities[cache.path] = HostActivity(cache.path + ".live")
+    return activity
+
+class CacheWarmer:
+    """Pre-generates top ranked courses while the server is idle.
+
+    Generation only starts after WARMER_IDLE_SECONDS without live requests and
+    is cancelled (through its Deadline) as soon as a live request arrives at
+    any worker sharing the cache (see HostActivity). Time spent generating is limited to ``budget_seconds_per_hour``. With
+    several workers only the one holding the warmer lock file does any work.
+    """
+
+    def __init__(
+        self,
+        cache: SharedCourseCache,
+        generate: Callable,
+        history: List[str],
+        budget_seconds_per_hour: float = WARMER_BUDGET_SECONDS_PER_HOUR,
+        idle_seconds: float = WARMER_IDLE_SECONDS,
+        interval: float = WARMER_INTERVAL,
+        top: int = WARMER_TOP_N,
+        busy: Optional[Callable[[], bool]] = None,
+    ):
+        self.cache = cache
+        self.generate = generate
+        self.history = HistoryMiner(history)
+        self.budget = budget_seconds_per_hour
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.top = top
+        self.busy = busy or host_activity(cache).busy
+        self._spent: List[Tuple[float, float]] = []  # (finished at, seconds) of recent generations
+        self._idle_since = time.monotonic()
+        self._lock_file = None
+
+    def spent_last_hour(self) -> float:
+        cutoff = time.monotonic() - 3600
+        self._spent = [entry for entry in self._spent if entry[0] >= cutoff]
+        return sum(seconds for _, seconds in self._spent)
+
+    def is_idle(self) -> bool:
+        if self.busy():
+            self._idle_since = time.monotonic()
+            return False
+        return time.monotonic() - self._idle_since >= self.idle_seconds
+
+    def acquire_leadership(self) -> bool:
+        """Whether this process should warm; only one worker per cache file does."""
+        if fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.cache.path + ".warmer.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _preempt_on_traffic(self, deadline: Deadline) -> None:
+        while not deadline.expired:
+            if self.busy():
+                deadline.cancel("live_traffic")
+                return
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    async def warm_one(self, topic: str, level: str, days: int) -> str:
+        """Generate and publish one course; returns the outcome label."""
+        key = course_key(topic, level, days)
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.cache.contains, key):
+            return "cached"
+        remaining = self.budget - self.spent_last_hour()
+        if remaining <= 0:
+            return "over_budget"
+        deadline = Deadline(min(remaining, REQUEST_DEADLINE_SECONDS or remaining))
+        watcher = asyncio.create_task(self._preempt_on_traffic(deadline))
+        started = time.monotonic()
+        try:
+            course = await self.generate(topic, level, days, deadline)
+        except Exception as e:
+            if deadline.cancelled:
+                return "preempted"
+            logger.warning("Warming {} failed: {}", key, e)
+            return "failed"
+        finally:
+            watcher.cancel()
+            self._spent.append((time.monotonic(), time.monotonic() - started))
+        if deadline.cancelled:
+            return "preempted"
+        if not is_cacheable(course):
+            return "not_cacheable"
+        body = JSONResponse(content=course.dict()).body
+        await loop.run_in_executor(None, self.cache.put, key, body)
+        logger.info("Warmed course {}", key)
+        return "warmed"
+
+    async def run_cycle(self) -> int:
+        """Warm ranked courses until traffic arrives or the budget runs out; returns courses warmed."""
+        requests = await asyncio.get_running_loop().run_in_executor(None, self.history.read)
+        warmed = 0
+        for (topic, level, days), _ in rank_combos(requests, top=self.top):
+            if not self.is_idle():
+                break
+            outcome = await self.warm_one(topic, level, days)
+            WARMER_COURSES.inc(outcome=outcome)
+            if outcome in ("over_budget", "preempted"):
+                break
+            warmed += outcome == "warmed"
+        return warmed
+
+    async def run(self) -> None:
+        """Warm forever; run as a background task."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.acquire_leadership() or not self.is_idle():
+                continue
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error("Cache warming cycle failed: {}", e)
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Rank course requests from history files")
+    parser.add_argument("--history", default=",".join(WARMER_HISTORY_FILES), help="Comma-separated log/JSONL files")
+    parser.add_argument("--top", type=int, default=WARMER_TOP_N)
+    parser.add_argument("--half-life-hours", type=float, default=WARMER_HALF_LIFE_HOURS)
+    args = parser.parse_args(argv)
+    requests = mine_history([path for path in args.history.split(",") if path])
+    for (topic, level, days), score in rank_combos(requests, args.half_life_hours, top=args.top):
+        print(f"{score:8.2f}  {topic} / {level} / {days} days")
+
+if __name__ == "__main__":
+    main()
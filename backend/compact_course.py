@@ -0,0 +1,93 @@
+"""Compact in-memory form of course sections for SectionCache.
+
+Pydantic v1 models and plain dicts carry a per-instance dict each, and the
+same strings (default explanations, quiz options, code snippets, topic
+names) repeat across thousands of cached sections. Packed records are
+tuples whose strings are interned, so each distinct string is stored once
+for the whole process. Sections are expanded back to plain lists and dicts
+only when read.
+"""
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models import Lesson, Module, Quiz
+
+def _s(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+class PackedLesson(NamedTuple):
+    title: str
+    explanation: str
+    content: str
+    coding_task: Optional[str]
+    key_takeaway: Optional[str]
+
+class PackedModule(NamedTuple):
+    name: str
+    lessons: Tuple[PackedLesson, ...]
+
+class PackedQuiz(NamedTuple):
+    question: str
+    options: Tuple[str, ...]
+    correct_answer: str
+
+def pack_lesson(lesson: Lesson) -> PackedLesson:
+    return PackedLesson(_s(lesson.title), _s(lesson.explanation), _s(lesson.content), _s(lesson.coding_task),
+                        _s(lesson.key_takeaway))
+
+def pack_module(module: Module) -> PackedModule:
+    return PackedModule(_s(module.name), tuple(pack_lesson(lesson) for lesson in module.lessons))
+
+def pack_quiz(quiz: Quiz) -> PackedQuiz:
+    return PackedQuiz(_s(quiz.question), tuple(_s(option) for option in quiz.options), _s(quiz.correct_answer))
+
+def pack_strings(values: List[str]) -> Tuple[str, ...]:
+    return tuple(_s(value) for value in values)
+
+def pack_section(section: str, items: List) -> Tuple:
+    """Pack a validated section (a list of models or strings)."""
+    if section == "modules":
+        return tuple(pack_module(module) for module in items)
+    if section == "quizzes":
+        return tuple(pack_quiz(quiz) for quiz in items)
+    if section == "outline":
+        return tuple((_s(module.name), pack_strings([lesson.title for lesson in module.lessons])) for module in items)
+    return pack_strings(items)
+
+def unpack_section(section: str, packed: Tuple) -> List:
+    """Expand a packed section to the plain JSON-like form the LLM returns."""
+    if section == "modules":
+        return [
+            {"name": module.name, "lessons": [lesson._asdict() for lesson in module.lessons]}
+            for module in packed
+        ]
+    if section == "quizzes":
+        return [
+            {"question": quiz.question, "options": list(quiz.options), "correct_answer": quiz.correct_answer}
+            for quiz in packed
+        ]
+    if section == "outline":
+        return [{"name": name, "lessons": [{"title": title} for title in titles]} for name, titles in packed]
+    return list(packed)
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Bytes used by ``obj`` and everything it references, counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(obj.__dict__, seen)
+        if hasattr(obj, "__fields_set__"):
+            size += deep_sizeof(obj.__fields_set__, seen)
+    return size
+
+def memory_per_course(courses: List, shared: Optional[set] = None) -> Dict[str, float]:
+    """Average deep size of ``courses`` (in any form), with strings shared between them counted once."""
+    seen = set() if shared is None else shared
+    total = sum(deep_sizeof(course, seen) for course in courses)
+    return {"courses": len(courses), "total_bytes": total, "bytes_per_course": total / len(courses) if courses else 0}
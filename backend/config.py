@@ -1,15 +1,25 @@
 import os
 from loguru import logger
+from log_pipeline import setup_logging
 
 # AI Service Configuration
 AI_AVAILABLE = os.getenv("AI_AVAILABLE", "true").lower() in ("true", "1", "yes")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 AI_MODEL = os.getenv("AI_MODEL", "mistral")
+AI_OUTPUT_MODE = os.getenv("AI_OUTPUT_MODE", "schema")  # schema, json or prompt; weaker modes are used if unsupported
+AI_RECORD_DIR = os.getenv("AI_RECORD_DIR", "")  # When set, LLM prompts and responses are recorded here
 
 # API Configuration
-MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2000"))
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "600"))  # 0 disables the deadline
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+SECTION_REGENERATE_ATTEMPTS = int(os.getenv("SECTION_REGENERATE_ATTEMPTS", "1"))  # Extra AI calls for a section that failed validation
+
+# Generation length limits (Ollama num_predict), computed per section
+TOKEN_BUDGET_CAP = int(os.getenv("TOKEN_BUDGET_CAP", "16384"))
+TOKEN_BUDGET_MIN = int(os.getenv("TOKEN_BUDGET_MIN", "256"))
+TOKEN_BUDGET_HEADROOM = float(os.getenv("TOKEN_BUDGET_HEADROOM", "1.5"))
 
 # Content Generation Settings
 MIN_LESSONS_PER_MODULE = int(os.getenv("MIN_LESSONS_PER_MODULE", "3"))
@@ -27,16 +37,82 @@ LOG_FORMAT = os.getenv(
     "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
 )
 
+LOG_FILE = os.getenv("LOG_FILE", "api.log")  # Text lines in LOG_FORMAT
+LOG_JSON_FILE = os.getenv("LOG_JSON_FILE", "api.jsonl")  # One JSON record per line; empty disables it
+LOG_ROTATION = os.getenv("LOG_ROTATION", "500 MB")
+LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "zip")
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() in ("true", "1", "yes")
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+
 # Configure logging
-logger.remove()  # Remove default handler
-logger.add(
-    "api.log",
+setup_logging(
+    LOG_FILE,
     level=LOG_LEVEL,
-    format=LOG_FORMAT,
-    rotation="500 MB",
-    compression="zip"
+    text_format=LOG_FORMAT,
+    rotation=LOG_ROTATION,
+    compression=LOG_COMPRESSION,
+    json_path=LOG_JSON_FILE,
+    sample_rate=LOG_INFO_SAMPLE_RATE,
+    enqueue=LOG_ENQUEUE
 )
 
+# Tracing Configuration
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+
+# Section Cache Configuration (entries per section; 0 disables caching)
+SECTION_CACHE_MAX_ENTRIES = int(os.getenv("SECTION_CACHE_MAX_ENTRIES", "256"))
+SECTION_CACHE_TTL = float(os.getenv("SECTION_CACHE_TTL", "86400"))  # Seconds; 0 keeps entries until evicted
+
+# Shared Course Cache Configuration (SQLite file shared by all workers; empty path disables it)
+COURSE_CACHE_PATH = os.getenv("COURSE_CACHE_PATH", "course_cache.sqlite3")
+COURSE_CACHE_MAX_BYTES = int(os.getenv("COURSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+COURSE_CACHE_TTL = float(os.getenv("COURSE_CACHE_TTL", "86400"))  # Seconds; 0 keeps entries until evicted
+COURSE_CACHE_FLUSH_INTERVAL = float(os.getenv("COURSE_CACHE_FLUSH_INTERVAL", "30"))  # Seconds between access time writes
+
+# Course Store Configuration (archive behind the /courses endpoints; empty path disables it)
+COURSE_STORE_PATH = os.getenv("COURSE_STORE_PATH", "courses.cca")
+COURSE_STORE_PARSED_ENTRIES = int(os.getenv("COURSE_STORE_PARSED_ENTRIES", "32"))  # Courses kept parsed in memory
+COURSE_STORE_MAX_BYTES = int(os.getenv("COURSE_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))  # Oldest courses go first
+
+# Two-Phase Generation Configuration (default for requests that do not set "lazy")
+LAZY_LESSONS = os.getenv("LAZY_LESSONS", "false").lower() in ("true", "1", "yes")
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("true", "1", "yes")
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "1"))  # Days after the one just served to generate ahead
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "32"))  # Modules waiting; the oldest are dropped
+PREFETCH_WASTE_SECONDS = float(os.getenv("PREFETCH_WASTE_SECONDS", "86400"))  # Unread after this counts as waste
+
+# Section Source Configuration ("ai" asks the LLM, "local" derives the section from the modules)
+QUIZ_SOURCE = os.getenv("QUIZ_SOURCE", "ai")
+PLAN_SOURCE = os.getenv("PLAN_SOURCE", "local")  # Daily tasks and practice plan
+
+# Generation Mode Configuration ("single" asks for every section in one call, "multi" makes one call per section)
+GENERATION_MODE = os.getenv("GENERATION_MODE", "auto")  # "auto" picks per course from measured latency and success
+SINGLE_CALL_MAX_LESSONS = int(os.getenv("SINGLE_CALL_MAX_LESSONS", "15"))  # Larger courses are always split
+GENERATION_MODE_MIN_SAMPLES = int(os.getenv("GENERATION_MODE_MIN_SAMPLES", "3"))  # Tries of each mode before choosing
+
+# Model Routing Configuration (simple sections go to AI_SMALL_MODEL; empty sends everything to AI_MODEL)
+AI_SMALL_MODEL = os.getenv("AI_SMALL_MODEL", "")
+ROUTING_SMALL_MAX_DAYS = int(os.getenv("ROUTING_SMALL_MAX_DAYS", "3"))  # Longest beginner course whose modules fit the small model
+ROUTING_MIN_SAMPLES = int(os.getenv("ROUTING_MIN_SAMPLES", "5"))  # Calls of a model and section before its stats count
+ROUTING_MIN_JSON_VALIDITY = float(os.getenv("ROUTING_MIN_JSON_VALIDITY", "0.8"))  # Below this the small model is skipped
+
+# Hedged Request Configuration (a slow LLM call is duplicated; the first valid response wins)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))  # Extra calls as a share of all calls; 0 disables hedging
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))  # Latency percentile after which a call is hedged
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # Calls of a section measured before it is hedged
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))  # Seconds; never hedge sooner than this
+HEDGE_HOSTS = [host for host in os.getenv("HEDGE_HOSTS", "").split(",") if host]  # Other Ollama servers for duplicates
+
+# Cache Warmer Configuration
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "true").lower() in ("true", "1", "yes")
+WARMER_HISTORY_FILES = [path for path in os.getenv("WARMER_HISTORY_FILES", LOG_JSON_FILE).split(",") if path]
+WARMER_TOP_N = int(os.getenv("WARMER_TOP_N", "20"))
+WARMER_HALF_LIFE_HOURS = float(os.getenv("WARMER_HALF_LIFE_HOURS", "72"))
+WARMER_BUDGET_SECONDS_PER_HOUR = float(os.getenv("WARMER_BUDGET_SECONDS_PER_HOUR", "600"))  # LLM time per hour
+WARMER_IDLE_SECONDS = float(os.getenv("WARMER_IDLE_SECONDS", "30"))  # Quiet time before warming starts
+WARMER_INTERVAL = float(os.getenv("WARMER_INTERVAL", "60"))
+
 # Error Messages
 ERROR_MESSAGES = {
     # Input Validation Errors
@@ -103,6 +179,6 @@ except ImportError:
     AI_AVAILABLE = False
 
 # Log configuration on startup
-logger.info(f"AI Service Configuration: Available={AI_AVAILABLE}, Model={AI_MODEL}")
-logger.info(f"Content Generation Settings: Min Lessons={MIN_LESSONS_PER_MODULE}, Max Lessons={MAX_LESSONS_PER_MODULE}")
-logger.info(f"API Configuration: Max Tokens={MAX_TOKENS}, Temperature={TEMPERATURE}")
+logger.info("AI Service Configuration: Available={}, Model={}", AI_AVAILABLE, AI_MODEL)
+logger.info("Content Generation Settings: Min Lessons={}, Max Lessons={}", MIN_LESSONS_PER_MODULE, MAX_LESSONS_PER_MODULE)
+logger.info("API Configuration: Token Budget Cap={}, Temperature={}", TOKEN_BUDGET_CAP, TEMPERATURE)
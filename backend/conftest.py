@@ -0,0 +1,49 @@
+import json
+import httpx
+import ollama
+import pytest
+import course_generator
+from ai_service import AIService
+from generation_mode import GenerationModeSelector
+from ollama_replay import create_replay_app
+from section_cache import SectionCache
+from structured_output import OutputModeSelector
+
+@pytest.fixture
+def section_recordings(tmp_path):
+    """Write replay recordings answering each section prompt with the given value; returns their path."""
+    def write(sections, model="mistral"):
+        path = tmp_path / "recordings.jsonl"
+        with open(path, "w") as f:
+            for section, value in sections.items():
+                f.write(json.dumps({"key": section, "model": model, "section": section, "prompt": section,
+                                    "response": json.dumps({section: value})}) + "\n")
+        return path
+    return write
+
+@pytest.fixture
+def replay_service():
+    """Build an AIService that talks to a replay server; returns (service, replay app).
+
+    Extra keyword arguments go to create_replay_app. The service gets its own
+    section cache and a fixed output mode, so tests do not share state.
+    """
+    def build(path, output_mode="schema", **replay_options):
+        app = create_replay_app(str(path), **replay_options)
+        service = AIService()
+        service.client = ollama.AsyncClient(host="http://replay", transport=httpx.ASGITransport(app=app))
+        service.output_modes = OutputModeSelector(output_mode)
+        service.cache = SectionCache()
+        return service, app
+    return build
+
+@pytest.fixture
+def replay_generator(replay_service, monkeypatch):
+    """Make course_generator call a replay server, one call per section; returns the replay app."""
+    def build(path, **replay_options):
+        service, app = replay_service(path, **replay_options)
+        monkeypatch.setattr(course_generator, "AIService", lambda: service)
+        monkeypatch.setattr(course_generator, "AI_AVAILABLE", True)
+        monkeypatch.setattr(course_generator, "GENERATION_MODE_SELECTOR", GenerationModeSelector("multi"))
+        return app
+    return build
@@ -0,0 +1,384 @@
+"""Append-only, dictionary-compressed archive of generated courses.
+
+Layout for an archive at PATH:
+    PATH        header (magic, dictionary id) followed by records
+                [key length][payload length][key][zlib payload]
+    PATH.idx    one "key<TAB>offset<TAB>length" line per record
+    PATH.dict   preset compression dictionary trained on our own courses
+
+Every payload is compressed on its own with the shared dictionary, so a
+single course is read with one positioned read and one decompression. The
+index is only a cache of the record headers and is rebuilt from the data
+file if it falls behind (e.g. after a crash between the two writes).
+Writers in different processes serialise on an flock of the data file, and
+readers pick up records appended elsewhere from the tail of the index.
+
+compact() rewrites the live records (the latest of each key, minus the keys
+it is told to drop) to new files that replace the old ones. Other processes
+notice the new data file when they next lock it and reopen it.
+
+    python course_archive.py train corpus/*.json --archive courses.cca
+    python course_archive.py add courses.cca response.json --key python|beginner|7
+    python course_archive.py get courses.cca python|beginner|7
+"""
+import argparse
+import fcntl
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"CCA1"
+HEADER = struct.Struct(">4sI")
+RECORD = struct.Struct(">II")
+# zlib can only refer back 32 KiB, so a larger preset dictionary is wasted
+MAX_DICTIONARY_SIZE = 32 * 1024
+COMPRESSION_LEVEL = 9
+
+JSON_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+ESCAPED_NEWLINE = re.compile(rb"(?<=\\n)")
+
+class ArchiveError(Exception):
+    """Custom exception for course archive errors"""
+    pass
+
+def train_dictionary(samples: Iterable[bytes], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """Build a preset dictionary from the fragments that repeat across sample courses.
+
+    Fragments are JSON strings (keys and values) and the lines inside them.
+    Each is scored by how many samples contain it times its length; the best
+    go last in the dictionary, where zlib reaches them with the shortest
+    distances.
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        fragments = set()
+        for token in JSON_STRING.findall(sample):
+            fragments.add(token + b":" if len(token) < 24 else token)
+            fragments.update(piece for piece in ESCAPED_NEWLINE.split(token) if len(piece) >= 8)
+        counts.update(fragments)
+    ranked = sorted(
+        (fragment for fragment, count in counts.items() if count > 1),
+        key=lambda fragment: counts[fragment] * len(fragment),
+        reverse=True,
+    )
+    chosen: List[bytes] = []
+    used = 0
+    for fragment in ranked:
+        if used + len(fragment) > size:
+            continue
+        chosen.append(fragment)
+        used += len(fragment)
+    return b"".join(reversed(chosen))
+
+def dictionary_id(dictionary: bytes) -> int:
+    return zlib.crc32(dictionary)
+
+class CourseArchive:
+    """Random access by key and streaming append of compressed course JSON."""
+
+    def __init__(self, path: str, dictionary: Optional[bytes] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._index_offset = 0
+        self._end = HEADER.size
+        # Handles of data files replaced by compact(), kept open until no get() is reading them
+        self._retired: List = []
+        self._readers = 0
+        if not os.path.exists(path):
+            if dictionary is None:
+                raise ArchiveError(f"{path} does not exist and no dictionary was given to create it")
+            self._create(dictionary)
+        with open(path + ".dict", "rb") as f:
+            self.dictionary = f.read()
+        self._data = self._open_data()
+        self._load_index()
+
+    def _open_data(self):
+        data = open(self.path, "r+b")
+        magic, dict_id = HEADER.unpack(data.read(HEADER.size))
+        if magic != MAGIC:
+            data.close()
+            raise ArchiveError(f"{self.path} is not a course archive")
+        if dict_id != dictionary_id(self.dictionary):
+            data.close()
+            raise ArchiveError(f"{self.path}.dict does not match the dictionary the archive was written with")
+        return data
+
+    def _lock_current(self, mode: int):
+        """flock the data file, first switching to a new one if another process compacted the archive.
+
+        Returns the locked file object, which the caller unlocks.
+        """
+        while True:
+            data = self._data
+            fcntl.flock(data, mode)
+            if os.fstat(data.fileno()).st_ino == os.stat(self.path).st_ino:
+                return data
+            fcntl.flock(data, fcntl.LOCK_UN)
+            self._retire(data)
+            self._data = self._open_data()
+            self._index = {}
+            self._index_offset = 0
+            self._end = HEADER.size
+
+    def _retire(self, data) -> None:
+        """Close a replaced data file, or keep it open until the reads using it finish; needs ``_lock``."""
+        self._retired.append(data)
+        self._close_retired()
+
+    def _close_retired(self) -> None:
+        if self._readers == 0:
+            for data in self._retired:
+                data.close()
+            self._retired = []
+
+    def _create(self, dictionary: bytes) -> None:
+        # Several processes may start at once; whoever holds the lock on .dict first creates the archive
+        with open(self.path + ".dict", "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.path.exists(self.path):
+                return
+            f.truncate(0)
+            f.write(dictionary)
+            f.flush()
+            open(self.path + ".idx", "w").close()
+            with open(self.path + ".tmp", "wb") as data:
+                data.write(HEADER.pack(MAGIC, dictionary_id(dictionary)))
+            os.replace(self.path + ".tmp", self.path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the in-process lock and the cross-process lock on the data file."""
+        with self._lock:
+            data = self._lock_current(fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if not data.closed:  # compact() closes the file it replaced, which drops the lock
+                    fcntl.flock(data, fcntl.LOCK_UN)
+
+    def _read_index(self) -> int:
+        """Load index lines added since the last read; returns the end of the last indexed record."""
+        if not os.path.exists(self.path + ".idx"):
+            return self._end
+        with open(self.path + ".idx", "rb") as f:
+            f.seek(self._index_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is still appending this line
+                key, offset, length = line.decode("utf-8").rstrip("\n").split("\t")
+                self._index[key] = (int(offset), int(length))
+                self._index_offset += len(line)
+                self._end = max(self._end, int(offset) + int(length))
+        return self._end
+
+    def _load_index(self) -> None:
+        with self._exclusive():
+            end = self._read_index()
+            size = os.fstat(self._data.fileno()).st_size
+            if end < size:
+                # The data file has records the index has not seen; recover them from the record headers
+                with open(self.path + ".idx", "a", encoding="utf-8") as index:
+                    for key, offset, length in self._scan(end):
+                        self._index[key] = (offset, length)
+                        index.write(f"{key}\t{offset}\t{length}\n")
+                        end = offset + length
+                self._end = end
+                self._index_offset = os.path.getsize(self.path + ".idx")
+                if end < size:
+                    # Drop a record torn by a crash so the next append starts on a record boundary
+                    self._data.truncate(end)
+
+    def refresh(self) -> None:
+        """Pick up records that other processes appended since this archive was opened."""
+        with self._lock:
+            data = self._lock_current(fcntl.LOCK_SH)
+            try:
+                self._read_index()
+            finally:
+                fcntl.flock(data, fcntl.LOCK_UN)
+
+    def _scan(self, start: int) -> Iterator[Tuple[str, int, int]]:
+        self._data.seek(start)
+        position = start
+        while True:
+            header = self._data.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            key_length, length = RECORD.unpack(header)
+            key = self._data.read(key_length).decode("utf-8")
+            offset = position + RECORD.size + key_length
+            if offset + length > os.fstat(self._data.fileno()).st_size:
+                return  # torn final record
+            self._data.seek(length, os.SEEK_CUR)
+            position = offset + length
+            yield key, offset, length
+
+    def _compress(self, document: bytes) -> bytes:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=self.dictionary)
+        return compressor.compress(document) + compressor.flush()
+
+    def _decompress(self, payload: bytes) -> bytes:
+        decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+        return decompressor.decompress(payload) + decompressor.flush()
+
+    def append(self, key: str, document: bytes) -> None:
+        """Add (or replace) the JSON document stored under ``key``."""
+        if "\t" in key or "\n" in key:
+            raise ArchiveError("Archive keys cannot contain tabs or newlines")
+        encoded_key = key.encode("utf-8")
+        payload = self._compress(document)
+        with self._exclusive():
+            self._read_index()
+            self._data.seek(0, os.SEEK_END)
+            position = self._data.tell()
+            self._data.write(RECORD.pack(len(encoded_key), len(payload)) + encoded_key + payload)
+            self._data.flush()
+            offset = position + RECORD.size + len(encoded_key)
+            line = f"{key}\t{offset}\t{len(payload)}\n"
+            with open(self.path + ".idx", "a", encoding="utf-8") as index:
+                index.write(line)
+            self._index[key] = (offset, len(payload))
+            self._index_offset += len(line.encode("utf-8"))
+            self._end = offset + len(payload)
+
+    def _start_read(self, key: str) -> Optional[Tuple[Tuple[int, int], object]]:
+        """The index entry of ``key`` and the data file it points into, counted as read until _end_read()."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._readers += 1
+            return entry, self._data
+
+    def _end_read(self) -> None:
+        with self._lock:
+            self._readers -= 1
+            self._close_retired()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The JSON document stored under ``key``, or None."""
+        found = self._start_read(key)
+        if found is None:
+            self.refresh()
+            found = self._start_read(key)
+            if found is None:
+                return None
+        (offset, length), data = found
+        try:
+            payload = os.pread(data.fileno(), length, offset)
+        finally:
+            self._end_read()
+        return self._decompress(payload)
+
+    def compact(self, drop: Collection[str] = (), if_larger_than: int = 0) -> int:
+        """Rewrite the archive without superseded records and the keys in ``drop``; returns bytes freed.
+
+        Nothing is done if the data file is no larger than ``if_larger_than``
+        once locked, e.g. because another process has just compacted it.
+        Records keep their order, so the oldest ones stay first.
+        """
+        with self._exclusive():
+            self._read_index()
+            before = os.fstat(self._data.fileno()).st_size
+            if before <= if_larger_than:
+                return 0
+            index: Dict[str, Tuple[int, int]] = {}
+            with open(self.path + ".tmp", "wb") as data, open(self.path + ".idx.tmp", "w", encoding="utf-8") as lines:
+                data.write(HEADER.pack(MAGIC, dictionary_id(self.dictionary)))
+                position = HEADER.size
+                for key, (offset, length) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                    if key in drop:
+                        continue
+                    encoded_key = key.encode("utf-8")
+                    payload = os.pread(self._data.fileno(), length, offset)
+                    data.write(RECORD.pack(len(encoded_key), length) + encoded_key + payload)
+                    position += RECORD.size + len(encoded_key)
+                    index[key] = (position, length)
+                    lines.write(f"{key}\t{position}\t{length}\n")
+                    position += length
+                data.flush()
+                os.fsync(data.fileno())
+            # The index goes first: a process that opens the new data file must find its index
+            os.replace(self.path + ".idx.tmp", self.path + ".idx")
+            os.replace(self.path + ".tmp", self.path)
+            self._retire(self._data)
+            self._data = self._open_data()
+            self._index = index
+            self._index_offset = os.path.getsize(self.path + ".idx")
+            self._end = position
+        return before - position
+
+    def entries(self) -> Dict[str, Tuple[int, int]]:
+        """(offset, length) of the latest record of every key; a later offset means a later append."""
+        with self._lock:
+            return dict(self._index)
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def size(self) -> int:
+        """Bytes in the data file, superseded records included."""
+        return os.fstat(self._data.fileno()).st_size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "courses": len(self._index),
+            "bytes": self.size(),
+            "dictionary_bytes": len(self.dictionary),
+        }
+
+    def close(self) -> None:
+        for data in self._retired:
+            data.close()
+        self._data.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage a dictionary-compressed course archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Create an archive with a dictionary trained on JSON courses")
+    train.add_argument("samples", nargs="+")
+    train.add_argument("--archive", required=True)
+    add = commands.add_parser("add", help="Append a JSON course")
+    add.add_argument("archive")
+    add.add_argument("file")
+    add.add_argument("--key", required=True)
+    get = commands.add_parser("get", help="Print the course stored under a key")
+    get.add_argument("archive")
+    get.add_argument("key")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        samples = []
+        for path in args.samples:
+            with open(path, "rb") as f:
+                samples.append(f.read())
+        archive = CourseArchive(args.archive, train_dictionary(samples))
+        print(f"Created {args.archive} with a {len(archive.dictionary)} byte dictionary")
+    elif args.command == "add":
+        archive = CourseArchive(args.archive)
+        with open(args.file, "rb") as f:
+            archive.append(args.key, f.read())
+    else:
+        document = CourseArchive(args.archive).get(args.key)
+        if document is None:
+            print(f"No course stored under {args.key}", file=sys.stderr)
+            return 1
+        sys.stdout.write(document.decode("utf-8") + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from loguru import logger
+from config import COURSE_CACHE_FLUSH_INTERVAL, COURSE_CACHE_MAX_BYTES, COURSE_CACHE_PATH, COURSE_CACHE_TTL
+from section_cache import normalize_topic
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS courses_accessed ON courses (accessed);
+"""
+
+def course_key(topic: str, level: str, days: int, *variants: str) -> str:
+    """Cache key of a course; ``variants`` name non-default generation options."""
+    return "|".join((normalize_topic(topic), level, str(days)) + variants)
+
+def is_cacheable(course) -> bool:
+    """Only fully AI-generated courses are shared; fallback content should not outlive an outage."""
+    return bool(course.section_sources) and "rule_based" not in course.section_sources.values()
+
+class SharedCourseCache:
+    """Course responses shared by every worker process on the host.
+
+    Entries are pre-serialised JSON response bodies stored in a SQLite
+    database in WAL mode, so readers in any process never block the writer
+    and a hit is served without deserialising or re-serialising the course.
+    Each put() is a single transaction: other processes see either the old
+    entry or the complete new one. The total body size is kept under
+    ``max_bytes`` by evicting the least recently used entries.
+
+    Lookups only read. Hits are noted in memory and their access times are
+    written in one batch by flush_access_times(), which put() and a periodic
+    task call; expired entries are deleted by put(). All methods block, so
+    async code runs them in an executor.
+    """
+
+    def __init__(self, path: str = COURSE_CACHE_PATH, max_bytes: int = COURSE_CACHE_MAX_BYTES,
+                 ttl: float = COURSE_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Let SQLite read pages straight from a shared memory map of the file
+        self._db.execute(f"PRAGMA mmap_size={max(max_bytes * 2, 1 << 24)}")
+        self._db.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored response body for ``key``, or None; the caller counts the hit or miss."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT body, created FROM courses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                row = None
+            if row is not None:
+                self._accessed[key] = now
+        return None if row is None else row[0]
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` has a live entry, without counting a hit or miss."""
+        with self._lock:
+            row = self._db.execute("SELECT created FROM courses WHERE key = ?", (key,)).fetchone()
+        return row is not None and not (self.ttl and time.time() - row[0] > self.ttl)
+
+    def put(self, key: str, body: bytes) -> None:
+        """Atomically publish ``body`` under ``key`` and evict down to max_bytes."""
+        if len(body) > self.max_bytes:
+            logger.warning("Course {} ({} bytes) is larger than the whole cache, not caching", key, len(body))
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_access_times()
+                if self.ttl:
+                    self._db.execute("DELETE FROM courses WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO courses (key, body, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(body), len(body), now, now),
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def flush_access_times(self) -> int:
+        """Write the access times of hits since the last flush; returns how many entries were touched."""
+        with self._lock:
+            if not self._accessed:
+                return 0
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                touched = self._write_access_times()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return touched
+
+    def _write_access_times(self) -> int:
+        accessed, self._accessed = self._accessed, {}
+        # Another worker may have recorded a later hit already
+        self._db.executemany(
+            "UPDATE courses SET accessed = ? WHERE key = ? AND accessed < ?",
+            [(at, key, at) for key, at in accessed.items()],
+        )
+        return len(accessed)
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM courses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM courses ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM courses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info("Evicted {} courses from the shared cache", evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM courses WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM courses").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+async def flush_access_times_periodically(cache: SharedCourseCache,
+                                          interval: float = COURSE_CACHE_FLUSH_INTERVAL) -> None:
+    """Write recorded hits to the cache every ``interval`` seconds; run as a background task.
+
+    The last hits are written when the task is cancelled at shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, cache.flush_access_times)
+            except sqlite3.Error as e:
+                logger.warning("Could not write course cache access times: {}", e)
+    finally:
+        try:
+            cache.flush_access_times()
+        except sqlite3.Error as e:
+            logger.warning("Could not write course cache access times: {}", e)
+
+_cache: Optional[SharedCourseCache] = None
+
+def get_course_cache() -> Optional[SharedCourseCache]:
+    """The process-wide shared cache, or None when COURSE_CACHE_PATH is empty."""
+    global _cache
+    if _cache is None and COURSE_CACHE_PATH:
+        _cache = SharedCourseCache()
+    return _cache
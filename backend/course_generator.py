@@ -1,10 +1,26 @@
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Tuple
 import json
-from models import CourseResponse, Module, Lesson, Quiz
-from config import AI_AVAILABLE, ERROR_MESSAGES
-from ai_service import AIService
-from json_utils import parse_json_response
+from pydantic import ValidationError
+from models import CourseOutline, CourseResponse, Module, ModuleOutline, Lesson, Quiz
+from config import (
+    AI_AVAILABLE,
+    ERROR_MESSAGES,
+    MAX_LESSONS_PER_MODULE,
+    MAX_QUIZZES,
+    MIN_QUIZZES,
+    PLAN_SOURCE,
+    QUIZ_SOURCE,
+    SECTION_REGENERATE_ATTEMPTS,
+)
+from ai_service import AIService, AIServiceError, COURSE_SECTIONS, OUTLINE_SECTIONS, expected_seconds
+from deadline import Deadline
+from generation_mode import GENERATION_MODE_SELECTOR
+from metrics import COURSE_FALLBACKS, COURSE_RESIZES, SECTION_FALLBACKS, VALIDATION_SECONDS
+from course_planner import plan_practice, plan_tasks
+from quiz_builder import build_quizzes
+from tracing import TRACER, traced
 from loguru import logger
 
 def validate_topic(topic: str) -> bool:
@@ -25,8 +41,19 @@ def validate_course_content(content: Dict) -> bool:
         
     return True
 
-async def generate_course(topic: str, level: str, days: int) -> CourseResponse:
-    """Main function: try AI first, then fallback."""
+@traced()
+async def generate_course(topic: str, level: str, days: int,
+                          deadline: Optional[Deadline] = None,
+                          quiz_source: Optional[str] = None,
+                          plan_source: Optional[str] = None) -> CourseResponse:
+    """Main function: try AI first, then fallback.
+
+    AI generation stops when ``deadline`` passes or is cancelled; whatever
+    is missing by then comes from the rule-based generator. ``quiz_source``
+    "local" derives the quizzes from the lessons instead of asking the LLM
+    (defaults to QUIZ_SOURCE); ``plan_source`` does the same for the tasks and
+    practice plan (defaults to PLAN_SOURCE).
+    """
     try:
         # Validate input
         validate_topic(topic)
@@ -34,18 +61,20 @@ async def generate_course(topic: str, level: str, days: int) -> CourseResponse:
         if AI_AVAILABLE:
             try:
                 logger.info("Attempting AI-based course generation")
-                return await generate_course_with_ai(topic, level, days)
+                return await generate_course_with_ai(topic, level, days, deadline, quiz_source, plan_source)
             except Exception as e:
-                logger.warning(f"AI generation failed with error: {e}")
+                logger.warning("AI generation failed with error: {}", e)
                 logger.info("Falling back to rule-based generation")
+                COURSE_FALLBACKS.inc()
         
         # Fallback to rule-based if AI is not available or fails
         return generate_course_rule_based(topic, level, days)
         
     except Exception as e:
-        logger.error(f"Course generation failed: {str(e)}")
+        logger.error("Course generation failed: {}", e)
         raise
 
+@traced()
 def generate_course_rule_based(topic: str, level: str, days: int) -> CourseResponse:
     """A rule-based course generator as a fallback."""
     logger.info("Using rule-based course generation")
@@ -57,134 +86,432 @@ def generate_course_rule_based(topic: str, level: str, days: int) -> CourseRespo
         else:  # Default to web development
             content = generate_web_dev_content()
         
-        # Validate content structure
-        validate_course_content(content)
+        with TRACER.span("build_models", source="rule_based"), VALIDATION_SECONDS.time(source="rule_based"):
+            # Validate content structure
+            validate_course_content(content)
         
-        # Create modules from content
-        modules = []
-        for module_data in content["modules"]:
-            lessons = []
-            for lesson_data in module_data["lessons"]:
-                lesson = Lesson(
-                    title=lesson_data["title"],
-                    explanation=lesson_data["explanation"],
-                    content=lesson_data["content"],
-                    coding_task=lesson_data["coding_task"],
-                    key_takeaway=lesson_data["key_takeaway"]
-                )
-                lessons.append(lesson)
+            # Create modules from content
+            modules = []
+            for module_data in content["modules"]:
+                lessons = []
+                for lesson_data in module_data["lessons"]:
+                    lesson = Lesson(
+                        title=lesson_data["title"],
+                        explanation=lesson_data["explanation"],
+                        content=lesson_data["content"],
+                        coding_task=lesson_data["coding_task"],
+                        key_takeaway=lesson_data["key_takeaway"]
+                    )
+                    lessons.append(lesson)
             
-            module = Module(
-                name=module_data["name"],
-                lessons=lessons
-            )
-            modules.append(module)
+                module = Module(
+                    name=module_data["name"],
+                    lessons=lessons
+                )
+                modules.append(module)
         
-        # Create quizzes from content
-        quizzes = [
-            Quiz(
-                question=quiz_data["question"],
-                options=quiz_data["options"],
-                correct_answer=quiz_data["correct_answer"]
-            )
-            for quiz_data in content["quizzes"]
-        ]
+            # Create quizzes from content
+            quizzes = [
+                Quiz(
+                    question=quiz_data["question"],
+                    options=quiz_data["options"],
+                    correct_answer=quiz_data["correct_answer"]
+                )
+                for quiz_data in content["quizzes"]
+            ]
         
-        # Create daily tasks
-        tasks = [f"Day {i+1}: Complete the daily module and practice exercises" for i in range(days)]
+            # Create daily tasks
+            tasks = [f"Day {i+1}: Complete the daily module and practice exercises" for i in range(days)]
         
-        # Create a practice plan
-        practice_plan = [
-            f"Daily: Study theory and complete coding exercises",
-            f"Weekly: Work on a small project applying learned concepts",
-            f"Monthly: Build a comprehensive project combining all skills"
-        ]
+            # Create a practice plan
+            practice_plan = [
+                f"Daily: Study theory and complete coding exercises",
+                f"Weekly: Work on a small project applying learned concepts",
+                f"Monthly: Build a comprehensive project combining all skills"
+            ]
         
-        return CourseResponse(
-            topic=topic,
-            level=level,
-            days=days,
-            modules=modules,
-            tasks=tasks,
-            quizzes=quizzes,
-            practice_plan=practice_plan
-        )
+            return CourseResponse(
+                topic=topic,
+                level=level,
+                days=days,
+                modules=modules,
+                tasks=tasks,
+                quizzes=quizzes,
+                practice_plan=practice_plan,
+                section_sources={section: "rule_based" for section in COURSE_SECTIONS}
+            )
     except Exception as e:
-        logger.error(f"Rule-based generation failed: {str(e)}")
+        logger.error("Rule-based generation failed: {}", e)
         raise ValueError(f"Failed to generate course content: {str(e)}")
 
-async def generate_course_with_ai(topic: str, level: str, days: int) -> CourseResponse:
-    """Generate a course using the AI service."""
+def salvage_modules(items: List) -> Tuple[List[Module], bool]:
+    """Keep every valid module, dropping lessons and modules that fail validation and trimming extra lessons."""
+    modules, complete = [], True
+    for module_data in items:
+        if not isinstance(module_data, dict):
+            complete = False
+            continue
+        lessons = []
+        for lesson_data in module_data.get("lessons") or []:
+            try:
+                lessons.append(Lesson(**lesson_data))
+            except (ValidationError, TypeError):
+                complete = False
+        if len(lessons) > MAX_LESSONS_PER_MODULE:
+            complete = False
+        try:
+            modules.append(Module(name=module_data.get("name", ""), lessons=lessons[:MAX_LESSONS_PER_MODULE]))
+        except ValidationError:
+            complete = False
+    return modules, complete
+
+def salvage_outline(items: List) -> Tuple[List[ModuleOutline], bool]:
+    """Keep every module outline that validates, trimming extra lesson titles."""
+    modules, complete = [], True
+    for module_data in items:
+        try:
+            lessons = module_data.get("lessons") or []
+            if len(lessons) > MAX_LESSONS_PER_MODULE:
+                complete = False
+            modules.append(ModuleOutline(name=module_data.get("name", ""), lessons=lessons[:MAX_LESSONS_PER_MODULE]))
+        except (ValidationError, TypeError, AttributeError):
+            complete = False
+    return modules, complete
+
+def fit_modules(modules: List, days: int, template: List[Module], outline: bool) -> Tuple[List, bool]:
+    """One module per day: extra modules are dropped and days without one are filled from the template.
+
+    The result is complete only if it already had one module per day; the
+    rule-based template may have fewer modules than days, so it can stay short.
+    """
+    if len(modules) == days:
+        return modules, True
+    fill = template[len(modules):days]
+    if outline:
+        fill = [ModuleOutline(**module.dict()) for module in fill]
+    return modules[:days] + fill, False
+
+def salvage_quizzes(items: List, template: List[Quiz]) -> Tuple[List[Quiz], bool]:
+    """Keep every valid quiz, topping up from the template to MIN_QUIZZES."""
+    quizzes, complete = [], True
+    for quiz_data in items:
+        try:
+            quizzes.append(Quiz(**quiz_data))
+        except (ValidationError, TypeError):
+            complete = False
+    if not quizzes:
+        return [], False
+    questions = {quiz.question for quiz in quizzes}
+    for quiz in template:
+        if len(quizzes) >= MIN_QUIZZES:
+            break
+        if quiz.question not in questions:
+            quizzes.append(quiz)
+            complete = False
+    if len(quizzes) > MAX_QUIZZES:
+        quizzes, complete = quizzes[:MAX_QUIZZES], False
+    return quizzes, complete
+
+def salvage_tasks(items: List, days: int) -> Tuple[List[str], bool]:
+    """Keep the generated tasks, adding a generic task for every day without one."""
+    tasks = [task for task in items if isinstance(task, str) and task.strip()]
+    if not tasks:
+        return [], False
+    complete = len(tasks) == len(items) and len(tasks) >= days
+    tasks += [f"Day {i+1}: Complete the daily module and practice exercises" for i in range(len(tasks), days)]
+    return tasks, complete
+
+def salvage_practice_plan(items: List, template: List[str]) -> Tuple[List[str], bool]:
+    """Keep Daily:/Weekly:/Monthly: entries, adding template entries for missing prefixes."""
+    prefixes = ("Daily:", "Weekly:", "Monthly:")
+    plan = [item for item in items if isinstance(item, str) and item.startswith(prefixes)]
+    if not plan:
+        return [], False
+    complete = len(plan) == len(items)
+    for prefix in prefixes:
+        if not any(item.startswith(prefix) for item in plan):
+            plan.extend(item for item in template if item.startswith(prefix))
+            complete = False
+    return plan, complete
+
+def salvage_section(section: str, items, days: int, template: CourseResponse) -> Tuple[Optional[List], str]:
+    """Validate one AI section, returning (value, source) or (None, "") if nothing is usable."""
+    if not isinstance(items, list) or not items:
+        return None, ""
+    if section in ("modules", "outline"):
+        value, complete = salvage_modules(items) if section == "modules" else salvage_outline(items)
+        if value:
+            value, fits = fit_modules(value, days, template.modules, section == "outline")
+            complete = complete and fits
+    elif section == "quizzes":
+        value, complete = salvage_quizzes(items, template.quizzes)
+    elif section == "tasks":
+        value, complete = salvage_tasks(items, days)
+    else:
+        value, complete = salvage_practice_plan(items, template.practice_plan)
+    if not value:
+        return None, ""
+    return value, "ai" if complete else "ai_partial"
+
+def sections_to_generate(sections: Tuple[str, ...], quiz_source: Optional[str],
+                         plan_source: Optional[str]) -> Tuple[str, ...]:
+    """The sections to ask the LLM for; the others are derived from the modules."""
+    derived = set()
+    if (quiz_source or QUIZ_SOURCE) == "local":
+        derived.add("quizzes")
+    if (plan_source or PLAN_SOURCE) == "local":
+        derived.update(("tasks", "practice_plan"))
+    return tuple(section for section in sections if section not in derived)
+
+def derive_quizzes(modules: List, template: CourseResponse, seed: str) -> Tuple[List[Quiz], str]:
+    """Quizzes built from the course's own lessons, topped up from the template if too few; returns (quizzes, source)."""
+    with TRACER.span("build_quizzes"), VALIDATION_SECONDS.time(source="derived"):
+        quizzes = build_quizzes(modules, seed=seed)
+        value, complete = salvage_quizzes([quiz.dict() for quiz in quizzes], template.quizzes)
+    if not value:
+        logger.warning("Using rule-based quizzes section")
+        value, source = template.quizzes, "rule_based"
+    else:
+        source = "derived" if complete else "derived_partial"
+    if source != "derived":
+        SECTION_FALLBACKS.inc(section="quizzes", source=source)
+    return value, source
+
+def derive_sections(sections: Dict, sources: Dict[str, str], generated: Tuple[str, ...], topic: str,
+                    level: str, days: int, template: CourseResponse) -> None:
+    """Fill in the sections that were not generated from the assembled modules."""
+    if "quizzes" not in generated:
+        sections["quizzes"], sources["quizzes"] = derive_quizzes(sections["modules"], template, topic)
+    if "tasks" not in generated:
+        with TRACER.span("plan_course"), VALIDATION_SECONDS.time(source="derived"):
+            sections["tasks"] = plan_tasks(sections["modules"], days)
+            sections["practice_plan"] = plan_practice(sections["modules"], days, level)
+        sources["tasks"] = sources["practice_plan"] = "derived"
+
+async def assemble_sections(ai_service: AIService, content: Dict, sections: Tuple[str, ...], topic: str,
+                            level: str, days: int, template: CourseResponse,
+                            deadline: Deadline) -> Tuple[Dict, Dict[str, str]]:
+    """Salvage, regenerate or fill from ``template`` every section; returns (sections, sources).
+
+    An outline is returned under "modules", the course field it stands in for.
+    """
+    values, sources = {}, {}
+    for section in sections:
+        with TRACER.span("build_models", source="ai", section=section), VALIDATION_SECONDS.time(source="ai"):
+            value, source = salvage_section(section, content.get(section), days, template)
+        attempts = 0
+        while (value is None and attempts < SECTION_REGENERATE_ATTEMPTS
+               and deadline.allows(expected_seconds(section))):
+            attempts += 1
+            logger.warning("Regenerating {} section (attempt {})", section, attempts)
+            try:
+                items = await ai_service.generate_section(section, topic, level, days, use_cache=False,
+                                                          deadline=deadline)
+            except AIServiceError as e:
+                logger.error("Regenerating {} failed: {}", section, e)
+                continue
+            with TRACER.span("build_models", source="ai", section=section), VALIDATION_SECONDS.time(source="ai"):
+                value, source = salvage_section(section, items, days, template)
+        field = "modules" if section == "outline" else section
+        if value is None:
+            logger.warning("Using rule-based {} section", section)
+            value, source = getattr(template, field), "rule_based"
+        if source != "ai":
+            SECTION_FALLBACKS.inc(section=section, source=source)
+        values[field], sources[field] = value, source
+
+    if all(source == "rule_based" for source in sources.values()):
+        raise ValueError("No usable sections were generated")
+    return values, sources
+
+async def generate_sections(ai_service: AIService, generated: Tuple[str, ...], topic: str, level: str, days: int,
+                            template: CourseResponse, deadline: Deadline) -> Tuple[Dict, Dict[str, str]]:
+    """Generate and assemble ``generated`` in the mode GENERATION_MODE_SELECTOR picks; returns (sections, sources).
+
+    The time to a complete set of sections, regenerations included, and
+    whether every section came out of the first generation valid are fed back
+    to the selector. Courses with cached sections are not measured.
+    """
+    mode = GENERATION_MODE_SELECTOR.choose(generated, days)
+    started = time.perf_counter()
+    if mode == "single":
+        content = await ai_service.generate_course_combined(topic, level, days, deadline, generated)
+    else:
+        content = await ai_service.generate_course_content(topic, level, days, deadline, generated)
+    if not content:
+        raise ValueError("AI service returned empty content")
+    success = False
+    try:
+        sections, sources = await assemble_sections(ai_service, content, generated, topic, level, days,
+                                                    template, deadline)
+        success = all(source == "ai" for source in sources.values()) and not content["failures"]
+        return sections, sources
+    finally:
+        if not content.get("cached"):
+            GENERATION_MODE_SELECTOR.record(mode, days, time.perf_counter() - started, success)
+
+@traced()
+async def generate_course_with_ai(topic: str, level: str, days: int,
+                                  deadline: Optional[Deadline] = None,
+                                  quiz_source: Optional[str] = None,
+                                  plan_source: Optional[str] = None) -> CourseResponse:
+    """Generate a course using the AI service.
+
+    Each section is validated on its own. A section that cannot be salvaged is
+    regenerated up to SECTION_REGENERATE_ATTEMPTS times and then filled from the
+    rule-based course, so one bad section does not discard the others.
+    Regeneration is skipped when ``deadline`` does not leave time for it.
+    With ``quiz_source`` "local" the quizzes, and with ``plan_source`` "local"
+    the tasks and practice plan, are derived from the modules.
+    """
+    deadline = deadline or Deadline()
     logger.info("Attempting to generate course using AI")
     
     ai_service = AIService()
     try:
-        content = await ai_service.generate_course_content(topic, level, days)
-        if not content:
-            raise ValueError("AI service returned empty content")
-            
-        # Validate content structure
-        validate_course_content(content)
+        generated = sections_to_generate(COURSE_SECTIONS, quiz_source, plan_source)
+        template = generate_course_rule_based(topic, level, days)
+        sections, sources = await generate_sections(ai_service, generated, topic, level, days, template, deadline)
+        derive_sections(sections, sources, generated, topic, level, days, template)
         
-        try:
-            # Create modules
-            modules_data = parse_json_response(content.get("modules", "[]"))
-            modules = []
-            for module_data in modules_data:
-                lessons = [
-                    Lesson(
-                        title=lesson["title"],
-                        explanation=lesson.get("explanation", "Detailed explanation to be added"),
-                        content=lesson["content"],
-                        coding_task=lesson.get("coding_task", "Practice task to be added"),
-                        key_takeaway=lesson.get("key_takeaway", "Key points to remember")
-                    )
-                    for lesson in module_data.get("lessons", [])
-                ]
-                modules.append(Module(name=module_data["name"], lessons=lessons))
-            
-            # Parse tasks
-            tasks = content.get("tasks", [])
-            if not tasks:
-                raise ValueError("No tasks generated")
-            
-            # Parse quizzes
-            quizzes_data = content.get("quizzes", [])
-            if not quizzes_data:
-                raise ValueError("No quizzes generated")
-                
-            quizzes = [
-                Quiz(
-                    question=quiz["question"],
-                    options=quiz["options"],
-                    correct_answer=quiz["correct_answer"]
-                )
-                for quiz in quizzes_data
-            ]
-            
-            # Parse practice plan
-            practice_plan = content.get("practice_plan", [])
-            if not practice_plan:
-                raise ValueError("No practice plan generated")
-            
+        with TRACER.span("build_models", source="ai"), VALIDATION_SECONDS.time(source="ai"):
             return CourseResponse(
                 topic=topic,
                 level=level,
                 days=days,
-                modules=modules,
-                tasks=tasks,
-                quizzes=quizzes,
-                practice_plan=practice_plan
+                section_sources=sources,
+                **sections
             )
             
-        except Exception as e:
-            logger.error(f"Error parsing AI-generated content: {e}")
-            raise ValueError(f"Failed to parse AI-generated content: {str(e)}")
-            
     except Exception as e:
-        logger.error(f"AI generation failed: {e}")
+        logger.error("AI generation failed: {}", e)
         raise ValueError(f"AI generation failed: {str(e)}")
 
+@traced()
+async def generate_course_outline(topic: str, level: str, days: int,
+                                  deadline: Optional[Deadline] = None,
+                                  quiz_source: Optional[str] = None,
+                                  plan_source: Optional[str] = None) -> CourseResponse:
+    """First phase of a two-phase course: module names and lesson titles without lesson bodies.
+
+    Tasks, quizzes and the practice plan are generated as usual (local quizzes
+    can only ask which day covers a lesson). Lesson bodies
+    come from generate_lesson_body when they are first requested. Without AI
+    (or if the outline pass fails) this is the complete rule-based course.
+    """
+    validate_topic(topic)
+    if AI_AVAILABLE:
+        deadline = deadline or Deadline()
+        ai_service = AIService()
+        try:
+            generated = sections_to_generate(OUTLINE_SECTIONS, quiz_source, plan_source)
+            template = generate_course_rule_based(topic, level, days)
+            sections, sources = await generate_sections(ai_service, generated, topic, level, days, template,
+                                                        deadline)
+            derive_sections(sections, sources, generated, topic, level, days, template)
+            with TRACER.span("build_models", source="ai"), VALIDATION_SECONDS.time(source="ai"):
+                return CourseOutline(topic=topic, level=level, days=days, section_sources=sources, **sections)
+        except Exception as e:
+            logger.warning("AI generation failed with error: {}", e)
+            logger.info("Falling back to rule-based generation")
+            COURSE_FALLBACKS.inc()
+    return generate_course_rule_based(topic, level, days)
+
+async def extend_section(ai_service: AIService, section: str, topic: str, level: str, days: int,
+                         names: List[str], deadline: Deadline) -> Tuple[List, bool]:
+    """The modules or tasks of the days after ``names``; returns (items, complete).
+
+    Modules are regenerated up to SECTION_REGENERATE_ATTEMPTS times until
+    every missing day has a valid one; tasks are topped up with generic ones.
+    """
+    missing = days - len(names)
+    attempts = 0
+    while True:
+        items = await ai_service.generate_extension(section, topic, level, days, names, deadline)
+        with TRACER.span("build_models", source="ai", section=section), VALIDATION_SECONDS.time(source="ai"):
+            if section == "tasks":
+                tasks, complete = salvage_tasks(items[:missing], 0)
+                tasks += [f"Day {day}: Complete the daily module and practice exercises"
+                          for day in range(len(names) + len(tasks) + 1, days + 1)]
+                return tasks, complete and len(tasks) == missing
+            modules, complete = salvage_modules(items)
+        if len(modules) >= missing:
+            return modules[:missing], complete and len(modules) == missing
+        attempts += 1
+        if attempts > SECTION_REGENERATE_ATTEMPTS or not deadline.allows(expected_seconds(section)):
+            raise AIServiceError(f"Only {len(modules)} of {missing} new modules are valid")
+        logger.warning("Regenerating modules for days {}-{} (attempt {})", len(names) + 1, days, attempts)
+
+@traced()
+async def resize_course(stored: Dict, topic: str, level: str, days: int,
+                        deadline: Optional[Deadline] = None,
+                        quiz_source: Optional[str] = None,
+                        plan_source: Optional[str] = None) -> CourseResponse:
+    """A ``days``-day course built from ``stored``, a course of the same topic and level with other days.
+
+    Trimming keeps the first ``days`` modules and tasks. Extending asks the LLM
+    only for the missing days' modules (and tasks when they are not derived),
+    with the stored module names as context. Derived sections are rebuilt
+    from the resized modules; AI quizzes and practice plans are kept.
+    """
+    validate_topic(topic)
+    deadline = deadline or Deadline()
+    stored_days = stored["days"]
+    sources = dict(stored.get("section_sources") or {})
+    modules, tasks = list(stored["modules"]), list(stored["tasks"])
+    generated = sections_to_generate(COURSE_SECTIONS, quiz_source, plan_source)
+    if days <= stored_days:
+        kind = "trimmed"
+        modules, tasks = modules[:days], tasks[:days]
+    else:
+        kind = "extended"
+        if not AI_AVAILABLE:
+            raise ValueError("Extending a course needs the AI service")
+        if len(modules) != stored_days:
+            raise ValueError(f"Stored course has {len(modules)} modules for {stored_days} days")
+        ai_service = AIService()
+        names = [module["name"] for module in modules]
+        new_modules, complete = await extend_section(ai_service, "modules", topic, level, days, names, deadline)
+        modules += [module.dict() for module in new_modules]
+        if not complete:
+            sources["modules"] = "ai_partial"
+        if "tasks" in generated:
+            new_tasks, complete = await extend_section(ai_service, "tasks", topic, level, days, names, deadline)
+            tasks = tasks[:stored_days] + new_tasks
+            if not complete:
+                sources["tasks"] = "ai_partial"
+
+    template = generate_course_rule_based(topic, level, days)
+    sections = {"modules": modules, "tasks": tasks, "quizzes": stored["quizzes"],
+                "practice_plan": stored["practice_plan"]}
+    derive_sections(sections, sources, generated, topic, level, days, template)
+    with TRACER.span("build_models", source="ai"), VALIDATION_SECONDS.time(source="ai"):
+        course = CourseResponse(topic=topic, level=level, days=days, section_sources=sources, **sections)
+    COURSE_RESIZES.inc(kind=kind)
+    logger.info("Built a {}-day course from a stored {}-day course ({})", days, stored_days, kind)
+    return course
+
+async def generate_lesson_body(topic: str, level: str, module: Dict, index: int,
+                               deadline: Optional[Deadline] = None) -> Dict:
+    """Second phase of a two-phase course: the full lesson ``index`` of an outline module.
+
+    An invalid lesson is regenerated up to SECTION_REGENERATE_ATTEMPTS times.
+    """
+    deadline = deadline or Deadline()
+    titles = [lesson["title"] for lesson in module["lessons"]]
+    ai_service = AIService()
+    attempts = 0
+    while True:
+        lesson_data = await ai_service.generate_lesson(topic, level, module["name"], titles[index], titles, deadline)
+        try:
+            # Keep the title from the outline so the lesson matches what the client already shows
+            return Lesson(**{**lesson_data, "title": titles[index]}).dict()
+        except (ValidationError, TypeError) as e:
+            attempts += 1
+            if attempts > SECTION_REGENERATE_ATTEMPTS or not deadline.allows(expected_seconds("lesson")):
+                raise AIServiceError(f"Generated lesson {titles[index]} is invalid: {e}")
+            logger.warning("Regenerating lesson {} (attempt {})", titles[index], attempts)
+
 def generate_cpp_content():
     """Generate C++ course content as an example."""
     return {
@@ -221,6 +548,36 @@ int main() {
 }
 ```""",
                         "key_takeaway": "C++ combines the efficiency of C with object-oriented features, making it ideal for both system-level and application development."
+                    },
+                    {
+                        "title": "Control Flow in C++",
+                        "explanation": """Control flow statements decide which parts of a program run and how often.
+C++ provides the same control structures as C:
+1. if / else for conditional execution
+2. switch for choosing between many constant values
+3. for, while and do-while loops for repetition
+4. break and continue to leave or skip loop iterations
+Combining these statements lets a program react to input and process collections of data.""",
+                        "content": "Conditional statements, loops and basic program flow in C++",
+                        "coding_task": """Write a C++ program that:
+1. Reads a number from the user
+2. Prints whether it is even or odd
+3. Prints all numbers from 1 up to that number using a loop""",
+                        "key_takeaway": "Conditions and loops are the building blocks for every non-trivial C++ program."
+                    },
+                    {
+                        "title": "Functions in C++",
+                        "explanation": """Functions group statements into reusable, named units of work.
+A C++ function has a return type, a name, a parameter list and a body.
+Parameters can be passed by value, by reference or by pointer.
+Functions can be overloaded when their parameter lists differ.
+Declaring functions before use, often in header files, lets the compiler check every call.""",
+                        "content": "Declaring, defining and calling functions, parameters and return values",
+                        "coding_task": """Write a C++ program with:
+1. A function that returns the larger of two integers
+2. A function that swaps two integers using references
+3. A main function that calls both and prints the results""",
+                        "key_takeaway": "Small, well-named functions make C++ programs easier to read, test and reuse."
                     }
                 ]
             }
@@ -235,6 +592,26 @@ int main() {
                     "Platform independence"
                 ],
                 "correct_answer": "Automatic garbage collection"
+            },
+            {
+                "question": "Which loop always runs its body at least once?",
+                "options": [
+                    "for",
+                    "while",
+                    "do-while",
+                    "range-based for"
+                ],
+                "correct_answer": "do-while"
+            },
+            {
+                "question": "How do you pass an argument so the function can modify the caller's variable?",
+                "options": [
+                    "By value",
+                    "By reference",
+                    "As a constant",
+                    "As a default argument"
+                ],
+                "correct_answer": "By reference"
             }
         ],
         "tasks": ["Day 1: Complete introduction to C++ module"],
@@ -255,12 +632,10 @@ def generate_web_dev_content():
                     {
                         "title": "Understanding Web Development Fundamentals",
                         "explanation": """Web development is the process of creating websites and web applications. It encompasses several key technologies and concepts that work together to deliver content on the internet.
-
 The three core technologies of web development are:
 1. HTML (HyperText Markup Language) - Structures the content
 2. CSS (Cascading Style Sheets) - Styles the presentation
 3. JavaScript - Adds interactivity and dynamic behavior
-
 Modern web development also includes:
 - Frontend frameworks like React and Vue.js
 - Backend technologies like Node.js and Python
@@ -286,6 +661,34 @@ Example structure:
 </html>
 ```""",
                         "key_takeaway": "Web development combines HTML, CSS, and JavaScript to create interactive websites."
+                    },
+                    {
+                        "title": "Styling Pages with CSS",
+                        "explanation": """CSS describes how HTML elements are displayed on screen.
+Rules are made of a selector and a block of property declarations.
+Selectors can target elements, classes, ids and element states.
+The cascade and specificity decide which rule wins when several apply.
+Layout tools such as Flexbox and Grid arrange elements on the page.""",
+                        "content": "Selectors, the box model, colours, fonts and basic layouts",
+                        "coding_task": """Style the webpage from the previous lesson:
+1. Add an external stylesheet
+2. Give the header a background colour and centred title
+3. Lay out the navigation links horizontally with Flexbox""",
+                        "key_takeaway": "Keeping styles in CSS separates presentation from the structure defined in HTML."
+                    },
+                    {
+                        "title": "Adding Interactivity with JavaScript",
+                        "explanation": """JavaScript runs in the browser and makes pages respond to the user.
+Scripts can read and change the page through the Document Object Model (DOM).
+Event listeners run code when the user clicks, types or scrolls.
+Variables, functions and objects work much like in other programming languages.
+Modern JavaScript also supports modules, classes and asynchronous code with promises.""",
+                        "content": "Variables, functions, DOM manipulation and event handling",
+                        "coding_task": """Add a script to your webpage that:
+1. Shows a greeting when a button is clicked
+2. Toggles a dark theme class on the body
+3. Counts and displays how many times the button was clicked""",
+                        "key_takeaway": "JavaScript turns static pages into interactive applications by reacting to user events."
                     }
                 ]
             }
@@ -300,6 +703,26 @@ Example structure:
                     "Python"
                 ],
                 "correct_answer": "CSS"
+            },
+            {
+                "question": "Which technology structures the content of a web page?",
+                "options": [
+                    "HTML",
+                    "CSS",
+                    "SQL",
+                    "Git"
+                ],
+                "correct_answer": "HTML"
+            },
+            {
+                "question": "What does JavaScript use to react to a button click?",
+                "options": [
+                    "A CSS selector",
+                    "An event listener",
+                    "A meta tag",
+                    "A database trigger"
+                ],
+                "correct_answer": "An event listener"
             }
         ],
         "tasks": ["Day 1: Complete introduction to web development module"],
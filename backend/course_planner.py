@@ -0,0 +1,72 @@
+"""Daily tasks and practice plan built from a course's modules instead of LLM calls.
+
+Both sections are formulaic: one "Day N: ..." task per day and
+"Daily:/Weekly:/Monthly:" practice entries. Deriving them from the module
+names and lesson titles gives course-specific text that satisfies the
+CourseResponse validators by construction.
+"""
+import re
+from typing import List, Sequence
+from models import field_value
+
+DAY_PREFIX = re.compile(r"^\s*(?:day|week)\s*\d+\s*[:.\-–]\s*", re.IGNORECASE)
+LESSON_PREFIX = re.compile(r"^\s*lesson\s*[\d.]+\s*[:.\-–]\s*", re.IGNORECASE)
+
+DAILY_TIME = {"beginner": "45 minutes", "intermediate": "an hour", "advanced": "90 minutes"}
+# Weeks listed one by one in the practice plan; longer courses are summarised
+MAX_WEEKLY_ENTRIES = 5
+
+def module_topic(module) -> str:
+    """Module name without a leading "Day N:" label."""
+    name = field_value(module, "name") or ""
+    return DAY_PREFIX.sub("", name).strip() or name.strip()
+
+def lesson_titles(module) -> List[str]:
+    titles = []
+    for lesson in field_value(module, "lessons") or []:
+        title = field_value(lesson, "title") or ""
+        titles.append(LESSON_PREFIX.sub("", title).strip() or title.strip())
+    return titles
+
+def module_for_day(modules: Sequence, day: int, days: int):
+    """The module taught on ``day`` (1-based); spreads fewer modules than days evenly."""
+    if len(modules) >= days:
+        return modules[day - 1]
+    return modules[(day - 1) * len(modules) // days]
+
+def _join(items: List[str]) -> str:
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+def plan_tasks(modules: Sequence, days: int) -> List[str]:
+    """One task per day naming that day's module and lessons."""
+    tasks = []
+    for day in range(1, days + 1):
+        module = module_for_day(modules, day, days)
+        titles = lesson_titles(module)
+        if len(modules) < days and titles:
+            # Several days share a module: give each day its own lesson
+            first = next(d for d in range(1, days + 1) if module_for_day(modules, d, days) is module)
+            titles = [titles[(day - first) % len(titles)]]
+        work = f"Study {_join(titles)}" if titles else "Study the lessons"
+        tasks.append(f"Day {day}: {module_topic(module)} - {work}, then complete the coding tasks")
+    return tasks
+
+def plan_practice(modules: Sequence, days: int, level: str) -> List[str]:
+    """Daily, weekly and monthly practice built around the course's modules."""
+    daily = DAILY_TIME.get(level, "an hour")
+    plan = [f"Daily: Spend {daily} on the day's lessons, finish the coding task and write down the key takeaway"]
+    weeks = (days + 6) // 7
+    for week in range(1, min(weeks, MAX_WEEKLY_ENTRIES) + 1):
+        first, last = (week - 1) * 7 + 1, min(week * 7, days)
+        if week == MAX_WEEKLY_ENTRIES and weeks > week:
+            last = days
+        topics = list(dict.fromkeys(module_topic(module_for_day(modules, day, days)) for day in range(first, last + 1)))
+        span = f"day {first}" if first == last else f"days {first}-{last}"
+        plan.append(f"Weekly: Build a small project that uses {_join(topics[:3])} ({span})")
+    topics = list(dict.fromkeys(module_topic(module) for module in modules))
+    highlights = topics[:2] + topics[-1:] if len(topics) > 3 else topics
+    plan.append(f"Monthly: Build one larger project that brings together {_join(highlights)} "
+                f"and revisit every key takeaway")
+    return plan
@@ -0,0 +1,261 @@
+"""Generated courses kept by id so clients can fetch them piece by piece.
+
+Every course served by /generate-course is appended to a CourseArchive under
+a random id. The /courses endpoints then return an outline first and single
+modules or the quizzes on demand, so the first paint of a 30-day course does
+not wait for (or download) every lesson body.
+
+Courses put in the shared course cache are also indexed by their
+course_key, so a request for the same topic and level with a different
+number of days can start from the closest stored course (see
+find_resizable).
+
+Two-phase courses are stored as an outline whose lessons only have titles.
+A lesson body is generated the first time its module or lesson is requested
+and memoised in the archive under lesson_key(), so every worker serves the
+same body afterwards.
+
+The archive is kept under COURSE_STORE_MAX_BYTES: when an append takes it
+over, it is compacted down to COMPACT_TARGET of that, dropping the oldest
+courses together with their lesson bodies and index records. The shared
+cache entries those index records name are deleted too, so no cached
+response links to a course that is gone.
+"""
+import asyncio
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from loguru import logger
+from config import COURSE_STORE_MAX_BYTES, COURSE_STORE_PARSED_ENTRIES, COURSE_STORE_PATH
+from course_archive import CourseArchive, train_dictionary
+from course_cache import SharedCourseCache, course_key, get_course_cache
+
+# Longest course CourseResponse accepts
+MAX_DAYS = 30
+
+LEVELS = ("beginner", "intermediate", "advanced")
+# Share of COURSE_STORE_MAX_BYTES left after a compaction, so the next one is many courses away
+COMPACT_TARGET = 0.75
+# Prefix of the archive keys that map a course_key to a course id
+INDEX_PREFIX = "key:"
+
+def new_course_id() -> str:
+    return secrets.token_hex(8)
+
+def seed_dictionary() -> bytes:
+    """Train the archive dictionary on rule-based courses, which share their shape with AI ones."""
+    from course_generator import generate_course_rule_based
+    samples = [
+        generate_course_rule_based(topic, level, days).json().encode("utf-8")
+        for topic in ("C++", "Web Development")
+        for level in LEVELS
+        for days in (1, 7, 30)
+    ]
+    return train_dictionary(samples)
+
+def lesson_key(course_id: str, number: int, index: int) -> str:
+    return f"{course_id}/{number}/{index}"
+
+def is_expanded(lesson: Dict) -> bool:
+    return "explanation" in lesson
+
+def index_key(key: str) -> str:
+    """Archive key under which the id of the course stored for a course_key is kept."""
+    return INDEX_PREFIX + key
+
+def owner(key: str) -> str:
+    """The course id an archive key belongs to: the course itself or one of its lesson bodies."""
+    return key.split("/", 1)[0]
+
+def resize_candidates(days: int, max_days: int = MAX_DAYS) -> List[int]:
+    """Stored course lengths worth starting from, best first.
+
+    Longer courses come first because trimming needs no LLM call; then the
+    longest shorter course, which leaves the fewest days to generate.
+    """
+    return list(range(days + 1, max_days + 1)) + list(range(days - 1, 0, -1))
+
+def module_path(course_id: str, number: int) -> str:
+    return f"/courses/{course_id}/modules/{number}"
+
+def course_outline(course_id: str, course: Dict) -> Dict:
+    """Everything needed to render the course skeleton: names, titles and counts but no lesson bodies."""
+    return {
+        "course_id": course_id,
+        "topic": course["topic"],
+        "level": course["level"],
+        "days": course["days"],
+        "section_sources": course.get("section_sources", {}),
+        "modules": [
+            {
+                "number": number,
+                "name": module["name"],
+                "lessons": [lesson["title"] for lesson in module["lessons"]],
+                "href": module_path(course_id, number),
+            }
+            for number, module in enumerate(course["modules"], start=1)
+        ],
+        "tasks": course["tasks"],
+        "practice_plan": course["practice_plan"],
+        "quiz_count": len(course["quizzes"]),
+        "quizzes_href": f"/courses/{course_id}/quizzes",
+    }
+
+class CourseStore:
+    """Stored course JSON by id, with the most recently read courses kept parsed.
+
+    Methods that touch the archive block; async code runs them in an executor.
+    """
+
+    def __init__(self, path: str = COURSE_STORE_PATH, parsed_entries: int = COURSE_STORE_PARSED_ENTRIES,
+                 max_bytes: int = COURSE_STORE_MAX_BYTES, cache: Optional[SharedCourseCache] = None):
+        self.archive = CourseArchive(path, None if os.path.exists(path) else seed_dictionary())
+        self.parsed_entries = parsed_entries
+        self.max_bytes = max_bytes
+        # Shared cache whose entries carry the ids of courses stored here
+        self.cache = cache
+        self._parsed: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Lesson generations in flight, so concurrent requests for one lesson share a single LLM call
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def save(self, course_id: str, body: bytes, key: Optional[str] = None) -> None:
+        """Store a serialised course response, indexed under its course_key if ``key`` is given.
+
+        Pass ``key`` whenever the response is put in the shared cache under it.
+        """
+        self.archive.append(course_id, body)
+        if key is not None:
+            self.archive.append(index_key(key), course_id.encode("utf-8"))
+        self._enforce_limit()
+
+    def _enforce_limit(self) -> None:
+        if self.archive.size() <= self.max_bytes:
+            return
+        entries = self.archive.entries()
+        # Index records point at a course by id; resolve them before choosing what to drop
+        targets = {key: self.archive.get(key).decode("utf-8") for key in entries if key.startswith(INDEX_PREFIX)}
+        sizes: Dict[str, int] = {}
+        for key, (_, length) in entries.items():
+            course_id = targets.get(key) or owner(key)
+            sizes[course_id] = sizes.get(course_id, 0) + length
+        # Lesson bodies and index records whose course is gone already go first, then the oldest courses
+        dropped: Set[str] = {course_id for course_id in sizes if course_id not in entries}
+        kept = sum(size for course_id, size in sizes.items() if course_id not in dropped)
+        for _, course_id in sorted((entries[course_id][0], course_id) for course_id in sizes if course_id in entries):
+            if kept <= self.max_bytes * COMPACT_TARGET:
+                break
+            dropped.add(course_id)
+            kept -= sizes[course_id]
+        drop = {key for key in entries if (targets.get(key) or owner(key)) in dropped}
+        freed = self.archive.compact(drop, if_larger_than=self.max_bytes)
+        if freed:
+            with self._lock:
+                for course_id in dropped:
+                    self._parsed.pop(course_id, None)
+            if self.cache:
+                for key in drop:
+                    if key.startswith(INDEX_PREFIX):
+                        self.cache.delete(key[len(INDEX_PREFIX):])
+            logger.info("Compacted the course store: dropped {} courses, freed {} bytes", len(dropped), freed)
+
+    def find_resizable(self, topic: str, level: str, days: int, variants: Sequence[str] = ()) -> Optional[Dict]:
+        """The stored course of ``topic`` and ``level`` with other days that is cheapest to resize, or None."""
+        self.archive.refresh()
+        for candidate in resize_candidates(days):
+            key = index_key(course_key(topic, level, candidate, *variants))
+            if key not in self.archive:
+                continue
+            course = self.load(self.archive.get(key).decode("utf-8"))
+            if course is not None:
+                return course
+        return None
+
+    def load(self, course_id: str) -> Optional[Dict]:
+        """The stored course as a dict, or None for an unknown id."""
+        with self._lock:
+            course = self._parsed.get(course_id)
+            if course is not None:
+                self._parsed.move_to_end(course_id)
+                return course
+        body = self.archive.get(course_id)
+        if body is None:
+            return None
+        course = json.loads(body)
+        with self._lock:
+            self._parsed[course_id] = course
+            while len(self._parsed) > self.parsed_entries:
+                self._parsed.popitem(last=False)
+        return course
+
+    def has_lesson(self, course_id: str, number: int, index: int) -> bool:
+        """Whether a lesson body is memoised or being generated in this process."""
+        key = lesson_key(course_id, number, index)
+        if key in self._pending or key in self.archive:
+            return True
+        self.archive.refresh()
+        return key in self.archive
+
+    async def lesson(self, course_id: str, course: Dict, number: int, index: int,
+                     generate: Callable[[Dict, int], Awaitable[Dict]]) -> Dict:
+        """Lesson ``index`` of module ``number`` with its body, generating and memoising it if needed.
+
+        ``generate(module, index)`` produces a missing body. It keeps running if
+        the caller is cancelled so the work is not lost.
+        """
+        lesson = course["modules"][number - 1]["lessons"][index]
+        if is_expanded(lesson):
+            return lesson
+        key = lesson_key(course_id, number, index)
+        pending = self._pending.get(key)
+        if pending is None:
+            body = await asyncio.get_running_loop().run_in_executor(None, self.archive.get, key)
+            if body is not None:
+                return json.loads(body)
+            pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(
+                self._generate_lesson(key, course["modules"][number - 1], index, generate)
+            )
+            pending.add_done_callback(lambda future: self._forget(key, future))
+        return await asyncio.shield(pending)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # retrieved here so a failure nobody awaited is not reported as unhandled
+
+    async def _generate_lesson(self, key: str, module: Dict, index: int,
+                               generate: Callable[[Dict, int], Awaitable[Dict]]) -> Dict:
+        lesson = await generate(module, index)
+        body = json.dumps(lesson, ensure_ascii=False).encode("utf-8")
+        await asyncio.get_running_loop().run_in_executor(None, self._append_lesson, key, body)
+        return lesson
+
+    def _append_lesson(self, key: str, body: bytes) -> None:
+        self.archive.append(key, body)
+        self._enforce_limit()
+
+    async def module(self, course_id: str, course: Dict, number: int,
+                     generate: Callable[[Dict, int], Awaitable[Dict]]) -> Dict:
+        """Module ``number`` (1-based) with every lesson body."""
+        module = course["modules"][number - 1]
+        lessons = await asyncio.gather(*(
+            self.lesson(course_id, course, number, index, generate) for index in range(len(module["lessons"]))
+        ))
+        return {"name": module["name"], "lessons": list(lessons)}
+
+    def close(self) -> None:
+        self.archive.close()
+
+_store: Optional[CourseStore] = None
+
+def get_course_store() -> Optional[CourseStore]:
+    """The process-wide course store, or None when COURSE_STORE_PATH is empty."""
+    global _store
+    if _store is None and COURSE_STORE_PATH:
+        _store = CourseStore(cache=get_course_cache())
+    return _store
@@ -0,0 +1,87 @@
+import asyncio
+import math
+import time
+from contextlib import suppress
+from typing import Awaitable, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+class DeadlineExceeded(Exception):
+    """Raised when a request ran out of time or its client went away"""
+    pass
+
+class Deadline:
+    """Time budget of one request, shared by everything working on it.
+
+    The budget ends when ``timeout`` seconds have passed or when cancel() is
+    called (e.g. because the client disconnected). Awaitables run through
+    run() are cancelled at that moment.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = time.monotonic() + timeout if timeout else math.inf
+        self.reason = ""
+        self._cancelled = asyncio.Event()
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def allows(self, estimate: float) -> bool:
+        """Whether work expected to take ``estimate`` seconds can still finish in time."""
+        return self.remaining() > estimate
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(self.reason or "deadline")
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await ``awaitable``, cancelling it when the deadline passes or is cancelled."""
+        if self.expired:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(self.reason or "deadline")
+        task = asyncio.ensure_future(awaitable)
+        waiter = asyncio.ensure_future(self._cancelled.wait())
+        remaining = self.remaining()
+        try:
+            done, _ = await asyncio.wait(
+                {task, waiter},
+                timeout=None if remaining == math.inf else remaining,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            waiter.cancel()
+        if task in done:
+            return task.result()
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+        raise DeadlineExceeded(self.reason or "deadline")
+
+async def watch_disconnect(request, deadline: Deadline, interval: float = 0.5) -> None:
+    """Cancel ``deadline`` once the HTTP client of ``request`` disconnects; run as a task."""
+    while not deadline.expired:
+        if await request.is_disconnected():
+            logger.warning("Client disconnected, cancelling course generation")
+            deadline.cancel("disconnected")
+            return
+        await asyncio.sleep(interval)
@@ -0,0 +1,132 @@
+"""Choice between generating a course with one LLM call or one call per section.
+
+A single call pays prompt evaluation and model setup once, which wins for
+short courses; a long course asked for in one go risks truncation and loses
+every section when its JSON is broken, so it is split. Between those limits
+the selector measures both modes per course length and picks the one with the
+lowest expected time per successful course (mean seconds / success rate).
+
+Choices are counted in course_generation_mode_total with the reason:
+    configured   GENERATION_MODE forces a mode
+    one_section  only one section is generated, the modes are the same
+    too_large    too many lessons or too many output tokens for one call
+    exploring    a mode has too few measurements for this course length
+    measured     picked from the measurements
+"""
+import threading
+from typing import Dict, Optional, Tuple
+from adaptive import Explorer, ema
+from config import (
+    GENERATION_MODE,
+    GENERATION_MODE_MIN_SAMPLES,
+    MAX_LESSONS_PER_MODULE,
+    SINGLE_CALL_MAX_LESSONS,
+)
+from metrics import GENERATION_MODES
+from token_budget import TOKEN_BUDGETER, TokenBudgeter, section_units
+
+MODES = ("single", "multi")
+# Upper bounds (in days) of the course lengths measured separately
+DAY_BUCKETS = (1, 3, 7, 14)
+
+def day_bucket(days: int) -> str:
+    lower = 1
+    for upper in DAY_BUCKETS:
+        if days <= upper:
+            return str(upper) if lower == upper else f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+class _ModeStats:
+    """Running latency and success rate of one mode for one course length."""
+
+    def __init__(self):
+        self.samples = 0
+        self.seconds = 0.0
+        self.success_rate = 1.0
+
+    def observe(self, seconds: float, success: bool) -> None:
+        # The first measurement replaces the initial values instead of being averaged with them
+        first = self.samples == 0
+        self.samples += 1
+        self.seconds = ema(None if first else self.seconds, seconds)
+        self.success_rate = ema(None if first else self.success_rate, float(success))
+
+    def cost(self) -> float:
+        """Expected seconds per successful course."""
+        return self.seconds / max(self.success_rate, 0.05)
+
+class GenerationModeSelector:
+    """Picks single- or multi-call generation per course and learns from the outcome."""
+
+    def __init__(
+        self,
+        preferred: str = GENERATION_MODE,
+        max_lessons: int = SINGLE_CALL_MAX_LESSONS,
+        min_samples: int = GENERATION_MODE_MIN_SAMPLES,
+        budgeter: Optional[TokenBudgeter] = None,
+    ):
+        self.preferred = preferred if preferred in MODES else "auto"
+        self.max_lessons = max_lessons
+        self.min_samples = min_samples
+        self.budgeter = budgeter or TOKEN_BUDGETER
+        self._stats: Dict[Tuple[str, str], _ModeStats] = {}
+        self._explorer = Explorer()
+        self._lock = threading.Lock()
+
+    def _mode_stats(self, mode: str, bucket: str) -> _ModeStats:
+        stats = self._stats.get((mode, bucket))
+        if stats is None:
+            stats = self._stats[(mode, bucket)] = _ModeStats()
+        return stats
+
+    def too_large(self, sections: Tuple[str, ...], days: int) -> bool:
+        """Whether one call for ``sections`` would exceed the lesson limit or the token cap."""
+        if "modules" in sections and days * MAX_LESSONS_PER_MODULE > self.max_lessons:
+            return True
+        tokens = sum(self.budgeter.budget(section, section_units(section, days)) for section in sections)
+        return tokens > self.budgeter.cap
+
+    def _choose(self, sections: Tuple[str, ...], days: int) -> Tuple[str, str]:
+        if self.preferred != "auto":
+            return self.preferred, "configured"
+        if len(sections) < 2:
+            return "multi", "one_section"
+        if self.too_large(sections, days):
+            return "multi", "too_large"
+        bucket = day_bucket(days)
+        with self._lock:
+            stats = {mode: self._mode_stats(mode, bucket) for mode in MODES}
+            untried = [mode for mode in MODES if stats[mode].samples < self.min_samples]
+            if untried:
+                return min(untried, key=lambda mode: stats[mode].samples), "exploring"
+            best = min(MODES, key=lambda mode: stats[mode].cost())
+            if self._explorer.due(bucket):
+                return MODES[1 - MODES.index(best)], "exploring"
+            return best, "measured"
+
+    def choose(self, sections: Tuple[str, ...], days: int) -> str:
+        """The mode to generate ``sections`` of a ``days``-day course with."""
+        mode, reason = self._choose(sections, days)
+        GENERATION_MODES.inc(mode=mode, reason=reason)
+        return mode
+
+    def record(self, mode: str, days: int, seconds: float, success: bool) -> None:
+        """Fold one generation into the measurements; ``success`` means no section needed a fallback."""
+        with self._lock:
+            self._mode_stats(mode, day_bucket(days)).observe(seconds, success)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Measurements by course length and mode."""
+        with self._lock:
+            report: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (mode, bucket), stats in self._stats.items():
+                if stats.samples:
+                    report.setdefault(bucket, {})[mode] = {
+                        "samples": stats.samples,
+                        "seconds": stats.seconds,
+                        "success_rate": stats.success_rate,
+                    }
+            return report
+
+GENERATION_MODE_SELECTOR = GenerationModeSelector()
@@ -0,0 +1,158 @@
+"""Hedged LLM calls: a call that runs past its usual duration is duplicated.
+
+The hedge delay is the HEDGE_PERCENTILE latency of the section's recent
+calls (per budget unit, so a 30-day module list is not compared with a
+1-day one). When a call has not finished by then, the same request is sent
+to the next server in HEDGE_HOSTS, or to another slot of the same server if
+none are configured. The first valid response wins and the other call is
+cancelled.
+
+Hedges are paid from a token bucket that earns HEDGE_BUDGET credits per call
+and holds at most MAX_HEDGE_CREDITS, so hedging adds at most that share of
+extra calls even when the server is slow for everyone.
+
+Outcomes are counted in ai_hedged_requests_total:
+    primary_won  the original call finished first after a hedge was sent
+    hedge_won    the duplicate finished first
+    no_budget    a call was slow but the budget was used up
+"""
+import asyncio
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from config import HEDGE_BUDGET, HEDGE_HOSTS, HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE
+from metrics import AI_HEDGES
+
+T = TypeVar("T")
+
+# Recent calls per section the percentile is computed over
+WINDOW_SIZE = 200
+# Hedges that can be saved up while calls are fast
+MAX_HEDGE_CREDITS = 5.0
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+class Hedger:
+    """Decides when to duplicate a slow call and races the copies."""
+
+    def __init__(
+        self,
+        budget: float = HEDGE_BUDGET,
+        pct: float = HEDGE_PERCENTILE,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        min_delay: float = HEDGE_MIN_DELAY,
+        hosts: Optional[List[str]] = None,
+    ):
+        self.budget = budget
+        self.pct = pct
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.hosts = list(HEDGE_HOSTS if hosts is None else hosts)
+        self.credits = 0.0
+        self._next_host = itertools.cycle(self.hosts) if self.hosts else None
+        self._seconds: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, section: str, units: int = 1) -> Optional[float]:
+        """Seconds after which a call of ``section`` is hedged, or None while too few calls are measured."""
+        if self.budget <= 0:
+            return None
+        with self._lock:
+            samples = self._seconds.get(section)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            per_unit = percentile(list(samples), self.pct)
+        return max(self.min_delay, per_unit * max(1, units))
+
+    def observe(self, section: str, units: int, seconds: float) -> None:
+        with self._lock:
+            samples = self._seconds.get(section)
+            if samples is None:
+                samples = self._seconds[section] = deque(maxlen=WINDOW_SIZE)
+            samples.append(seconds / max(1, units))
+
+    def _earn(self) -> None:
+        with self._lock:
+            self.credits = min(MAX_HEDGE_CREDITS, self.credits + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self.credits < 1:
+                return False
+            self.credits -= 1
+            return True
+
+    def hedge_host(self, host: str) -> str:
+        """Server for a duplicate of a call to ``host``: another one if configured, else ``host`` itself."""
+        if self._next_host is None:
+            return host
+        for _ in range(len(self.hosts)):
+            candidate = next(self._next_host)
+            if candidate != host:
+                return candidate
+        return host
+
+    async def run(self, section: str, units: int, host: str, call: Callable[[str], Awaitable[T]],
+                  valid: Callable[[T], bool]) -> T:
+        """Await ``call(host)``, racing it against ``call(hedge_host(host))`` if it is slow.
+
+        Once a hedge is sent, ``valid`` decides whether a result may win; if no
+        copy returns a valid result, the first result (or the last error) is
+        returned.
+        """
+        self._earn()
+        delay = self.delay(section, units)
+        started = {asyncio.ensure_future(call(host)): time.perf_counter()}
+        (primary,) = started
+        pending = set(started)
+        fallback = None
+        error: Optional[BaseException] = None
+        winner = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    if self._spend():
+                        hedge = asyncio.ensure_future(call(self.hedge_host(host)))
+                        started[hedge] = time.perf_counter()
+                        pending.add(hedge)
+                    else:
+                        AI_HEDGES.inc(section=section, outcome="no_budget")
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        # Stopped short of an answer, so its duration says nothing about the model
+                        error = asyncio.CancelledError()
+                        continue
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self.observe(section, units, time.perf_counter() - started[task])
+                    result = task.result()
+                    if len(started) == 1:
+                        return result
+                    if valid(result):
+                        winner = task
+                        AI_HEDGES.inc(section=section, outcome="primary_won" if task is primary else "hedge_won")
+                        return result
+                    if fallback is None:
+                        fallback = (result,)
+            if fallback is not None:
+                return fallback[0]
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                if task is primary and winner is not None:
+                    # The hedge won, so the primary would have taken at least this long; keeping it holds
+                    # on to the tail. A run cancelled by its deadline or the client measures nothing.
+                    self.observe(section, units, time.perf_counter() - started[task])
+
+HEDGER = Hedger()
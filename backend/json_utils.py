@@ -99,8 +99,9 @@ def parse_json_response(response: str) -> Optional[Dict]:
         if not data:
             raise JSONParsingError(ERROR_MESSAGES["empty_content"])
             
-        # For responses that should contain course content, validate the structure
-        if isinstance(data, dict) and any(key in data for key in ["modules", "tasks", "quizzes"]):
+        # For responses that contain a whole course, validate the structure.
+        # Single-section responses are validated by the section assembler.
+        if isinstance(data, dict) and all(key in data for key in ["modules", "tasks", "quizzes", "practice_plan"]):
             validate_json_structure(data)
         
         return data
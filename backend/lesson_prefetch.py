@@ -0,0 +1,201 @@
+"""Speculative generation of the next days' lessons of two-phase courses.
+
+After day N of a course is served, the lessons of days N+1..N+PREFETCH_DAYS
+are generated in the background so the next click finds them memoised.
+Prefetching is low priority: one lesson at a time, and as soon as a course
+or lesson request is being served, by this worker or (through the shared
+cache's HostActivity) any other on the host, the lesson being generated is
+cancelled and the queue is dropped. A lesson the client itself asks for is
+left to finish.
+
+Outcomes are counted in lesson_prefetch_total:
+    prefetched    a lesson body was generated ahead of time
+    hit           a client asked for a prefetched lesson
+    wasted        a prefetched lesson was not asked for within PREFETCH_WASTE_SECONDS
+    stored        the lesson was already memoised (or being generated)
+    dropped_busy  a queued module was dropped because the server was busy
+    preempted     a lesson being generated was cancelled because live traffic started
+    failed        generation failed
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from loguru import logger
+from cache_warmer import HostActivity
+from config import (
+    DISCONNECT_POLL_INTERVAL,
+    MAX_LESSONS_PER_MODULE,
+    PREFETCH_DAYS,
+    PREFETCH_ENABLED,
+    PREFETCH_QUEUE_SIZE,
+    PREFETCH_WASTE_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+)
+from course_store import CourseStore, is_expanded, lesson_key
+from deadline import Deadline
+from metrics import IN_FLIGHT_REQUESTS, PREFETCH_LESSONS
+
+# Upper bound on prefetched lessons remembered for hit accounting
+MAX_TRACKED_LESSONS = 10000
+
+class LessonPrefetcher:
+    """Queues the modules after the one just served and generates them while the server is quiet."""
+
+    def __init__(
+        self,
+        days: int = PREFETCH_DAYS,
+        queue_size: int = PREFETCH_QUEUE_SIZE,
+        waste_after: float = PREFETCH_WASTE_SECONDS,
+        busy: Optional[Callable[[], bool]] = None,
+        activity: Optional[HostActivity] = None,
+        poll_interval: float = DISCONNECT_POLL_INTERVAL,
+    ):
+        self.days = days
+        self.queue_size = queue_size
+        self.waste_after = waste_after
+        self.busy = busy or self._busy
+        # Requests of every worker sharing the course cache; None limits the busy check to this worker
+        self.activity = activity
+        self.poll_interval = poll_interval
+        self.foreground_requests = 0
+        self.counts: Dict[str, int] = {}
+        self._queue: "OrderedDict[Tuple[str, int], Tuple[CourseStore, Dict, Callable]]" = OrderedDict()
+        self._prefetched: "OrderedDict[str, float]" = OrderedDict()  # lesson key -> when prefetching started
+        self._worker: Optional[asyncio.Task] = None
+        # Lesson being prefetched, and whether a client has asked for it meanwhile
+        self._current: Optional[str] = None
+        self._wanted = False
+
+    def _count(self, outcome: str, amount: int = 1) -> None:
+        self.counts[outcome] = self.counts.get(outcome, 0) + amount
+        PREFETCH_LESSONS.inc(amount, outcome=outcome)
+
+    def _busy(self) -> bool:
+        if self.foreground_requests > 0 or IN_FLIGHT_REQUESTS.value() > 0:
+            return True
+        return self.activity is not None and self.activity.busy()
+
+    @contextmanager
+    def foreground(self):
+        """Mark a client request in progress; prefetching on every worker stops while any is."""
+        self.foreground_requests += 1
+        if self.activity:
+            self.activity.enter()
+        try:
+            yield
+        finally:
+            self.foreground_requests -= 1
+            if self.activity:
+                self.activity.exit()
+
+    def schedule(self, store: CourseStore, course_id: str, course: Dict, number: int,
+                 make_generator: Callable[[Dict, Deadline], Callable]) -> None:
+        """Queue the modules after module ``number`` (0 after the outline) for prefetching.
+
+        ``make_generator(course, deadline)`` returns the lesson generator for
+        CourseStore.lesson, running under ``deadline``.
+        """
+        self._expire()
+        for ahead in range(number + 1, min(number + self.days, len(course["modules"])) + 1):
+            self._queue[(course_id, ahead)] = (store, course, make_generator)
+            self._queue.move_to_end((course_id, ahead))
+        while len(self._queue) > self.queue_size:
+            self._queue.popitem(last=False)
+        if self._queue and self._worker is None:
+            self._worker = asyncio.ensure_future(self._run())
+
+    def claim(self, course_id: str, number: int, index: Optional[int] = None) -> int:
+        """Record client requests for a lesson (or a whole module); returns how many were prefetched."""
+        self._expire()
+        indexes = range(MAX_LESSONS_PER_MODULE) if index is None else (index,)
+        keys = [lesson_key(course_id, number, i) for i in indexes]
+        if self._current in keys:
+            self._wanted = True
+        hits = sum(self._prefetched.pop(key, None) is not None for key in keys)
+        if hits:
+            self._count("hit", hits)
+        return hits
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.waste_after
+        while self._prefetched:
+            key, started = next(iter(self._prefetched.items()))
+            if started >= cutoff and len(self._prefetched) <= MAX_TRACKED_LESSONS:
+                break
+            del self._prefetched[key]
+            self._count("wasted")
+
+    def _drop_queue(self) -> None:
+        self._count("dropped_busy", len(self._queue))
+        self._queue.clear()
+
+    async def _preempt_on_traffic(self, deadline: Deadline) -> None:
+        while not deadline.expired:
+            if self.busy() and not self._wanted:
+                deadline.cancel("live_traffic")
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run(self) -> None:
+        try:
+            while self._queue:
+                (course_id, number), (store, course, make_generator) = self._queue.popitem(last=False)
+                deadline = Deadline(REQUEST_DEADLINE_SECONDS)
+                watcher = asyncio.ensure_future(self._preempt_on_traffic(deadline))
+                try:
+                    if not await self._prefetch_module(store, course_id, course, number,
+                                                       make_generator(course, deadline), deadline):
+                        return
+                finally:
+                    watcher.cancel()
+        finally:
+            self._worker = None
+
+    async def _prefetch_module(self, store: CourseStore, course_id: str, course: Dict, number: int,
+                               generate: Callable, deadline: Deadline) -> bool:
+        """Generate the missing lessons of one module; False once live traffic stopped prefetching."""
+        for index, lesson in enumerate(course["modules"][number - 1]["lessons"]):
+            if is_expanded(lesson):
+                continue
+            if self.busy():
+                self._count("dropped_busy")
+                self._drop_queue()
+                return False
+            if store.has_lesson(course_id, number, index):
+                self._count("stored")
+                continue
+            key = lesson_key(course_id, number, index)
+            self._prefetched[key] = time.monotonic()
+            self._current, self._wanted = key, False
+            try:
+                await store.lesson(course_id, course, number, index, generate)
+            except Exception as e:
+                self._prefetched.pop(key, None)
+                if deadline.cancelled:
+                    self._count("preempted")
+                    self._drop_queue()
+                    return False
+                self._count("failed")
+                logger.warning("Prefetching lesson {} failed: {}", key, e)
+                continue
+            finally:
+                self._current = None
+            self._count("prefetched")
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Outcome counts with hit and waste rates relative to lessons prefetched."""
+        prefetched = self.counts.get("prefetched", 0)
+        stats = dict(self.counts)
+        stats["hit_rate"] = self.counts.get("hit", 0) / prefetched if prefetched else 0.0
+        stats["waste_rate"] = self.counts.get("wasted", 0) / prefetched if prefetched else 0.0
+        return stats
+
+    def stop(self) -> None:
+        self._queue.clear()
+        if self._worker:
+            self._worker.cancel()
+
+PREFETCHER = LessonPrefetcher() if PREFETCH_ENABLED else None
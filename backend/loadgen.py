@@ -0,0 +1,312 @@
+"""Async HTTP load generator for the /generate-course endpoint.
+
+Open loop (Poisson arrivals, one stage per rate):
+    python loadgen.py --url http://localhost:8000 --mode open --rates 0.1,0.2,0.5 --stage-duration 120
+
+Closed loop (fixed number of concurrent users, one stage per level):
+    python loadgen.py --mode closed --concurrency 1,2,4 --stage-duration 120 --workload workload.jsonl
+
+A workload file is JSONL with one /generate-course request body (topic, level
+and days) per line, replayed in order; workload.jsonl is a sample mix. Lines
+without those fields are skipped. Without a workload a synthetic topic mix is
+used (--topics "Python:3,C++:1"). Results are written as JSON and can be
+compared between builds with --compare.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from bench_utils import compare_runs, new_run, print_comparison, save_run, load_run
+
+LEVELS = ("beginner", "intermediate", "advanced")
+SAMPLE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$')
+
+def parse_prometheus_text(text: str) -> Dict[str, float]:
+    """Parse Prometheus text exposition into {'name{labels}': value}."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_PATTERN.match(line.strip())
+        if match:
+            name, labels, value = match.groups()
+            samples[name + (labels or "")] = float(value)
+    return samples
+
+def metric_delta(before: Dict[str, float], after: Dict[str, float], prefix: str) -> Dict[str, float]:
+    return {
+        key: after[key] - before.get(key, 0.0)
+        for key in after if key == prefix or key.startswith(prefix + "{")
+    }
+
+def histogram_quantile(bucket_deltas: Dict[str, float], q: float) -> Optional[float]:
+    """Estimate a quantile from cumulative bucket counts, as Prometheus does."""
+    buckets = []
+    for key, count in bucket_deltas.items():
+        le = re.search(r'le="([^"]+)"', key)
+        if le:
+            buckets.append((float("inf") if le.group(1) == "+Inf" else float(le.group(1)), count))
+    buckets.sort()
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            span = count - lower_count
+            return lower_bound + (bound - lower_bound) * ((rank - lower_count) / span if span else 1)
+        lower_bound, lower_count = bound, count
+    return None
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+def load_workload(path: str) -> List[Dict]:
+    """Request bodies of a workload file; lines without topic, level and days are skipped."""
+    requests = []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, dict) and {"topic", "level", "days"} <= entry.keys():
+                requests.append({"topic": entry["topic"], "level": entry["level"], "days": int(entry["days"])})
+            else:
+                skipped += 1
+    if not requests:
+        raise ValueError(
+            f"No requests found in {path}: each line must be a JSON object with topic, level and days "
+            f'(e.g. {{"topic": "Python", "level": "beginner", "days": 7}}), see workload.jsonl'
+        )
+    if skipped:
+        print(f"Skipped {skipped} lines of {path} without topic, level and days", file=sys.stderr)
+    return requests
+
+def synthetic_workload(topics: str, days: Tuple[int, int], rng: random.Random) -> Iterator[Dict]:
+    weighted = []
+    for item in topics.split(","):
+        name, _, weight = item.partition(":")
+        weighted.append((name.strip(), float(weight or 1)))
+    names = [name for name, _ in weighted]
+    weights = [weight for _, weight in weighted]
+    while True:
+        yield {
+            "topic": rng.choices(names, weights)[0],
+            "level": rng.choice(LEVELS),
+            "days": rng.randint(days[0], days[1]),
+        }
+
+def cycle_workload(requests: List[Dict]) -> Iterator[Dict]:
+    while True:
+        yield from requests
+
+class LagProbe:
+    """Measures lag of the load generator's own event loop."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        while True:
+            due = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - due))
+
+class LoadGenerator:
+    def __init__(self, base_url: str, workload: Iterator[Dict], timeout: float, max_in_flight: int):
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.client = httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=max_in_flight))
+        self.max_in_flight = max_in_flight
+
+    async def scrape_metrics(self) -> Dict[str, float]:
+        try:
+            response = await self.client.get(f"{self.base_url}/metrics", timeout=10)
+            return parse_prometheus_text(response.text)
+        except httpx.HTTPError:
+            return {}
+
+    async def send(self, results: List[Dict]) -> None:
+        payload = next(self.workload)
+        started = time.perf_counter()
+        outcome = {"status": None, "error": None}
+        try:
+            response = await self.client.post(f"{self.base_url}/generate-course", json=payload)
+            outcome["status"] = response.status_code
+        except httpx.HTTPError as e:
+            outcome["error"] = type(e).__name__
+        outcome["latency"] = time.perf_counter() - started
+        results.append(outcome)
+
+    async def open_loop(self, rate: float, duration: float, rng: random.Random, results: List[Dict]) -> int:
+        """Poisson arrivals at ``rate`` per second; returns requests dropped at the in-flight cap."""
+        tasks = set()
+        dropped = 0
+        deadline = time.perf_counter() + duration
+        next_arrival = time.perf_counter()
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(tasks) >= self.max_in_flight:
+                dropped += 1
+                continue
+            task = asyncio.create_task(self.send(results))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return dropped
+
+    async def closed_loop(self, concurrency: int, duration: float, results: List[Dict]) -> int:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.send(results)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return 0
+
+    async def run_stage(self, name: str, coroutine_factory) -> Dict:
+        probe = LagProbe()
+        probe_task = asyncio.create_task(probe.run())
+        before = await self.scrape_metrics()
+        results: List[Dict] = []
+        started = time.perf_counter()
+        dropped = await coroutine_factory(results)
+        elapsed = time.perf_counter() - started
+        after = await self.scrape_metrics()
+        probe_task.cancel()
+        return summarize_stage(name, results, elapsed, dropped, before, after, probe.samples)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+def summarize_stage(name: str, results: List[Dict], elapsed: float, dropped: int,
+                    before: Dict[str, float], after: Dict[str, float], client_lag: List[float]) -> Dict:
+    latencies = [result["latency"] for result in results if result["status"] == 200]
+    errors = [result for result in results if result["status"] != 200]
+    completed = len(results)
+    fallbacks = sum(metric_delta(before, after, "course_fallbacks_total").values())
+    lag_buckets = metric_delta(before, after, "event_loop_lag_seconds_bucket")
+    lag_count = sum(metric_delta(before, after, "event_loop_lag_seconds_count").values())
+    lag_sum = sum(metric_delta(before, after, "event_loop_lag_seconds_sum").values())
+
+    summary = {
+        "stage": name,
+        "requests": completed,
+        "dropped": dropped,
+        "throughput": completed / elapsed if elapsed else 0.0,
+        "error_rate": len(errors) / completed if completed else 0.0,
+        "errors": {},
+        "fallback_rate": fallbacks / completed if completed and after else None,
+        "median": percentile(latencies, 0.50),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "mean": statistics.fmean(latencies) if latencies else None,
+        "max": max(latencies) if latencies else None,
+        "server_loop_lag_mean": lag_sum / lag_count if lag_count else None,
+        "server_loop_lag_p99": histogram_quantile(lag_buckets, 0.99),
+        "client_loop_lag_p99": percentile(client_lag, 0.99),
+    }
+    for error in errors:
+        key = str(error["status"] or error["error"])
+        summary["errors"][key] = summary["errors"].get(key, 0) + 1
+    return summary
+
+def _fmt(value: Optional[float], unit: str = "s") -> str:
+    if value is None:
+        return "-"
+    return f"{value:.3f}{unit}"
+
+def print_stage(summary: Dict) -> None:
+    fallback = summary["fallback_rate"]
+    print(
+        f"{summary['stage']:<18} n={summary['requests']:<5} thr={summary['throughput']:.2f}/s "
+        f"p50={_fmt(summary['p50'])} p95={_fmt(summary['p95'])} p99={_fmt(summary['p99'])} "
+        f"err={summary['error_rate']:.1%} fallback={'-' if fallback is None else f'{fallback:.1%}'} "
+        f"lag(server p99)={_fmt(summary['server_loop_lag_p99'])} lag(client p99)={_fmt(summary['client_loop_lag_p99'])}"
+    )
+
+async def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    if args.workload:
+        workload = cycle_workload(load_workload(args.workload))
+    else:
+        low, _, high = args.days.partition("-")
+        workload = synthetic_workload(args.topics, (int(low), int(high or low)), rng)
+
+    generator = LoadGenerator(args.url, workload, args.timeout, args.max_in_flight)
+    report = new_run("loadgen")
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("compare", "output")}
+    try:
+        if args.mode == "open":
+            stages = [(f"rate={rate}", rate) for rate in map(float, args.rates.split(","))]
+            for name, rate in stages:
+                summary = await generator.run_stage(
+                    name, lambda results, rate=rate: generator.open_loop(rate, args.stage_duration, rng, results)
+                )
+                report["results"][name] = summary
+                print_stage(summary)
+        else:
+            for level in map(int, args.concurrency.split(",")):
+                name = f"concurrency={level}"
+                summary = await generator.run_stage(
+                    name, lambda results, level=level: generator.closed_loop(level, args.stage_duration, results)
+                )
+                report["results"][name] = summary
+                print_stage(summary)
+    finally:
+        await generator.close()
+    return report
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the course generation endpoint")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open")
+    parser.add_argument("--rates", default="0.1,0.2,0.5", help="Open loop: arrival rates (req/s), one stage each")
+    parser.add_argument("--concurrency", default="1,2,4", help="Closed loop: concurrent users, one stage each")
+    parser.add_argument("--stage-duration", type=float, default=60.0, help="Seconds per stage")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop: cap on outstanding requests")
+    parser.add_argument("--timeout", type=float, default=900.0, help="Per-request timeout in seconds")
+    parser.add_argument("--workload", help="JSONL file of {topic, level, days} requests to replay")
+    parser.add_argument("--topics", default="Python:3,C++:2,Web Development:2,Rust:1", help="Synthetic topic mix")
+    parser.add_argument("--days", default="1-14", help="Synthetic days range, e.g. 1-14")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--stat", default="p95", help="Statistic used for --compare")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(f"\nResults written to {save_run(report, args.output)}")
+    if args.compare:
+        rows = compare_runs(load_run(args.compare), report, args.threshold, stat=args.stat)
+        print(f"\nComparison of {args.stat} against {args.compare}:")
+        print_comparison(rows)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Streaming analyser for the application logs and their rotated archives.
+
+Usage:
+    python log_analyzer.py api.jsonl               # live log plus every rotated api.*.jsonl(.zip|.gz)
+    python log_analyzer.py api.2025-06-01_*.jsonl.zip --json
+    python log_analyzer.py api.jsonl --request 3f2a9c...  # timeline of one request
+    python log_analyzer.py api.log                 # text logs, e.g. from before LOG_JSON_FILE
+
+A file is read as JSON records (log_pipeline's LOG_JSON_FILE) when its name
+contains ".jsonl" and as loguru text lines otherwise. Archives are read
+straight from the zip/gzip stream, line by line. Memory stays bounded
+however large the logs are: latencies go into fixed log-scale buckets,
+error signatures and open requests are capped, and only the slowest
+requests are kept.
+"""
+import argparse
+import glob
+import gzip
+import heapq
+import io
+import json
+import math
+import os
+import re
+import sys
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# "2025-05-28 03:06:43.474 | INFO     | main:generate_course_endpoint:27 - message" (loguru default)
+# "2025-05-28 03:06:43 | INFO | message" (older short format)
+TEXT_LINE = re.compile(
+    r"^(?P<time>\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d(?:\.\d+)?)\s*\|\s*(?P<level>[A-Z]+)\s*\|\s*"
+    r"(?:(?P<name>[\w.]+):(?P<function>[\w<>]+):(?P<line>\d+) - )?(?P<message>.*)$"
+)
+REQUEST_START = re.compile(r"Generating course for topic: (?P<topic>.+?), level: (?P<level>\w+), days: (?P<days>\d+)")
+FAILED_ATTEMPT = re.compile(r"Error generating content with Ollama")
+SECTION_FALLBACK = re.compile(r"Using rule-based (\w+) section")
+JSON_ERROR = re.compile(r"(JSON|Expecting|delimiter|Unterminated|Extra data|Invalid control character)", re.I)
+NUMBERS = re.compile(r"\d+")
+# Logged once by config.py at process start; requests still open then never finished
+STARTUP_MESSAGES = ("AI Service Configuration", "Ollama integration available", "Ollama not available")
+
+MAX_OPEN_REQUESTS = 10_000
+MAX_SIGNATURES = 1_000
+SLOWEST = 10
+
+class LogEvent:
+    __slots__ = ("time", "level", "source", "message", "request_id")
+
+    def __init__(self, time: float, level: str, source: str, message: str, request_id: str):
+        self.time = time
+        self.level = level
+        self.source = source
+        self.message = message
+        self.request_id = request_id
+
+def _timestamp(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.replace(" ", "T")).timestamp()
+    except ValueError:
+        return None
+
+def parse_json_line(line: str) -> Optional[LogEvent]:
+    """Parse one JSON record written by log_pipeline."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict):
+        return None
+    timestamp = _timestamp(entry.get("time", ""))
+    if timestamp is None:
+        return None
+    source = f"{entry.get('name', '')}:{entry.get('function', '')}"
+    return LogEvent(timestamp, entry.get("level", ""), source, entry.get("message", ""),
+                    entry.get("request_id") or "")
+
+def parse_text_line(line: str) -> Optional[LogEvent]:
+    """Parse one loguru text line."""
+    match = TEXT_LINE.match(line.rstrip("\n"))
+    if not match:
+        return None
+    timestamp = _timestamp(match.group("time"))
+    if timestamp is None:
+        return None
+    source = f"{match.group('name')}:{match.group('function')}" if match.group("name") else ""
+    return LogEvent(timestamp, match.group("level"), source, match.group("message"), "")
+
+def is_json_log(path: str) -> bool:
+    return ".jsonl" in os.path.basename(path)
+
+def expand_paths(paths: List[str]) -> List[str]:
+    """Expand globs; a live log also brings in its rotated siblings, oldest first."""
+    expanded = []
+    for path in paths:
+        matches = sorted(glob.glob(path)) or [path]
+        for match in matches:
+            stem, ext = os.path.splitext(match)
+            if ext in (".log", ".jsonl") and os.path.basename(stem).count(".") == 0:
+                rotated = sorted(glob.glob(f"{stem}.*{ext}*"))
+                expanded.extend(candidate for candidate in rotated if candidate not in expanded)
+            if match not in expanded:
+                expanded.append(match)
+    return expanded
+
+def open_lines(path: str) -> Iterator[str]:
+    """Yield the lines of a plain, .gz or .zip log without extracting it."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                with archive.open(member) as raw:
+                    yield from io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+def read_events(paths: List[str]) -> Iterator[LogEvent]:
+    """Parsed events of all files in order, dropping duplicate records written by two sinks."""
+    previous: Tuple = ()
+    for path in paths:
+        parse_line = parse_json_line if is_json_log(path) else parse_text_line
+        for line in open_lines(path):
+            event = parse_line(line)
+            if event is None:
+                continue
+            key = (int(event.time), event.level, event.message)
+            if key == previous:
+                continue
+            previous = key
+            yield event
+
+class LatencyHistogram:
+    """Log-scale histogram: constant memory, about 5% relative error on quantiles."""
+
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        index = math.floor(math.log(max(value, 1e-3)) / math.log(self.GROWTH))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.max, self.GROWTH ** (index + 1))
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else None,
+            "p50": self.quantile(0.50),
+            "p90": self.quantile(0.90),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.total else None,
+        }
+
+class RequestState:
+    __slots__ = ("request_id", "start", "topic", "level", "days", "retries", "json_errors", "fallback",
+                 "section_fallbacks", "cache_hit")
+
+    def __init__(self, request_id: str, start: float, topic: str, level: str, days: int):
+        self.request_id = request_id
+        self.start = start
+        self.topic = topic
+        self.level = level
+        self.days = days
+        self.retries = 0
+        self.json_errors = 0
+        self.fallback = False
+        self.section_fallbacks: List[str] = []
+        self.cache_hit = False
+
+def json_error_signature(message: str) -> str:
+    """Message with numbers and quoted values blanked, so equal errors group together."""
+    signature = re.sub(r"'[^']*'|\"[^\"]*\"", "'…'", message)
+    return NUMBERS.sub("N", signature)[:160]
+
+class LogAnalyzer:
+    """Folds log events into request timelines and aggregate statistics.
+
+    Records carrying a request id (JSON logs) are matched exactly; text logs
+    have none, so their records are attributed to the most recently
+    started request.
+    """
+
+    def __init__(self, trace_request: Optional[str] = None):
+        self.open: "OrderedDict[str, RequestState]" = OrderedDict()
+        self.latency = LatencyHistogram()
+        self.latency_by_outcome: Dict[str, LatencyHistogram] = {}
+        self.outcomes: Dict[str, int] = {}
+        self.retries: Dict[int, int] = {}
+        self.signatures: Dict[str, int] = {}
+        self.section_fallbacks: Dict[str, int] = {}
+        self.slowest: List[Tuple[float, str, str]] = []
+        self.incomplete = 0
+        self.events = 0
+        self.trace_request = trace_request
+        self.timeline: List[Dict] = []
+        self._anonymous = 0
+        self._current = ""
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def _request_for(self, event: LogEvent) -> Optional[RequestState]:
+        if event.request_id:
+            return self.open.get(event.request_id)
+        return self.open.get(self._current)
+
+    def feed(self, event: LogEvent) -> None:
+        self.events += 1
+        self.first = event.time if self.first is None else self.first
+        self.last = event.time
+        if event.message.startswith(STARTUP_MESSAGES):
+            self.incomplete += len(self.open)
+            self.open.clear()
+            return
+        start = REQUEST_START.search(event.message)
+        if start:
+            request_id = event.request_id
+            if not request_id:
+                # Text logs come from a single sequential worker: a new request ends the previous one
+                if self.open.pop(self._current, None) is not None:
+                    self.incomplete += 1
+                self._anonymous += 1
+                request_id = f"line-request-{self._anonymous}"
+            self._current = request_id
+            self.open[request_id] = RequestState(request_id, event.time, start.group("topic"),
+                                                 start.group("level"), int(start.group("days")))
+            if len(self.open) > MAX_OPEN_REQUESTS:
+                self.open.popitem(last=False)
+                self.incomplete += 1
+        request = self._request_for(event)
+        if request and self.trace_request and request.request_id == self.trace_request:
+            self.timeline.append({"offset": round(event.time - request.start, 3), "level": event.level,
+                                  "source": event.source, "message": event.message})
+        if request is None:
+            return
+
+        message = event.message
+        if event.level in ("ERROR", "WARNING") and JSON_ERROR.search(message):
+            request.json_errors += 1
+            self._count_signature(json_error_signature(message))
+        if FAILED_ATTEMPT.search(message):
+            request.retries += 1
+        elif "Falling back to rule-based" in message:
+            request.fallback = True
+        elif SECTION_FALLBACK.search(message):
+            request.section_fallbacks.append(SECTION_FALLBACK.search(message).group(1))
+        elif "Serving course from the shared cache" in message:
+            request.cache_hit = True
+        elif "Course generated successfully" in message or message.startswith("Serving course from"):
+            self._finish(request, event, "ok")
+        elif message.startswith("Error generating course:") or "Client disconnected before" in message:
+            self._finish(request, event, "disconnected" if "disconnected" in message else "error")
+        if request.cache_hit and request.request_id in self.open:
+            self._finish(request, event, "cache_hit")
+
+    def _count_signature(self, signature: str) -> None:
+        if signature in self.signatures or len(self.signatures) < MAX_SIGNATURES:
+            self.signatures[signature] = self.signatures.get(signature, 0) + 1
+        else:
+            self.signatures["(other)"] = self.signatures.get("(other)", 0) + 1
+
+    def _finish(self, request: RequestState, event: LogEvent, outcome: str) -> None:
+        self.open.pop(request.request_id, None)
+        if outcome == "ok":
+            outcome = "fallback" if request.fallback else ("partial_fallback" if request.section_fallbacks else "ai")
+        duration = max(0.0, event.time - request.start)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.latency.add(duration)
+        self.latency_by_outcome.setdefault(outcome, LatencyHistogram()).add(duration)
+        self.retries[request.retries] = self.retries.get(request.retries, 0) + 1
+        for section in request.section_fallbacks:
+            self.section_fallbacks[section] = self.section_fallbacks.get(section, 0) + 1
+        label = f"{request.request_id} {request.topic}/{request.level}/{request.days}d {outcome}"
+        entry = (duration, label, datetime.fromtimestamp(request.start).isoformat(sep=" ", timespec="seconds"))
+        if len(self.slowest) < SLOWEST:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def report(self) -> Dict:
+        completed = sum(self.outcomes.values())
+        served = completed - self.outcomes.get("error", 0) - self.outcomes.get("disconnected", 0)
+        fallbacks = self.outcomes.get("fallback", 0)
+        return {
+            "events": self.events,
+            "first": datetime.fromtimestamp(self.first).isoformat(sep=" ") if self.first else None,
+            "last": datetime.fromtimestamp(self.last).isoformat(sep=" ") if self.last else None,
+            "requests": completed,
+            "incomplete": self.incomplete + len(self.open),
+            "outcomes": self.outcomes,
+            "fallback_rate": fallbacks / served if served else None,
+            "partial_fallback_rate": self.outcomes.get("partial_fallback", 0) / served if served else None,
+            "section_fallbacks": self.section_fallbacks,
+            "latency": self.latency.summary(),
+            "latency_by_outcome": {name: hist.summary() for name, hist in self.latency_by_outcome.items()},
+            "retries_per_request": {str(key): value for key, value in sorted(self.retries.items())},
+            "json_error_signatures": dict(sorted(self.signatures.items(), key=lambda item: -item[1])[:20]),
+            "slowest": [
+                {"seconds": round(duration, 3), "request": label, "started": started}
+                for duration, label, started in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+def print_report(report: Dict) -> None:
+    print(f"Events: {report['events']}  ({report['first']} .. {report['last']})")
+    print(f"Requests: {report['requests']} completed, {report['incomplete']} incomplete")
+    print("Outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(report["outcomes"].items())))
+    rate = report["fallback_rate"]
+    partial = report["partial_fallback_rate"]
+    print(f"Fallback rate: {'-' if rate is None else f'{rate:.1%}'}  "
+          f"partial: {'-' if partial is None else f'{partial:.1%}'}  sections: {report['section_fallbacks']}")
+    latency = report["latency"]
+    print(f"Latency: p50={_fmt(latency['p50'])} p90={_fmt(latency['p90'])} p95={_fmt(latency['p95'])} "
+          f"p99={_fmt(latency['p99'])} max={_fmt(latency['max'])}")
+    for name, summary in sorted(report["latency_by_outcome"].items()):
+        print(f"  {name:<17} n={summary['count']:<6} p50={_fmt(summary['p50'])} p95={_fmt(summary['p95'])}")
+    print("Retries per request: " + ", ".join(f"{key}: {value}" for key, value in report["retries_per_request"].items()))
+    if report["json_error_signatures"]:
+        print("JSON error signatures:")
+        for signature, count in report["json_error_signatures"].items():
+            print(f"  {count:>6}  {signature}")
+    if report["slowest"]:
+        print("Slowest requests:")
+        for entry in report["slowest"]:
+            print(f"  {entry['seconds']:>9.2f}s  {entry['started']}  {entry['request']}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse the application logs and rotated log archives")
+    parser.add_argument("paths", nargs="+", help="Log files, archives or globs")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--request", help="Print the timeline of one request id")
+    args = parser.parse_args(argv)
+
+    analyzer = LogAnalyzer(trace_request=args.request)
+    for event in read_events(expand_paths(args.paths)):
+        analyzer.feed(event)
+
+    if args.request:
+        for entry in analyzer.timeline:
+            print(f"+{entry['offset']:>9.3f}s  {entry['level']:<8} {entry['source']:<45} {entry['message']}")
+        return 0 if analyzer.timeline else 1
+    report = analyzer.report()
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import json
+import random
+import traceback
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+# Request id of the request currently being served, picked up by every log record
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Loguru's numeric level for WARNING; everything below it is eligible for sampling
+WARNING_LEVEL_NO = 30
+
+def new_request_id() -> str:
+    """Generate a short, unique request id."""
+    return uuid.uuid4().hex[:16]
+
+def get_request_id() -> Optional[str]:
+    """Return the id of the request being served, if any."""
+    return request_id_var.get()
+
+def _attach_request_id(record: Dict) -> None:
+    """Patcher that stamps the current request id onto the record."""
+    if "request_id" not in record["extra"]:
+        record["extra"]["request_id"] = request_id_var.get()
+
+def _json_format(record: Dict) -> str:
+    """Render a record as a single compact JSON line."""
+    payload = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    for key, value in record["extra"].items():
+        if not key.startswith("_"):
+            payload[key] = value
+
+    if record["exception"] is not None:
+        type_, value, tb = record["exception"]
+        payload["exception"] = "".join(traceback.format_exception(type_, value, tb))
+
+    record["extra"]["_json"] = json.dumps(payload, default=str, ensure_ascii=False)
+    return "{extra[_json]}\n"
+
+class InfoSampler:
+    """Log filter that keeps only a fraction of the records below WARNING.
+
+    The decision is made per request id, so a sampled request keeps its whole
+    timeline and a dropped one disappears entirely. Records logged outside a
+    request are sampled individually.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = max(0.0, min(1.0, rate))
+        self._threshold = int(self.rate * 0xFFFFFFFF)
+
+    def __call__(self, record: Dict) -> bool:
+        if self.rate >= 1.0 or record["level"].no >= WARNING_LEVEL_NO:
+            return True
+        request_id = record["extra"].get("request_id")
+        if request_id:
+            return zlib.crc32(request_id.encode()) <= self._threshold
+        return random.random() < self.rate
+
+def setup_logging(
+    path: str,
+    level: str,
+    text_format: str,
+    rotation: str,
+    compression: str,
+    json_path: Optional[str] = None,
+    sample_rate: float = 1.0,
+    enqueue: bool = True,
+) -> None:
+    """Configure the application log sinks.
+
+    ``path`` receives human-readable lines in ``text_format``. With
+    ``json_path`` every record is also written there as one JSON object per
+    line, so each file holds a single format. With ``enqueue`` the file sinks
+    are fed through a queue and written by a background thread, so writes,
+    rotation and compression never run on the event loop.
+    """
+    logger.remove()
+    logger.configure(patcher=_attach_request_id)
+    sinks: List[Tuple[str, Callable]] = [(path, text_format)]
+    if json_path:
+        sinks.append((json_path, _json_format))
+    for sink, log_format in sinks:
+        logger.add(
+            sink,
+            level=level,
+            format=log_format,
+            filter=InfoSampler(sample_rate),
+            rotation=rotation,
+            compression=compression,
+            enqueue=enqueue,
+        )
+
+class RequestIdMiddleware:
+    """ASGI middleware that assigns a request id to every HTTP request.
+
+    An incoming ``X-Request-ID`` header is honoured, otherwise a new id is
+    generated. The id is echoed back in the response headers.
+    """
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or new_request_id()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((self.header, request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,310 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default histogram buckets (seconds)
+LLM_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+
+class MetricsError(Exception):
+    """Custom exception for metrics errors"""
+    pass
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    if len(labels) != len(labelnames):
+        raise MetricsError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    try:
+        return tuple(str(labels[name]) for name in labelnames)
+    except KeyError as e:
+        raise MetricsError(f"Missing label: {e}")
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    """Base class for metrics.
+
+    Metrics are updated without locks. They are only touched from the event
+    loop thread on the request path, and rendering tolerates an update racing
+    with it.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+class _Timer:
+    """Context manager that observes its elapsed time into a histogram."""
+
+    __slots__ = ("histogram", "labels", "start", "elapsed")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed bucket boundaries."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = FAST_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def time(self, **labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        counts = self._counts.get(_label_key(self.labelnames, labels))
+        return sum(counts) if counts else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise MetricsError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Request path
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "course_request_seconds", "Total time spent serving /generate-course", ["status"], LLM_BUCKETS
+))
+IN_FLIGHT_REQUESTS = REGISTRY.register(Gauge(
+    "course_requests_in_flight", "Course generation requests currently queued or running"
+))
+SERIALIZATION_SECONDS = REGISTRY.register(Histogram(
+    "course_serialization_seconds", "Time spent serialising a course response"
+))
+
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay between when a periodic event loop callback was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+))
+
+# AI generation
+AI_GENERATE_SECONDS = REGISTRY.register(Histogram(
+    "ai_generate_seconds", "Duration of a single AIService.generate_content LLM call", ["section"], LLM_BUCKETS
+))
+AI_RETRIES = REGISTRY.register(Counter(
+    "ai_retries_total", "LLM generations retried after a failure", ["section"]
+))
+AI_FAILURES = REGISTRY.register(Counter(
+    "ai_failures_total", "Sections that failed after exhausting their retries", ["section"]
+))
+AI_CANCELLATIONS = REGISTRY.register(Counter(
+    "ai_cancellations_total", "LLM generations cancelled or not retried because of the request deadline",
+    ["section", "reason"]
+))
+AI_JSON_ATTEMPTS = REGISTRY.register(Counter(
+    "ai_json_attempts_total", "JSON generations attempted, by output mode", ["section", "mode"]
+))
+AI_JSON_PARSE_FAILURES = REGISTRY.register(Counter(
+    "ai_json_parse_failures_total", "JSON generations whose output failed to parse, by output mode", ["section", "mode"]
+))
+AI_TRUNCATIONS = REGISTRY.register(Counter(
+    "ai_truncations_total", "LLM generations stopped by the num_predict limit", ["section"]
+))
+TOKEN_BUDGET_PER_UNIT = REGISTRY.register(Gauge(
+    "token_budget_tokens_per_unit", "Learned output tokens per unit of each section", ["section"]
+))
+JSON_PARSE_SECONDS = REGISTRY.register(Histogram(
+    "json_parse_seconds", "Time spent cleaning, repairing and parsing LLM JSON output"
+))
+
+# AI model calls
+AI_HEDGES = REGISTRY.register(Counter(
+    "ai_hedged_requests_total", "Slow LLM calls by hedging outcome (primary_won, hedge_won, no_budget)",
+    ["section", "outcome"]
+))
+AI_MODEL_REQUESTS = REGISTRY.register(Counter(
+    "ai_model_requests_total", "LLM calls by model and section, by outcome (ok, invalid_json, truncated, cancelled, error)",
+    ["model", "section", "outcome"]
+))
+AI_MODEL_ROUTES = REGISTRY.register(Counter(
+    "ai_model_routes_total", "Sections routed to a model tier and why", ["tier", "reason"]
+))
+AI_MODEL_FALLBACKS = REGISTRY.register(Counter(
+    "ai_model_fallbacks_total", "Retries sent to the other model tier after a failed call", ["from_model", "to_model"]
+))
+AI_MODEL_SECONDS = REGISTRY.register(Gauge(
+    "ai_model_unit_seconds", "Running average LLM call duration per budget unit (day, quiz, ...) by model and section",
+    ["model", "section"]
+))
+AI_MODEL_JSON_VALIDITY = REGISTRY.register(Gauge(
+    "ai_model_json_validity", "Running share of LLM calls returning valid JSON by model and section",
+    ["model", "section"]
+))
+
+# Course assembly
+VALIDATION_SECONDS = REGISTRY.register(Histogram(
+    "course_validation_seconds", "Time spent building and validating course models", ["source"]
+))
+COURSE_FALLBACKS = REGISTRY.register(Counter(
+    "course_fallbacks_total", "Courses served by generate_course_rule_based after AI generation failed"
+))
+COURSE_RESIZES = REGISTRY.register(Counter(
+    "course_resizes_total", "Courses built from a stored course with a different number of days", ["kind"]
+))
+SECTION_FALLBACKS = REGISTRY.register(Counter(
+    "course_section_fallbacks_total", "AI course sections replaced or topped up with rule-based content", ["section", "source"]
+))
+GENERATION_MODES = REGISTRY.register(Counter(
+    "course_generation_mode_total", "AI course generations by single- or multi-call mode and why it was chosen",
+    ["mode", "reason"]
+))
+
+# Caches
+CACHE_HITS = REGISTRY.register(Counter(
+    "cache_hits_total", "Cache lookups that found an entry", ["cache"]
+))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "cache_misses_total", "Cache lookups that found nothing", ["cache"]
+))
+WARMER_COURSES = REGISTRY.register(Counter(
+    "cache_warmer_courses_total", "Courses considered by the cache warmer, by outcome", ["outcome"]
+))
+PREFETCH_LESSONS = REGISTRY.register(Counter(
+    "lesson_prefetch_total", "Lessons considered by the prefetcher, by outcome", ["outcome"]
+))
+
+async def monitor_event_loop_lag(interval: float = 0.25) -> None:
+    """Sample event loop lag forever; run as a background task."""
+    while True:
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - due))
@@ -0,0 +1,144 @@
+"""Routing of LLM calls between a small fast model and the large default one.
+
+Short lists (tasks, practice plan, outline titles) and the modules of short
+beginner courses go to AI_SMALL_MODEL; long or advanced content goes to
+AI_MODEL. Live statistics override that: the small model is skipped for a
+section when its JSON validity falls below ROUTING_MIN_JSON_VALIDITY or it is
+not actually faster than the large one. A call that fails is retried on the
+other tier.
+
+Routes are counted in ai_model_routes_total with the reason:
+    single_model  routing is off (no small model configured)
+    simple        the section is simple enough for the small model
+    complex       the section needs the large model
+    invalid_json  the small model returns too much broken JSON for the section
+    slow          the small model is not faster than the large one for the section
+    probe         every EXPLORE_INTERVAL-th skipped call tries the small model again
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+from adaptive import Explorer, ema
+from config import (
+    AI_MODEL,
+    AI_SMALL_MODEL,
+    ROUTING_MIN_JSON_VALIDITY,
+    ROUTING_MIN_SAMPLES,
+    ROUTING_SMALL_MAX_DAYS,
+)
+from metrics import AI_MODEL_JSON_VALIDITY, AI_MODEL_REQUESTS, AI_MODEL_ROUTES, AI_MODEL_SECONDS
+
+TIERS = ("small", "large")
+# Sections made of short strings or titles, which small models write reliably
+SIMPLE_SECTIONS = frozenset(("tasks", "practice_plan", "outline"))
+
+def is_simple(section: str, level: Optional[str], days: Optional[int]) -> bool:
+    """Whether every part of ``section`` (e.g. "modules+quizzes") can go to the small model."""
+    for part in section.split("+"):
+        if part in SIMPLE_SECTIONS:
+            continue
+        if part == "modules":
+            if level != "beginner" or days is None or days > ROUTING_SMALL_MAX_DAYS:
+                return False
+        elif part in ("quizzes", "lesson"):
+            if level not in ("beginner", "intermediate"):
+                return False
+        else:
+            return False
+    return True
+
+class _ModelStats:
+    """Running latency per budget unit and JSON validity of one model for one section."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds_per_unit: Optional[float] = None
+        self.json_validity = 1.0
+
+    def observe(self, seconds_per_unit: Optional[float], valid: Optional[bool]) -> None:
+        self.calls += 1
+        if valid is not None:
+            self.json_validity = ema(self.json_validity, float(valid))
+        if seconds_per_unit is not None:
+            self.seconds_per_unit = ema(self.seconds_per_unit, seconds_per_unit)
+
+class ModelRouter:
+    """Orders the models to try for a section, preferred tier first."""
+
+    def __init__(
+        self,
+        large: str = AI_MODEL,
+        small: str = AI_SMALL_MODEL,
+        min_samples: int = ROUTING_MIN_SAMPLES,
+        min_json_validity: float = ROUTING_MIN_JSON_VALIDITY,
+    ):
+        self.models = {"large": large, "small": small if small and small != large else ""}
+        self.min_samples = min_samples
+        self.min_json_validity = min_json_validity
+        self._stats: Dict[Tuple[str, str], _ModelStats] = {}
+        self._probes = Explorer()
+        self._lock = threading.Lock()
+
+    def _stats_for(self, model: str, section: str) -> Optional[_ModelStats]:
+        stats = self._stats.get((model, section))
+        return stats if stats is not None and stats.calls >= self.min_samples else None
+
+    def _tier(self, section: str, level: Optional[str], days: Optional[int]) -> Tuple[str, str]:
+        if not self.models["small"]:
+            return "large", "single_model"
+        if not is_simple(section, level, days):
+            return "large", "complex"
+        with self._lock:
+            small = self._stats_for(self.models["small"], section)
+            large = self._stats_for(self.models["large"], section)
+            reason = ""
+            if small and small.json_validity < self.min_json_validity:
+                reason = "invalid_json"
+            elif (small and large and small.seconds_per_unit is not None and large.seconds_per_unit is not None
+                    and small.seconds_per_unit >= large.seconds_per_unit):
+                reason = "slow"
+            if reason:
+                # Without an occasional call the small model's statistics could never recover
+                if self._probes.due(section):
+                    return "small", "probe"
+                return "large", reason
+        return "small", "simple"
+
+    def route(self, section: str, level: Optional[str] = None, days: Optional[int] = None) -> List[str]:
+        """Models to use for ``section``: the chosen tier first, then the other tier as fallback."""
+        tier, reason = self._tier(section, level, days)
+        AI_MODEL_ROUTES.inc(tier=tier, reason=reason)
+        order = (tier,) + tuple(other for other in TIERS if other != tier)
+        return [self.models[name] for name in order if self.models[name]]
+
+    def observe(self, model: str, section: str, outcome: str, seconds: Optional[float] = None,
+                units: int = 1) -> None:
+        """Fold one call into the statistics.
+
+        ``outcome`` is "ok" or "invalid_json", which count towards the JSON
+        validity, or "truncated", "cancelled" or "error", which do not;
+        ``seconds`` is None if no response arrived.
+        """
+        AI_MODEL_REQUESTS.inc(model=model, section=section, outcome=outcome)
+        valid = outcome == "ok" if outcome in ("ok", "invalid_json") else None
+        with self._lock:
+            stats = self._stats.get((model, section))
+            if stats is None:
+                stats = self._stats[(model, section)] = _ModelStats()
+            stats.observe(None if seconds is None else seconds / max(1, units), valid)
+            AI_MODEL_JSON_VALIDITY.set(stats.json_validity, model=model, section=section)
+            if stats.seconds_per_unit is not None:
+                AI_MODEL_SECONDS.set(stats.seconds_per_unit, model=model, section=section)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Statistics by model and section."""
+        with self._lock:
+            report: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (model, section), stats in self._stats.items():
+                report.setdefault(model, {})[section] = {
+                    "calls": stats.calls,
+                    "seconds_per_unit": stats.seconds_per_unit,
+                    "json_validity": stats.json_validity,
+                }
+            return report
+
+MODEL_ROUTER = ModelRouter()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from config import (
     MIN_LESSONS_PER_MODULE,
     MAX_LESSONS_PER_MODULE,
@@ -37,6 +37,23 @@ class Module(BaseModel):
             )
         return v
 
+class LessonOutline(BaseModel):
+    """Model for a lesson whose body is generated when it is first requested."""
+    title: str = Field(..., min_length=3)
+
+class ModuleOutline(BaseModel):
+    """Model for a module outline: its name and lesson titles."""
+    name: str = Field(..., min_length=3)
+    lessons: List[LessonOutline]
+
+    @validator('lessons')
+    def validate_lessons_count(cls, v):
+        if not (MIN_LESSONS_PER_MODULE <= len(v) <= MAX_LESSONS_PER_MODULE):
+            raise ValueError(
+                f"Module must have between {MIN_LESSONS_PER_MODULE} and {MAX_LESSONS_PER_MODULE} lessons"
+            )
+        return v
+
 class Quiz(BaseModel):
     """Model for a quiz question."""
     question: str = Field(..., min_length=10)
@@ -66,6 +83,11 @@ class CourseResponse(BaseModel):
     tasks: List[str] = Field(..., min_items=1)
     quizzes: List[Quiz]
     practice_plan: List[str] = Field(..., min_items=3)
+    # Where each section came from: "ai", "ai_partial" (AI output topped up or trimmed), "derived"
+    # (built from the lessons), "derived_partial" (topped up) or "rule_based"
+    section_sources: Dict[str, str] = Field(default_factory=dict)
+    # Id under which the course can be fetched piece by piece from /courses/{course_id}
+    course_id: Optional[str] = None
 
     @validator('modules')
     def validate_modules(cls, v):
@@ -143,3 +165,11 @@ class CourseResponse(BaseModel):
                 ]
             }
         }
+
+class CourseOutline(CourseResponse):
+    """Model for a two-phase course: modules may be outlines whose lessons are expanded on request."""
+    modules: List[Union[Module, ModuleOutline]]
+
+def field_value(item: Union[BaseModel, Dict], name: str):
+    """Field ``name`` of a model or key of a plain dict, so course helpers accept either form."""
+    return getattr(item, name, None) if isinstance(item, BaseModel) else item.get(name)
@@ -0,0 +1,259 @@
+"""Record/replay stand-in for the Ollama generate API.
+
+Recording: set AI_RECORD_DIR and AIService appends every prompt/response pair
+to <AI_RECORD_DIR>/recordings.jsonl.
+
+Replay:
+    python ollama_replay.py --recordings recordings/recordings.jsonl --port 11435 \\
+        --latency lognormal:1.5,0.4 --tokens-per-second 25 --malformed-rate 0.1
+
+then point the backend at it with OLLAMA_HOST=http://localhost:11435.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from loguru import logger
+
+RECORDINGS_FILE = "recordings.jsonl"
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+class ReplayError(Exception):
+    """Custom exception for record/replay errors"""
+    pass
+
+def prompt_key(model: str, prompt: str) -> str:
+    """Stable key identifying a (model, prompt) pair."""
+    return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+class Recorder:
+    """Appends LLM prompts and responses to a JSONL file."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, RECORDINGS_FILE)
+
+    async def record(self, model: str, prompt: str, options: Dict, response: Dict, section: str,
+                     duration: float) -> None:
+        entry = {
+            "key": prompt_key(model, prompt),
+            "model": model,
+            "section": section,
+            "prompt": prompt,
+            "options": options,
+            "response": response.get("response", ""),
+            "eval_count": response.get("eval_count"),
+            "duration": duration,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        await asyncio.get_running_loop().run_in_executor(None, self._append, line)
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+def load_recordings(path: str) -> List[Dict]:
+    recordings = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                recordings.append(json.loads(line))
+    if not recordings:
+        raise ReplayError(f"No recordings found in {path}")
+    return recordings
+
+class LatencyModel:
+    """Samples the time to first token.
+
+    Specs: ``fixed:S``, ``uniform:LOW,HIGH``, ``lognormal:MU,SIGMA`` (of the
+    log of seconds) or ``recorded[:SCALE]`` to reuse the recorded duration.
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value]
+        self.rng = rng
+        if kind not in ("fixed", "uniform", "lognormal", "recorded"):
+            raise ReplayError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, recording: Dict) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(self.params[0], self.params[1])
+        scale = self.params[0] if self.params else 1.0
+        return (recording.get("duration") or 0.0) * scale
+
+def corrupt_json(text: str, rng: random.Random) -> str:
+    """Break a JSON document the way LLMs typically do."""
+    commas = [match.start() for match in re.finditer(",", text)]
+    if commas and rng.random() < 0.5:
+        position = rng.choice(commas)
+        return text[:position] + text[position + 1:]
+    return text[: max(1, int(len(text) * rng.uniform(0.5, 0.95)))]
+
+class ReplayStore:
+    """Chooses a recorded response for an incoming prompt."""
+
+    def __init__(self, recordings: List[Dict], rng: random.Random):
+        self.rng = rng
+        self.by_key: Dict[str, Dict] = {}
+        self.by_prompt: Dict[str, Dict] = {}
+        self.by_section: Dict[str, List[Dict]] = {}
+        self.all = recordings
+        for recording in recordings:
+            self.by_key[recording["key"]] = recording
+            self.by_prompt[recording["prompt"]] = recording
+            self.by_section.setdefault(recording.get("section", "content"), []).append(recording)
+
+    def lookup(self, model: str, prompt: str) -> Tuple[Dict, str]:
+        """Return (recording, match kind): exact, prompt, section or any."""
+        recording = self.by_key.get(prompt_key(model, prompt))
+        if recording:
+            return recording, "exact"
+        recording = self.by_prompt.get(prompt)
+        if recording:
+            return recording, "prompt"
+        # Unknown prompt (e.g. a new topic): answer with a recording of the same section
+        for section, candidates in self.by_section.items():
+            if f'"{section}"' in prompt:
+                return self.rng.choice(candidates), "section"
+        return self.rng.choice(self.all), "any"
+
+def create_replay_app(
+    recordings_path: str,
+    latency: str = "fixed:0",
+    tokens_per_second: float = 0.0,
+    malformed_rate: float = 0.0,
+    seed: Optional[int] = None,
+    formats: str = "schema,json",
+) -> FastAPI:
+    """Build an app that serves recorded responses through the Ollama API.
+
+    ``formats`` lists the structured output formats the simulated server
+    accepts; requests using any other one are rejected like an old Ollama.
+    """
+    rng = random.Random(seed)
+    store = ReplayStore(load_recordings(recordings_path), rng)
+    latency_model = LatencyModel(latency, rng)
+    supported_formats = {kind.strip() for kind in formats.split(",") if kind.strip()}
+    app = FastAPI()
+    app.state.stats = {"requests": 0, "exact": 0, "prompt": 0, "section": 0, "any": 0, "malformed": 0}
+
+    def pick(model: str, prompt: str) -> Tuple[str, float, List[str]]:
+        recording, match = store.lookup(model, prompt)
+        app.state.stats["requests"] += 1
+        app.state.stats[match] += 1
+        text = recording["response"]
+        if malformed_rate and rng.random() < malformed_rate:
+            text = corrupt_json(text, rng)
+            app.state.stats["malformed"] += 1
+        return text, latency_model.sample(recording), TOKEN_PATTERN.findall(text)
+
+    def final_chunk(model: str, tokens: List[str], started: float, text: str = "",
+                    done_reason: str = "stop") -> Dict:
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": True,
+            "done_reason": done_reason,
+            "context": [],
+            "total_duration": elapsed_ns,
+            "load_duration": 0,
+            "prompt_eval_count": 0,
+            "prompt_eval_duration": 0,
+            "eval_count": len(tokens),
+            "eval_duration": elapsed_ns,
+        }
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/tags")
+    async def tags():
+        models = sorted({recording["model"] for recording in store.all})
+        return {"models": [{"name": model, "model": model} for model in models]}
+
+    @app.get("/replay/stats")
+    async def stats():
+        return app.state.stats
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        if not prompt:
+            raise HTTPException(status_code=400, detail="prompt is required")
+        requested_format = body.get("format") or ""
+        format_kind = "schema" if isinstance(requested_format, dict) else requested_format
+        if format_kind and format_kind not in supported_formats:
+            return JSONResponse({"error": f"invalid format: {format_kind}"}, status_code=400)
+        text, first_token_delay, tokens = pick(model, prompt)
+        done_reason = "stop"
+        num_predict = (body.get("options") or {}).get("num_predict")
+        if num_predict and 0 < num_predict < len(tokens):
+            tokens = tokens[:num_predict]
+            text = "".join(tokens)
+            done_reason = "length"
+        token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        started = time.perf_counter()
+
+        if not body.get("stream", True):
+            await asyncio.sleep(first_token_delay + token_delay * len(tokens))
+            return JSONResponse(final_chunk(model, tokens, started, text, done_reason))
+
+        async def stream():
+            await asyncio.sleep(first_token_delay)
+            for token in tokens:
+                chunk = {
+                    "model": model,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "response": token,
+                    "done": False,
+                }
+                yield json.dumps(chunk) + "\n"
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+            yield json.dumps(final_chunk(model, tokens, started, done_reason=done_reason)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded Ollama responses")
+    parser.add_argument("--recordings", required=True, help="Path to a recordings.jsonl file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:A,B | lognormal:MU,SIGMA | recorded[:SCALE]")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Pacing of generated tokens (0 = unpaced)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses with corrupted JSON")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--formats", default="schema,json", help="Structured output formats to accept")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    app = create_replay_app(args.recordings, args.latency, args.tokens_per_second, args.malformed_rate, args.seed,
+                            args.formats)
+    logger.info("Replaying {} on {}:{}", args.recordings, args.host, args.port)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Quizzes derived from a course's own lessons instead of a separate LLM call.
+
+Three kinds of question, each with distractors taken from other lessons:
+    cloze       a sentence of a lesson explanation with one key term blanked out
+    takeaway    which statement is the key takeaway of a lesson
+    module      which day covers a lesson (works on outlines without lesson bodies)
+
+Every quiz is validated with models.Quiz, so it has exactly
+QUIZ_OPTIONS_COUNT unique options and the answer is one of them.
+"""
+import random
+import re
+from typing import Dict, Iterator, List, Optional, Sequence
+from pydantic import ValidationError
+from config import MAX_QUIZZES, QUIZ_OPTIONS_COUNT
+from models import Quiz, field_value
+
+TERM = re.compile(r"[A-Za-z][A-Za-z0-9+#._-]*[A-Za-z0-9+#]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+
+STOPWORDS = frozenset("""
+about above after again also among another because been before being below between both built called
+can could does doing done each either every from have having here into just like made make makes many
+more most much must need only other over same should some such than that their them then there these
+they this those through under until used uses using very what when where which while will with within
+without would your lesson lessons example examples first second third learn learning understand
+""".split())
+
+MIN_SENTENCE_LENGTH = 30
+MAX_SENTENCE_LENGTH = 220
+
+def key_terms(text: str) -> List[str]:
+    """Candidate terms of a text: words that are not stopwords and are long or technical (C++, Node.js)."""
+    terms = []
+    for term in TERM.findall(text):
+        if term.lower() in STOPWORDS or term.isdigit():
+            continue
+        if len(term) >= 5 or any(char in term for char in "+#.") or term.isupper():
+            terms.append(term)
+    return terms
+
+def sentences(explanation: str) -> Iterator[str]:
+    for line in explanation.split("\n"):
+        for sentence in SENTENCE_END.split(LIST_MARKER.sub("", line).strip()):
+            if MIN_SENTENCE_LENGTH <= len(sentence) <= MAX_SENTENCE_LENGTH:
+                yield sentence
+
+class QuizBuilder:
+    """Builds quizzes for one course; ``seed`` makes option order reproducible."""
+
+    def __init__(self, modules: Sequence, seed: Optional[str] = None, options: int = QUIZ_OPTIONS_COUNT):
+        self.options = options
+        self.rng = random.Random(seed)
+        self.lessons = []  # (module name, lesson)
+        for module in modules:
+            for lesson in field_value(module, "lessons") or []:
+                self.lessons.append((field_value(module, "name"), lesson))
+        self.module_names = list(dict.fromkeys(name for name, _ in self.lessons))
+        self.terms: Dict[int, List[str]] = {
+            i: key_terms(field_value(lesson, "explanation") or "") for i, (_, lesson) in enumerate(self.lessons)
+        }
+
+    def _quiz(self, question: str, correct: str, distractors: List[str]) -> Optional[Quiz]:
+        seen = {correct.lower()}
+        unique = []
+        for option in distractors:
+            if option.lower() not in seen:
+                seen.add(option.lower())
+                unique.append(option)
+        if len(unique) < self.options - 1:
+            return None
+        options = self.rng.sample(unique, self.options - 1) + [correct]
+        self.rng.shuffle(options)
+        try:
+            return Quiz(question=question, options=options, correct_answer=correct)
+        except ValidationError:
+            return None
+
+    def cloze(self, i: int) -> Optional[Quiz]:
+        """Blank out a key term of one explanation sentence; distractors are terms of other lessons."""
+        _, lesson = self.lessons[i]
+        title_words = {word.lower() for word in TERM.findall(field_value(lesson, "title") or "")}
+        others = [term for j, terms in self.terms.items() if j != i for term in terms]
+        candidates = list(sentences(field_value(lesson, "explanation") or ""))
+        self.rng.shuffle(candidates)
+        for sentence in candidates:
+            terms = [term for term in key_terms(sentence)
+                     if len(re.findall(rf"(?<!\w){re.escape(term)}(?!\w)", sentence)) == 1]
+            if not terms:
+                continue
+            # Prefer the term the lesson is about, then the longest one
+            term = max(terms, key=lambda term: (term.lower() in title_words, len(term)))
+            in_sentence = {word.lower() for word in key_terms(sentence)}
+            distractors = [other for other in others if other.lower() not in in_sentence]
+            similar = [other for other in distractors if other[0].isupper() == term[0].isupper()]
+            blanked = re.sub(rf"(?<!\w){re.escape(term)}(?!\w)", "_____", sentence, count=1)
+            quiz = self._quiz(f"Fill in the blank: {blanked}", term, similar) or self._quiz(
+                f"Fill in the blank: {blanked}", term, distractors)
+            if quiz:
+                return quiz
+        return None
+
+    def takeaway(self, i: int) -> Optional[Quiz]:
+        """Match a lesson title to its key takeaway; distractors are other lessons' takeaways."""
+        _, lesson = self.lessons[i]
+        correct = field_value(lesson, "key_takeaway")
+        if not correct:
+            return None
+        distractors = [field_value(other, "key_takeaway") for j, (_, other) in enumerate(self.lessons) if j != i]
+        return self._quiz(f'What is the key takeaway of the lesson "{field_value(lesson, "title")}"?', correct,
+                          [text for text in distractors if text])
+
+    def module(self, i: int) -> Optional[Quiz]:
+        """Ask which module covers a lesson; distractors are the other module names."""
+        name, lesson = self.lessons[i]
+        return self._quiz(f'Which part of the course covers "{field_value(lesson, "title")}"?', name,
+                          [other for other in self.module_names if other != name])
+
+    def build(self, count: int = MAX_QUIZZES) -> List[Quiz]:
+        """Up to ``count`` quizzes spread evenly over the course, alternating question kinds."""
+        if not self.lessons:
+            return []
+        kinds = (self.cloze, self.takeaway, self.module)
+        step = max(1, len(self.lessons) // count)
+        order = list(range(0, len(self.lessons), step)) + [i for i in range(len(self.lessons)) if i % step]
+        quizzes, questions = [], set()
+        # Each pass asks every lesson a different kind of question than the pass before
+        for shift in range(len(kinds)):
+            for n, i in enumerate(order):
+                if len(quizzes) >= count:
+                    return quizzes
+                quiz = kinds[(n + shift) % len(kinds)](i)
+                if quiz and quiz.question not in questions:
+                    quizzes.append(quiz)
+                    questions.add(quiz.question)
+        return quizzes
+
+def build_quizzes(modules: Sequence, count: int = MAX_QUIZZES, seed: Optional[str] = None) -> List[Quiz]:
+    """Quizzes derived from ``modules`` (models or dicts, full lessons or outlines)."""
+    return QuizBuilder(modules, seed).build(count)
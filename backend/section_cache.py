@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+from loguru import logger
+from pydantic import ValidationError
+from config import MAX_QUIZZES, MIN_QUIZZES, SECTION_CACHE_MAX_ENTRIES, SECTION_CACHE_TTL
+from metrics import CACHE_HITS, CACHE_MISSES
+from compact_course import pack_section, unpack_section
+from structured_output import SECTION_MODELS
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+def section_key(section: str, topic: str, level: str, days: int) -> Tuple:
+    """Cache key of a whole section.
+
+    Quizzes and the practice plan only depend on topic and level; modules,
+    tasks and outlines also depend on the number of days, since the LLM plans
+    a module list for the length of the course.
+    """
+    if section in ("modules", "tasks", "outline"):
+        return (normalize_topic(topic), level, days)
+    return (normalize_topic(topic), level)
+
+class _LRU:
+    """Bounded LRU map with optional expiry, one per section."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, predicate) -> int:
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SectionCache:
+    """Caches generated course sections so courses can be assembled from pieces.
+
+    Each section has its own LRU, so a burst of new task lists cannot evict
+    quizzes or modules. Only sections that validate against their
+    structured_output model are stored, in the packed form of compact_course.
+    """
+
+    def __init__(self, max_entries: int = SECTION_CACHE_MAX_ENTRIES, ttl: float = SECTION_CACHE_TTL):
+        self._sections: Dict[str, _LRU] = {
+            section: _LRU(max_entries, ttl) for section in SECTION_MODELS
+            # Lesson bodies belong to one course outline and are memoised by course_store
+            if section != "lesson"
+        }
+
+    def get(self, section: str, topic: str, level: str, days: int) -> Optional[List]:
+        """Return the cached section, or None."""
+        value = self._sections[section].get(section_key(section, topic, level, days))
+        if value is None:
+            CACHE_MISSES.inc(cache=f"section_{section}")
+            return None
+        CACHE_HITS.inc(cache=f"section_{section}")
+        return unpack_section(section, value)
+
+    def put(self, section: str, topic: str, level: str, days: int, items: List) -> bool:
+        """Store a generated section; returns False if it did not validate."""
+        try:
+            parsed = getattr(SECTION_MODELS[section](**{section: items}), section)
+        except (ValidationError, TypeError) as e:
+            logger.debug("Not caching invalid {} section: {}", section, e)
+            return False
+        if (section == "tasks" and len(items) < days) or (
+            section in ("modules", "outline") and len(items) != days
+        ) or (
+            section == "quizzes" and not MIN_QUIZZES <= len(items) <= MAX_QUIZZES
+        ):
+            return False
+        self._sections[section].put(section_key(section, topic, level, days), pack_section(section, parsed))
+        return True
+
+    def invalidate(self, section: Optional[str] = None, topic: Optional[str] = None,
+                   level: Optional[str] = None) -> int:
+        """Evict entries of one or all sections, optionally only for a topic and/or level."""
+        topic = normalize_topic(topic) if topic is not None else None
+
+        def matches(key: Tuple) -> bool:
+            return (topic is None or key[0] == topic) and (level is None or key[1] == level)
+
+        sections = [section] if section else list(self._sections)
+        return sum(self._sections[name].discard(matches) for name in sections)
+
+    def sizes(self) -> Dict[str, int]:
+        return {section: len(cache) for section, cache in self._sections.items()}
+
+SECTION_CACHE = SectionCache()
@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from starlette.background import BackgroundTask
+from typing import List, Literal, Optional
 from loguru import logger
+from cache_warmer import CacheWarmer, host_activity
+from config import (
+    AI_AVAILABLE, DISCONNECT_POLL_INTERVAL, LAZY_LESSONS, PLAN_SOURCE, QUIZ_SOURCE, REQUEST_DEADLINE_SECONDS, WARMER_ENABLED,
+    WARMER_HISTORY_FILES
+)
+from course_cache import course_key, flush_access_times_periodically, get_course_cache, is_cacheable
+from course_store import course_outline, get_course_store, new_course_id
+from deadline import Deadline, watch_disconnect
+from lesson_prefetch import PREFETCHER
+from log_pipeline import RequestIdMiddleware
+from metrics import CACHE_HITS, CACHE_MISSES, COURSE_RESIZES, REGISTRY, REQUEST_SECONDS, IN_FLIGHT_REQUESTS, SERIALIZATION_SECONDS, monitor_event_loop_lag
+from tracing import TRACER, traced, to_chrome_trace, render_waterfall
+import asyncio
+import time
 import json
 import os
 
@@ -18,11 +33,46 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(RequestIdMiddleware)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start the event loop lag monitor, the cache access time writer and the cache warmer."""
+    app.state.lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    app.state.cache_warmer = app.state.cache_flusher = None
+    cache = get_course_cache()
+    if cache:
+        app.state.cache_flusher = asyncio.create_task(flush_access_times_periodically(cache))
+        if PREFETCHER:
+            # Prefetching yields to requests on any worker sharing the cache
+            PREFETCHER.activity = host_activity(cache)
+    if WARMER_ENABLED and AI_AVAILABLE and cache:
+        from course_generator import generate_course
+        warmer = CacheWarmer(cache, generate_course, WARMER_HISTORY_FILES)
+        app.state.cache_warmer = asyncio.create_task(warmer.run())
+
+@app.on_event("shutdown")
+async def flush_logs():
+    """Drain the queued log sink before the process exits."""
+    app.state.lag_monitor.cancel()
+    if app.state.cache_warmer:
+        app.state.cache_warmer.cancel()
+    if app.state.cache_flusher:
+        app.state.cache_flusher.cancel()
+    if PREFETCHER:
+        PREFETCHER.stop()
+    await logger.complete()
 
 class CourseRequest(BaseModel):
     topic: str
     level: str
     days: int
+    # Return an outline and generate lesson bodies on request (defaults to LAZY_LESSONS)
+    lazy: Optional[bool] = None
+    # "ai" asks the LLM for quizzes, "local" derives them from the lessons (defaults to QUIZ_SOURCE)
+    quiz_source: Optional[Literal["ai", "local"]] = None
+    # The same for the daily tasks and practice plan (defaults to PLAN_SOURCE)
+    plan_source: Optional[Literal["ai", "local"]] = None
 
 @app.get("/")
 async def read_root():
@@ -30,14 +80,59 @@ async def read_root():
     return FileResponse("../frontend/index.html")
 
 @app.post("/generate-course")
-async def generate_course_endpoint(request: CourseRequest):
-    """Generate a course based on the provided parameters."""
+@traced()
+async def generate_course_endpoint(request: CourseRequest, http_request: Request):
+    """Generate a course based on the provided parameters.
+
+    Generation runs under a REQUEST_DEADLINE_SECONDS deadline that is also
+    cancelled when the client disconnects. A lazy request returns the course
+    outline; lesson bodies are generated by the /courses/{id}/modules endpoints.
+    """
+    started = time.perf_counter()
+    status = "500"
+    cache = get_course_cache()
+    # The cache warmer of any worker sharing the cache yields while this request runs
+    activity = host_activity(cache) if cache else None
+    IN_FLIGHT_REQUESTS.inc()
+    if activity:
+        activity.enter()
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS)
+    watcher = asyncio.create_task(watch_disconnect(http_request, deadline, DISCONNECT_POLL_INTERVAL))
     try:
-        logger.info(f"Generating course for topic: {request.topic}, level: {request.level}, days: {request.days}")
+        logger.info("Generating course for topic: {}, level: {}, days: {}", request.topic, request.level, request.days)
+        
+        store = get_course_store()
+        lazy = (LAZY_LESSONS if request.lazy is None else request.lazy) and store is not None
+        quiz_source = request.quiz_source or QUIZ_SOURCE
+        plan_source = request.plan_source or PLAN_SOURCE
+        # Default options share the key the cache warmer fills
+        variants = ["outline"] if lazy else []
+        if quiz_source != QUIZ_SOURCE:
+            variants.append(f"quizzes={quiz_source}")
+        if plan_source != PLAN_SOURCE:
+            variants.append(f"plan={plan_source}")
+        key = course_key(request.topic, request.level, request.days, *variants)
+        loop = asyncio.get_running_loop()
+        if cache:
+            body = await loop.run_in_executor(None, cache.get, key)
+            (CACHE_MISSES if body is None else CACHE_HITS).inc(cache="course")
+            if body is not None:
+                logger.info("Serving course from the shared cache")
+                status = "200"
+                return Response(content=body, media_type="application/json")
         
         # Generate course using our course generator
-        from course_generator import generate_course
-        course = await generate_course(request.topic, request.level, request.days)
+        from course_generator import generate_course, generate_course_outline
+        course = None
+        if store and not lazy:
+            course = await resize_stored_course(store, request, variants, deadline, quiz_source, plan_source)
+        if course is None:
+            generate = generate_course_outline if lazy else generate_course
+            course = await generate(request.topic, request.level, request.days, deadline, quiz_source, plan_source)
+        if deadline.cancelled:
+            logger.info("Client disconnected before the course was ready")
+            status = "499"
+            return Response(status_code=499)
         
         if not course:
             logger.error("Course generation returned None")
@@ -46,20 +141,39 @@ async def generate_course_endpoint(request: CourseRequest):
                 detail="Failed to generate course content. Please try again."
             )
             
-        response = course.dict()
+        if store:
+            course.course_id = new_course_id()
+        with SERIALIZATION_SECONDS.time():
+            data = course.dict()
+            response = JSONResponse(content=data)
+        if store:
+            # Indexed under the cache key, so compaction can drop the cache entry with the course;
+            # complete courses can also be resized for later requests with other days
+            index = key if is_cacheable(course) else None
+            await loop.run_in_executor(None, store.save, course.course_id, response.body, index)
+        if lazy:
+            response = JSONResponse(content=course_outline(course.course_id, data))
+            if PREFETCHER:
+                # After the response, when this request no longer counts as in flight
+                response.background = BackgroundTask(prefetch_first_days, store, course.course_id, data)
+        if cache and is_cacheable(course):
+            await loop.run_in_executor(None, cache.put, key, response.body)
         logger.info("Course generated successfully")
-        return JSONResponse(content=response)
+        status = "200"
+        return response
         
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"Error generating course: {error_msg}")
+        logger.error("Error generating course: {}", error_msg)
         
         if "AI generation failed" in error_msg:
+            status = "503"
             raise HTTPException(
                 status_code=503,
                 detail="AI service is temporarily unavailable. Please try again later."
             )
         elif "Invalid topic" in error_msg:
+            status = "400"
             raise HTTPException(
                 status_code=400,
                 detail="Invalid topic provided. Please try a different topic."
@@ -74,6 +188,128 @@ async def generate_course_endpoint(request: CourseRequest):
                 status_code=500,
                 detail="An unexpected error occurred. Please try again later."
             )
+    finally:
+        watcher.cancel()
+        IN_FLIGHT_REQUESTS.dec()
+        if activity:
+            activity.exit()
+        REQUEST_SECONDS.observe(time.perf_counter() - started, status=status)
+
+async def resize_stored_course(store, request: CourseRequest, variants: List[str], deadline: Deadline,
+                               quiz_source: str, plan_source: str):
+    """The requested course built from a stored one with other days, or None if there is none or it fails."""
+    from course_generator import resize_course
+    stored = await asyncio.get_running_loop().run_in_executor(
+        None, store.find_resizable, request.topic, request.level, request.days, variants
+    )
+    if stored is None:
+        return None
+    try:
+        return await resize_course(stored, request.topic, request.level, request.days, deadline,
+                                   quiz_source, plan_source)
+    except Exception as e:
+        COURSE_RESIZES.inc(kind="failed")
+        logger.warning("Could not resize the stored {}-day course: {}", stored["days"], e)
+        return None
+
+async def load_stored_course(course_id: str) -> dict:
+    store = get_course_store()
+    course = await asyncio.get_running_loop().run_in_executor(None, store.load, course_id) if store else None
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+@app.get("/courses/{course_id}")
+async def get_course_outline(course_id: str):
+    """Outline of a stored course: module names, lesson titles, tasks and the practice plan"""
+    return JSONResponse(content=course_outline(course_id, await load_stored_course(course_id)))
+
+async def prefetch_first_days(store, course_id: str, course: dict):
+    """Queue the first days of a two-phase course once the request that created it has finished."""
+    PREFETCHER.schedule(store, course_id, course, 0, lesson_generator)
+
+def lesson_generator(course: dict, deadline: Optional[Deadline] = None):
+    """Generate missing lesson bodies of a two-phase course under ``deadline`` (the request deadline by default)."""
+    from course_generator import generate_lesson_body
+    deadline = deadline or Deadline(REQUEST_DEADLINE_SECONDS)
+    return lambda module, index: generate_lesson_body(course["topic"], course["level"], module, index, deadline)
+
+def lesson_unavailable(error: Exception) -> HTTPException:
+    logger.error("Error generating lesson: {}", error)
+    return HTTPException(
+        status_code=503,
+        detail="AI service is temporarily unavailable. Please try again later."
+    )
+
+@app.get("/courses/{course_id}/modules/{number}")
+async def get_course_module(course_id: str, number: int):
+    """One module of a stored course with its full lessons (numbered from 1)"""
+    course = await load_stored_course(course_id)
+    if not 1 <= number <= len(course["modules"]):
+        raise HTTPException(status_code=404, detail="Module not found")
+    store = get_course_store()
+    try:
+        if PREFETCHER:
+            PREFETCHER.claim(course_id, number)
+            with PREFETCHER.foreground():
+                module = await store.module(course_id, course, number, lesson_generator(course))
+            PREFETCHER.schedule(store, course_id, course, number, lesson_generator)
+        else:
+            module = await store.module(course_id, course, number, lesson_generator(course))
+    except Exception as e:
+        raise lesson_unavailable(e)
+    return JSONResponse(content=module)
+
+@app.get("/courses/{course_id}/modules/{number}/lessons/{index}")
+async def get_course_lesson(course_id: str, number: int, index: int):
+    """One full lesson of a stored course (both numbered from 1)"""
+    course = await load_stored_course(course_id)
+    if not 1 <= number <= len(course["modules"]) or not 1 <= index <= len(course["modules"][number - 1]["lessons"]):
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    store = get_course_store()
+    try:
+        if PREFETCHER:
+            PREFETCHER.claim(course_id, number, index - 1)
+            with PREFETCHER.foreground():
+                lesson = await store.lesson(course_id, course, number, index - 1, lesson_generator(course))
+            PREFETCHER.schedule(store, course_id, course, number, lesson_generator)
+        else:
+            lesson = await store.lesson(course_id, course, number, index - 1, lesson_generator(course))
+    except Exception as e:
+        raise lesson_unavailable(e)
+    return JSONResponse(content=lesson)
+
+@app.get("/courses/{course_id}/quizzes")
+async def get_course_quizzes(course_id: str):
+    """The quizzes of a stored course"""
+    return JSONResponse(content=(await load_stored_course(course_id))["quizzes"])
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Expose metrics in the Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.content_type)
+
+@app.get("/debug/traces")
+async def list_traces(limit: int = 20, format: str = "json"):
+    """List the most recent request traces (json, chrome or text)"""
+    traces = TRACER.recent(limit)
+    if format == "chrome":
+        return JSONResponse(content=to_chrome_trace(traces))
+    if format == "text":
+        return PlainTextResponse("\n".join(render_waterfall(trace) for trace in traces))
+    return JSONResponse(content=[trace.to_dict() for trace in traces])
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = "json"):
+    """Return a single trace by id (json, chrome or text)"""
+    trace = TRACER.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "chrome":
+        return JSONResponse(content=to_chrome_trace([trace]))
+    if format == "text":
+        return PlainTextResponse(render_waterfall(trace))
+    return JSONResponse(content=trace.to_dict())
 
 # Serve static files
 @app.get("/{path:path}")
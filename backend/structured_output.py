@@ -0,0 +1,142 @@
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel
+from loguru import logger
+from config import AI_OUTPUT_MODE
+from models import Lesson, Module, ModuleOutline, Quiz
+
+# Output modes, strongest first:
+#   schema - Ollama constrains decoding to the section's JSON schema
+#   json   - Ollama constrains decoding to syntactically valid JSON
+#   prompt - no decoding constraint, the prompt asks for JSON
+OUTPUT_MODES = ("schema", "json", "prompt")
+
+JSON_RULES_PROMPT = """
+You are a JSON generator. Your task is to generate valid JSON based on the following requirements.
+Rules:
+1. Return ONLY valid JSON, no other text
+2. Include all necessary commas between elements
+3. Format the JSON properly with correct indentation
+4. Do not include any explanations or markdown
+5. Do not use code blocks or ```json markers
+6. Ensure all JSON is properly escaped
+7. Add commas after every object in arrays
+8. Add commas after every key-value pair except the last one in an object
+
+Requirements:
+{prompt}
+"""
+
+CONSTRAINED_PROMPT = """Respond with a single JSON object.
+{prompt}
+"""
+
+class ModulesSection(BaseModel):
+    modules: List[Module]
+
+class TasksSection(BaseModel):
+    tasks: List[str]
+
+class QuizzesSection(BaseModel):
+    quizzes: List[Quiz]
+
+class PracticePlanSection(BaseModel):
+    practice_plan: List[str]
+
+class OutlineSection(BaseModel):
+    outline: List[ModuleOutline]
+
+class LessonSection(BaseModel):
+    lesson: Lesson
+
+SECTION_MODELS = {
+    "modules": ModulesSection,
+    "tasks": TasksSection,
+    "quizzes": QuizzesSection,
+    "practice_plan": PracticePlanSection,
+    "outline": OutlineSection,
+    "lesson": LessonSection,
+}
+
+# Keywords kept from the pydantic schema; the rest (titles, descriptions) only cost prompt tokens
+SCHEMA_KEYWORDS = {"type", "properties", "required", "items", "minItems", "maxItems", "minLength", "maxLength",
+                   "pattern", "enum", "minimum", "maximum", "additionalProperties"}
+
+def _inline(node, definitions: Dict):
+    if isinstance(node, list):
+        return [_inline(item, definitions) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _inline(definitions[node["$ref"].rsplit("/", 1)[-1]], definitions)
+    inlined = {}
+    for key, value in node.items():
+        if key == "properties":
+            inlined[key] = {name: _inline(prop, definitions) for name, prop in value.items()}
+        elif key in SCHEMA_KEYWORDS:
+            inlined[key] = _inline(value, definitions)
+    return inlined
+
+_schemas: Dict[str, Dict] = {}
+
+def section_schema(section: str) -> Optional[Dict]:
+    """JSON schema for a course section, derived from the models.py classes.
+
+    Sections generated together are named "modules+tasks" and get one object
+    schema with every part's key.
+    """
+    if section not in _schemas:
+        parts = section.split("+")
+        if any(part not in SECTION_MODELS for part in parts):
+            return None
+        schemas = []
+        for part in parts:
+            schema = SECTION_MODELS[part].schema()
+            schemas.append(_inline(schema, schema.get("definitions", {})))
+        if len(schemas) == 1:
+            _schemas[section] = schemas[0]
+        else:
+            _schemas[section] = {
+                "type": "object",
+                "properties": {key: value for schema in schemas for key, value in schema["properties"].items()},
+                "required": [key for schema in schemas for key in schema.get("required", [])],
+            }
+    return _schemas[section]
+
+def request_format(section: str, mode: str) -> Union[str, Dict]:
+    """Value of the Ollama ``format`` field for a section in the given mode."""
+    if mode == "schema":
+        return section_schema(section) or "json"
+    if mode == "json":
+        return "json"
+    return ""
+
+def build_prompt(prompt: str, mode: str) -> str:
+    """Wrap a section prompt for the given output mode."""
+    if mode == "prompt":
+        return JSON_RULES_PROMPT.format(prompt=prompt)
+    return CONSTRAINED_PROMPT.format(prompt=prompt)
+
+def is_format_unsupported(error: Exception) -> bool:
+    """Whether an Ollama error means the model or server rejected the format field."""
+    status = getattr(error, "status_code", None)
+    message = str(error).lower()
+    return status in (400, 422, 500) and ("format" in message or "schema" in message or "grammar" in message)
+
+class OutputModeSelector:
+    """Remembers the strongest output mode each model supports."""
+
+    def __init__(self, preferred: str = AI_OUTPUT_MODE):
+        self.preferred = preferred if preferred in OUTPUT_MODES else "schema"
+        self._modes: Dict[str, str] = {}
+
+    def mode_for(self, model: str) -> str:
+        return self._modes.get(model, self.preferred)
+
+    def downgrade(self, model: str, mode: str) -> str:
+        """Fall back to the next weaker mode after ``mode`` was rejected."""
+        weaker = OUTPUT_MODES[min(OUTPUT_MODES.index(mode) + 1, len(OUTPUT_MODES) - 1)]
+        self._modes[model] = weaker
+        logger.warning("Model {} rejected {} output mode, falling back to {}", model, mode, weaker)
+        return weaker
+
+OUTPUT_MODE_SELECTOR = OutputModeSelector()
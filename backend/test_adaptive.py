@@ -0,0 +1,11 @@
+from adaptive import LEARNING_RATE, Explorer, ema
+
+def test_first_measurement_is_taken_as_is_then_averaged():
+    assert ema(None, 10.0) == 10.0
+    assert ema(10.0, 20.0) == 10.0 + LEARNING_RATE * 10.0
+    assert ema(1.0, 0.0, rate=0.5) == 0.5
+
+def test_explorer_is_due_every_interval_per_key():
+    explorer = Explorer(3)
+    assert [explorer.due("a") for _ in range(6)] == [False, False, True, False, False, True]
+    assert not explorer.due("b")
@@ -0,0 +1,27 @@
+from bench_utils import compare_runs, make_course_data, measure
+from models import CourseResponse
+
+def test_sample_courses_are_valid():
+    for days in (1, 7, 30):
+        course = CourseResponse(**make_course_data(days))
+        assert len(course.modules) == days
+        assert len(course.tasks) == days
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+    current = {"results": {"a": {"median": 1.05}, "b": {"median": 1.5}, "c": {"median": 2.0}}}
+    rows = {row["name"]: row for row in compare_runs(baseline, current, threshold=0.10)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regression"]
+    assert rows["b"]["regression"]
+
+def test_measure_reports_per_call_time():
+    result = measure(lambda: sum(range(100)), repeat=3, min_time=0.01)
+    assert result["number"] >= 1
+    assert 0 < result["min"] <= result["median"]
+
+if __name__ == "__main__":
+    test_sample_courses_are_valid()
+    test_compare_flags_regressions()
+    test_measure_reports_per_call_time()
+    print("All benchmark utility tests passed")
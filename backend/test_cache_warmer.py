@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from bench_utils import make_course_data
+from cache_warmer import CacheWarmer, HistoryMiner, HostActivity, mine_history, rank_combos
+from course_cache import SharedCourseCache, course_key
+from models import CourseResponse
+
+def test_history_is_mined_from_text_json_and_workload_lines(tmp_path):
+    log = tmp_path / "api.log"
+    log.write_text(
+        "2025-05-28 03:06:43 | INFO | Generating course for topic: Python Programming, level: beginner, days: 30\n"
+        "2025-05-28 03:06:43.474 | INFO     | main:generate_course_endpoint:27 - Generating course for topic: "
+        "Python Programming, level: beginner, days: 30\n"
+        + json.dumps({"time": "2025-05-29T10:00:00.000+00:00", "request_id": "r1",
+                      "message": "Generating course for topic: sql, level: beginner, days: 5"}) + "\n"
+        + json.dumps({"time": "2025-05-29T10:00:00.000+00:00", "message": "Course generated successfully"}) + "\n"
+    )
+    workload = tmp_path / "requests.jsonl"
+    workload.write_text(json.dumps({"topic": "SQL", "level": "beginner", "days": 5}) + "\n")
+
+    requests = mine_history([str(log), str(workload), str(tmp_path / "missing.log")])
+    combos = [combo for combo, _ in requests]
+    assert combos == [("Python Programming", "beginner", 30), ("sql", "beginner", 5), ("SQL", "beginner", 5)]
+    ranked = rank_combos(requests, half_life_hours=24, now=requests[1][1])
+    assert ranked[0][0] == ("sql", "beginner", 5) and ranked[0][1] == 2.0
+
+def course(sources="ai"):
+    data = make_course_data(days=2)
+    return CourseResponse(**data, section_sources={section: sources for section in
+                                                   ("modules", "tasks", "quizzes", "practice_plan")})
+
+def test_warms_idle_cache_and_yields_to_live_traffic(tmp_path):
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"))
+    traffic = {"busy": False}
+
+    async def generate(topic, level, days, deadline):
+        if topic == "Rust":
+            traffic["busy"] = True
+            await deadline.run(asyncio.sleep(10))
+        return course()
+
+    warmer = CacheWarmer(cache, generate, [], idle_seconds=0, busy=lambda: traffic["busy"])
+    assert asyncio.run(warmer.warm_one("Python", "beginner", 2)) == "warmed"
+    assert json.loads(cache.get(course_key("Python", "beginner", 2)))["days"] == 2
+    assert asyncio.run(warmer.warm_one("Python", "beginner", 2)) == "cached"
+    assert asyncio.run(warmer.warm_one("Rust", "beginner", 2)) == "preempted"
+    assert not cache.contains(course_key("Rust", "beginner", 2))
+    assert not warmer.is_idle()
+
+    warmer.budget = 0
+    traffic["busy"] = False
+    assert asyncio.run(warmer.warm_one("Go", "beginner", 2)) == "over_budget"
+
+def test_history_is_read_incrementally_across_rotation(tmp_path):
+    log = tmp_path / "api.jsonl"
+
+    def line(topic):
+        return json.dumps({"time": "2025-05-29T10:00:00.000+00:00", "request_id": topic,
+                           "message": f"Generating course for topic: {topic}, level: beginner, days: 3"}) + "\n"
+
+    log.write_text(line("Go") + line("Rust")[:20])
+    miner = HistoryMiner([str(log)])
+    assert [combo[0] for combo, _ in miner.read()] == ["Go"]
+    with open(log, "a") as f:
+        f.write(line("Rust")[20:])
+    assert [combo[0] for combo, _ in miner.read()] == ["Go", "Rust"]
+    assert len(miner.read()) == 2  # nothing new
+
+    os.rename(log, tmp_path / "api.2025-05-29.jsonl")
+    log.write_text(line("Zig"))
+    assert [combo[0] for combo, _ in miner.read()] == ["Go", "Rust", "Zig"]
+
+def test_activity_is_shared_by_the_workers_of_a_host(tmp_path):
+    directory = str(tmp_path / "cache.sqlite3.live")
+    here, other = HostActivity(directory), HostActivity(directory)
+    assert not other.busy()
+    here.enter()
+    here.enter()
+    here.exit()
+    assert other.busy()
+    here.exit()
+    assert not other.busy()
+
+    # A worker that died while busy does not keep the warmer away
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    open(os.path.join(directory, dead.stdout.strip()), "w").close()
+    assert not other.busy() and os.listdir(directory) == []
@@ -0,0 +1,22 @@
+import json
+from bench_utils import make_course_data
+from compact_course import memory_per_course, pack_section, unpack_section
+from models import CourseResponse, Quiz
+
+def fresh_course(topic="Python"):
+    # Parsed from JSON so equal strings are separate objects, as in LLM output
+    return CourseResponse(**json.loads(json.dumps(make_course_data(days=3, topic=topic))))
+
+def test_pack_round_trips_sections():
+    course = fresh_course()
+    assert unpack_section("modules", pack_section("modules", course.modules)) == course.dict()["modules"]
+    quizzes = [Quiz(**quiz) for quiz in make_course_data(days=1)["quizzes"]]
+    assert unpack_section("quizzes", pack_section("quizzes", quizzes)) == [quiz.dict() for quiz in quizzes]
+    assert unpack_section("tasks", pack_section("tasks", ["Day 1: Read"])) == ["Day 1: Read"]
+
+def test_packed_sections_share_strings_and_use_less_memory():
+    first, second = (pack_section("modules", fresh_course(topic).modules) for topic in ("Python", "Rust"))
+    assert first[0].lessons[0].explanation is second[0].lessons[0].explanation
+    models = memory_per_course([fresh_course().modules, fresh_course("Rust").modules])
+    packed = memory_per_course([first, second])
+    assert packed["bytes_per_course"] < models["bytes_per_course"] / 2
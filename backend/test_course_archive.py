@@ -0,0 +1,106 @@
+import json
+import pytest
+from bench_utils import make_course_data
+from course_archive import ArchiveError, CourseArchive, train_dictionary
+
+def documents(count=6):
+    return [json.dumps(make_course_data(days=i + 1, topic=f"Topic {i}")).encode() for i in range(count)]
+
+def test_append_get_and_reopen(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    samples = documents()
+    archive = CourseArchive(path, train_dictionary(samples[:3]))
+    for i, document in enumerate(samples):
+        archive.append(f"course-{i}", document)
+    archive.append("course-0", samples[5])
+    assert archive.get("course-0") == samples[5] and archive.get("missing") is None
+    archive.close()
+
+    reopened = CourseArchive(path)
+    assert len(reopened) == 6 and reopened.get("course-3") == samples[3]
+    with pytest.raises(ArchiveError):
+        reopened.append("bad\tkey", b"{}")
+
+def test_index_is_rebuilt_from_records(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    samples = documents(3)
+    archive = CourseArchive(path, train_dictionary(samples))
+    for i, document in enumerate(samples):
+        archive.append(str(i), document)
+    archive.close()
+    with open(path + ".idx") as f:
+        first = f.readline()
+    with open(path + ".idx", "w") as f:
+        f.write(first)
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x00\x01\x00\x00\x10")  # torn record header
+    recovered = CourseArchive(path)
+    assert [recovered.get(str(i)) for i in range(3)] == samples
+    recovered.append("3", samples[0])
+    recovered.close()
+    assert CourseArchive(path).keys() == ["0", "1", "2", "3"]
+
+def test_trained_dictionary_beats_no_dictionary(tmp_path):
+    samples = documents(8)
+    trained = CourseArchive(str(tmp_path / "trained.cca"), train_dictionary(samples[:4]))
+    plain = CourseArchive(str(tmp_path / "plain.cca"), b"")
+    for archive in (trained, plain):
+        for i, document in enumerate(samples[4:]):
+            archive.append(str(i), document)
+    assert trained.stats()["bytes"] < plain.stats()["bytes"]
+    with open(tmp_path / "trained.cca.dict", "wb") as f:
+        f.write(b"another dictionary")
+    with pytest.raises(ArchiveError):
+        CourseArchive(str(tmp_path / "trained.cca"))
+
+def test_records_from_another_writer_are_visible(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    samples = documents(4)
+    first = CourseArchive(path, train_dictionary(samples))
+    second = CourseArchive(path, train_dictionary(samples[:1]))  # already exists; its dictionary is ignored
+    first.append("a", samples[0])
+    second.append("b", samples[1])
+    first.append("c", samples[2])
+    assert second.get("a") == samples[0] and second.get("c") == samples[2]
+    assert first.get("b") == samples[1]
+    assert CourseArchive(path).keys() == ["a", "b", "c"]
+
+def test_compaction_drops_old_records_and_reopens_elsewhere(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    samples = documents(4)
+    archive = CourseArchive(path, train_dictionary(samples))
+    reader = CourseArchive(path)
+    for i, document in enumerate(samples):
+        archive.append(str(i), document)
+    archive.append("0", samples[3])
+    before = archive.size()
+    assert archive.compact(if_larger_than=before) == 0
+    assert reader.get("1") == samples[1]  # opened the old file before compaction
+    freed = archive.compact(drop={"2"})
+    assert freed > 0 and archive.size() == before - freed
+    assert archive.keys() == ["1", "3", "0"] and archive.get("0") == samples[3]
+    assert reader.get("1") == samples[1]
+    reader.append("4", samples[0])  # locks, notices the replaced file and appends to the new one
+    assert archive.get("4") == samples[0] and archive.get("2") is None
+    assert CourseArchive(path).keys() == ["1", "3", "0", "4"]
+
+def test_replaced_data_files_are_closed_after_their_last_read(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    samples = documents(3)
+    archive = CourseArchive(path, train_dictionary(samples))
+    reader = CourseArchive(path)
+    for i, document in enumerate(samples):
+        archive.append(str(i), document)
+    assert reader.get("0") == samples[0]
+    old = reader._data
+    found = reader._start_read("1")  # a get() between its index lookup and its read
+    for _ in range(3):
+        archive.append("0", samples[2])
+        archive.compact()
+        reader.refresh()
+    assert not old.closed and len(reader._retired) == 3
+    assert found[1] is old and reader.get("2") == samples[2]
+    reader._end_read()
+    assert old.closed and reader._retired == []
+    archive.compact()
+    assert archive._retired == [] and reader.get("0") == samples[2] and reader._retired == []
@@ -0,0 +1,51 @@
+import asyncio
+import course_generator
+from bench_utils import make_course_data
+from course_generator import generate_course_rule_based, salvage_section
+
+def test_salvage_keeps_valid_items_and_tops_up():
+    template = generate_course_rule_based("Python", "beginner", 3)
+    quizzes = make_course_data(days=1)["quizzes"][:2] + [{"question": "Too few options?", "options": ["a"],
+                                                          "correct_answer": "a"}]
+    value, source = salvage_section("quizzes", quizzes, 3, template)
+    assert source == "ai_partial" and len(value) == 3
+    assert value[:2] == [course_generator.Quiz(**quiz) for quiz in quizzes[:2]]
+
+    value, source = salvage_section("tasks", ["Day 1: Variables"], 3, template)
+    assert source == "ai_partial" and len(value) == 3 and value[0] == "Day 1: Variables"
+
+    value, source = salvage_section("practice_plan", ["Daily: Code", "Weekly: Project"], 3, template)
+    assert source == "ai_partial" and value[-1].startswith("Monthly:")
+
+    assert salvage_section("modules", [{"name": "Broken", "lessons": []}], 3, template) == (None, "")
+
+    # The template has no module for the third day, so the short list is only reported as partial
+    modules = make_course_data(days=2)["modules"]
+    value, source = salvage_section("modules", modules, 3, template)
+    assert source == "ai_partial" and [module.name for module in value] == [module["name"] for module in modules]
+    value, source = salvage_section("modules", modules, 1, template)
+    assert source == "ai_partial" and len(value) == 1
+    long_module = dict(modules[0], lessons=modules[0]["lessons"] * 3)
+    value, source = salvage_section("modules", [long_module], 1, template)
+    assert source == "ai_partial" and len(value[0].lessons) == course_generator.MAX_LESSONS_PER_MODULE
+    two_modules = template.copy(update={"modules": template.modules * 2})
+    outline = [{"name": "Only day", "lessons": [{"title": title} for title in ("One", "Two", "Three")]}]
+    value, source = salvage_section("outline", outline, 2, two_modules)
+    assert source == "ai_partial" and value[1].name == template.modules[0].name
+    assert [lesson.title for lesson in value[1].lessons] == [lesson.title for lesson in template.modules[0].lessons]
+
+def test_failed_section_is_filled_without_discarding_the_others(section_recordings, replay_generator, monkeypatch):
+    data = make_course_data(days=2)
+    broken_quizzes = [{"question": "Which option is right?", "options": ["a", "a"], "correct_answer": "a"}]
+    path = section_recordings({"modules": data["modules"], "tasks": data["tasks"], "quizzes": broken_quizzes,
+                               "practice_plan": data["practice_plan"]})
+    app = replay_generator(path)
+    monkeypatch.setattr(course_generator, "PLAN_SOURCE", "ai")
+
+    course = asyncio.run(course_generator.generate_course_with_ai("Python", "beginner", 2))
+    assert course.section_sources == {"modules": "ai", "tasks": "ai", "quizzes": "rule_based",
+                                      "practice_plan": "ai"}
+    assert [module.name for module in course.modules] == [module["name"] for module in data["modules"]]
+    assert course.quizzes == generate_course_rule_based("Python", "beginner", 2).quizzes
+    # One regeneration of the quizzes section before falling back
+    assert app.state.stats["requests"] == 5
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import time
+from course_cache import SharedCourseCache, course_key, flush_access_times_periodically
+
+def _publish(path, key, body):
+    SharedCourseCache(path).put(key, body)
+
+def test_entries_published_by_one_process_are_read_by_another(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    key = course_key(" Python ", "beginner", 3)
+    assert key == course_key("python", "beginner", 3)
+    worker = multiprocessing.get_context("spawn").Process(target=_publish, args=(path, key, b'{"days": 3}'))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert SharedCourseCache(path).get(key) == b'{"days": 3}'
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"), max_bytes=250)
+    for name in ("a", "b"):
+        cache.put(name, b"x" * 100)
+    cache._db.execute("UPDATE courses SET accessed = accessed - 3600 WHERE key = 'a'")
+    cache.put("c", b"x" * 100)
+    assert cache.get("a") is None and cache.get("b") and cache.get("c")
+    assert cache.stats()["bytes"] == 200
+    cache.put("huge", b"x" * 1000)
+    assert cache.get("huge") is None
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"), ttl=0.05)
+    cache.put("a", b"{}")
+    assert cache.get("a") == b"{}"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+def test_lookups_only_read_and_hits_are_flushed_in_batches(tmp_path):
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"), max_bytes=250, ttl=60)
+    for name in ("a", "b"):
+        cache.put(name, b"x" * 100)
+    cache._db.execute("UPDATE courses SET accessed = accessed - 3600, created = created - 120 WHERE key = 'a'")
+    changes = cache._db.total_changes
+    assert cache.get("a") is None and cache.get("b") and cache.contains("b") and not cache.contains("a")
+    assert cache._db.total_changes == changes  # the expired entry is left for put()
+
+    cache._db.execute("UPDATE courses SET accessed = accessed - 3600 WHERE key = 'b'")
+    cache.get("b")
+    assert cache.flush_access_times() == 1 and cache.flush_access_times() == 0
+    cache.put("c", b"x" * 100)
+    assert cache.stats()["entries"] == 2 and cache.get("b") and cache.get("c")
+
+    async def flush_on_shutdown():
+        task = asyncio.create_task(flush_access_times_periodically(cache, interval=60))
+        await asyncio.sleep(0)
+        cache.get("c")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    asyncio.run(flush_on_shutdown())
+    assert not cache._accessed
+
+def test_endpoint_counts_hits_and_misses(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import course_generator
+    import course_store
+    import server
+    from course_generator import generate_course_rule_based
+    from metrics import CACHE_HITS, CACHE_MISSES
+
+    async def generate(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        return generate_course_rule_based(topic, level, days).copy(update={"section_sources": {"modules": "ai"}})
+
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(course_generator, "generate_course", generate)
+    monkeypatch.setattr(server, "get_course_cache", lambda: cache)
+    monkeypatch.setattr(course_store, "_store", None)
+    monkeypatch.setattr(course_store, "COURSE_STORE_PATH", "")
+    hits, misses = CACHE_HITS.value(cache="course"), CACHE_MISSES.value(cache="course")
+    client = TestClient(server.app)
+    request = {"topic": "Python", "level": "beginner", "days": 2}
+    first = client.post("/generate-course", json=request)
+    second = client.post("/generate-course", json=request)
+    assert first.content == second.content
+    assert CACHE_MISSES.value(cache="course") == misses + 1 and CACHE_HITS.value(cache="course") == hits + 1
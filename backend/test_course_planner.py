@@ -0,0 +1,19 @@
+from bench_utils import make_course_data
+from course_generator import generate_course_rule_based
+from course_planner import module_topic, plan_practice, plan_tasks
+from models import CourseResponse
+
+def test_plan_passes_validation_for_every_length():
+    for days in (1, 3, 7, 15, 30):
+        data = make_course_data(days=days)
+        course = CourseResponse(**dict(data, tasks=plan_tasks(data["modules"], days),
+                                       practice_plan=plan_practice(data["modules"], days, "beginner")))
+        assert [task.split(":")[0] for task in course.tasks] == [f"Day {day}" for day in range(1, days + 1)]
+        assert {entry.split(":")[0] for entry in course.practice_plan} == {"Daily", "Weekly", "Monthly"}
+        assert all(module_topic(data["modules"][day - 1]) in course.tasks[day - 1] for day in range(1, days + 1))
+
+def test_fewer_modules_than_days_spreads_the_lessons():
+    modules = generate_course_rule_based("C++", "beginner", 3).modules
+    tasks = plan_tasks(modules, 3)
+    assert [lesson.title in task for lesson, task in zip(modules[0].lessons, tasks)] == [True, True, True]
+    assert module_topic(modules[0]) == "Introduction to C++"
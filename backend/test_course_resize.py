@@ -0,0 +1,76 @@
+import asyncio
+from fastapi.testclient import TestClient
+import course_generator
+import course_store
+import server
+from bench_utils import make_course_data
+from course_cache import course_key
+from course_store import CourseStore, resize_candidates
+from models import CourseResponse
+
+AI_SOURCES = {"modules": "ai", "tasks": "ai", "quizzes": "ai", "practice_plan": "ai"}
+
+def stored_course(days):
+    return dict(make_course_data(days), section_sources=dict(AI_SOURCES))
+
+def test_trimming_is_preferred_over_extending():
+    assert resize_candidates(5, max_days=8) == [6, 7, 8, 4, 3, 2, 1]
+
+def test_stored_courses_are_found_by_topic_level_and_other_days(tmp_path):
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    for course_id, days in (("three", 3), ("seven", 7)):
+        body = CourseResponse(**stored_course(days)).json().encode("utf-8")
+        store.save(course_id, body, course_key("Python", "beginner", days))
+    assert store.find_resizable("python ", "beginner", 5)["days"] == 7
+    assert store.find_resizable("Python", "beginner", 8)["days"] == 7
+    assert store.find_resizable("Python", "advanced", 5) is None
+    assert store.find_resizable("Python", "beginner", 5, ["plan=ai"]) is None
+
+def test_trimmed_course_keeps_the_first_days():
+    stored = stored_course(7)
+    course = asyncio.run(course_generator.resize_course(stored, "Python", "beginner", 3, plan_source="ai"))
+    assert course.days == 3 and [module.name for module in course.modules] == [
+        module["name"] for module in stored["modules"][:3]]
+    assert course.tasks == stored["tasks"][:3] and course.section_sources == AI_SOURCES
+
+    course = asyncio.run(course_generator.resize_course(stored, "Python", "beginner", 3, plan_source="local"))
+    assert course.section_sources["tasks"] == "derived" and len(course.tasks) == 3
+
+def test_extension_generates_only_the_missing_days(section_recordings, replay_generator):
+    new_days = make_course_data(5)
+    app = replay_generator(section_recordings({"modules": new_days["modules"][3:], "tasks": new_days["tasks"][3:]}))
+    stored = stored_course(3)
+
+    course = asyncio.run(course_generator.resize_course(stored, "Python", "beginner", 5, plan_source="ai"))
+    assert [module.name for module in course.modules] == [module["name"] for module in stored["modules"]] + [
+        module["name"] for module in new_days["modules"][3:]]
+    assert course.tasks == stored["tasks"] + new_days["tasks"][3:]
+    assert course.quizzes == CourseResponse(**stored).quizzes
+    assert course.section_sources == AI_SOURCES
+    assert app.state.stats["requests"] == 2  # new modules and new tasks only
+
+def test_endpoint_resizes_a_stored_course(tmp_path, monkeypatch):
+    calls = []
+
+    async def generate(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        calls.append(days)
+        return CourseResponse(**stored_course(days))
+
+    monkeypatch.setattr(course_generator, "generate_course", generate)
+    monkeypatch.setattr(server, "get_course_cache", lambda: None)
+    monkeypatch.setattr(course_store, "_store", CourseStore(str(tmp_path / "courses.cca")))
+    client = TestClient(server.app)
+    first = client.post("/generate-course", json={"topic": "Python", "level": "beginner", "days": 7}).json()
+    second = client.post("/generate-course", json={"topic": "Python", "level": "beginner", "days": 4}).json()
+    assert calls == [7]
+    assert second["days"] == 4 and second["modules"] == first["modules"][:4]
+    assert second["course_id"] != first["course_id"]
+
+def test_extension_prompt_continues_from_the_stored_days():
+    from ai_service import AIService
+    names = ["Day 1: Basics", "Day 2: Loops", "Functions"]
+    prompt = AIService().extension_prompt("tasks", "Python", "beginner", 5, names)
+    assert "Day 2: Loops" in prompt and "Day 3: Functions" in prompt and "Day 2: Day 2" not in prompt
+    assert '"Day 4: ' in prompt and '"Day 5: ' in prompt and '"Day 1: ' not in prompt
+    assert "days 4 to 5: exactly 2 daily tasks" in prompt and "with 2 days" not in prompt
+    assert '"name": "Day 4: Module Name"' in AIService().extension_prompt("modules", "Python", "beginner", 4, names)
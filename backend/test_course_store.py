@@ -0,0 +1,77 @@
+import json
+from fastapi.testclient import TestClient
+import course_generator
+import course_store
+import server
+from course_generator import generate_course_rule_based
+from course_store import CourseStore, course_outline
+
+def test_outline_has_titles_but_no_lesson_bodies(tmp_path):
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    course = generate_course_rule_based("C++", "beginner", 30)
+    body = course.json().encode("utf-8")
+    store.save("abc", body)
+    outline = course_outline("abc", store.load("abc"))
+    assert [module["lessons"] for module in outline["modules"]] == [
+        [lesson.title for lesson in module.lessons] for module in course.modules
+    ]
+    assert outline["modules"][0]["href"] == "/courses/abc/modules/1" and outline["quiz_count"] == len(course.quizzes)
+    assert len(json.dumps(outline)) < len(body) / 2
+    assert store.load("missing") is None
+
+def test_courses_are_fetched_incrementally_after_generation(tmp_path, monkeypatch):
+    async def generate(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        return generate_course_rule_based(topic, level, days)
+
+    monkeypatch.setattr(course_generator, "generate_course", generate)
+    monkeypatch.setattr(server, "get_course_cache", lambda: None)
+    monkeypatch.setattr(course_store, "_store", CourseStore(str(tmp_path / "courses.cca")))
+    client = TestClient(server.app)
+    course = client.post("/generate-course", json={"topic": "C++", "level": "beginner", "days": 3}).json()
+    course_id = course["course_id"]
+
+    outline = client.get(f"/courses/{course_id}").json()
+    assert outline["days"] == 3 and len(outline["modules"]) == len(course["modules"])
+    assert client.get(outline["modules"][0]["href"]).json() == course["modules"][0]
+    assert client.get(f"/courses/{course_id}/quizzes").json() == course["quizzes"]
+    assert client.get(f"/courses/{course_id}/modules/{len(course['modules']) + 1}").status_code == 404
+    assert client.get("/courses/unknown").status_code == 404
+
+def test_store_drops_oldest_courses_with_their_lessons_and_index(tmp_path):
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    bodies = {days: generate_course_rule_based("C++", "beginner", days).json().encode("utf-8") for days in (1, 2, 3)}
+    store.save("old", bodies[1], key="c++|beginner|1")
+    store.archive.append(course_store.lesson_key("old", 1, 0), b"{}")
+    store.save("mid", bodies[2], key="c++|beginner|2")
+    store.max_bytes = store.archive.size()
+    store.load("old")
+    store.save("new", bodies[3], key="c++|beginner|3")
+    keys = store.archive.keys()
+    assert "old" not in keys and course_store.lesson_key("old", 1, 0) not in keys
+    assert course_store.index_key("c++|beginner|1") not in keys
+    assert {"new", course_store.index_key("c++|beginner|3")} <= set(keys)
+    assert store.load("old") is None and store.archive.size() <= store.max_bytes
+
+def test_cached_links_survive_compaction(tmp_path, monkeypatch):
+    from course_cache import SharedCourseCache
+
+    async def generate(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        return generate_course_rule_based(topic, level, days).copy(update={"section_sources": {"modules": "ai"}})
+
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"))
+    store = CourseStore(str(tmp_path / "courses.cca"), cache=cache)
+    monkeypatch.setattr(course_generator, "generate_course", generate)
+    monkeypatch.setattr(server, "get_course_cache", lambda: cache)
+    monkeypatch.setattr(course_store, "_store", store)
+    client = TestClient(server.app)
+    request = {"topic": "C++", "level": "beginner", "days": 2}
+    first = client.post("/generate-course", json=request).json()
+    store.max_bytes = int(store.archive.size() * 2.5)
+    for topic in ("Rust", "Go"):
+        client.post("/generate-course", json=dict(request, topic=topic))
+    assert client.get(f"/courses/{first['course_id']}").status_code == 404
+
+    # The cache entry went with the course, so the repeat is generated and stored again
+    again = client.post("/generate-course", json=request).json()
+    assert again["course_id"] != first["course_id"]
+    assert client.get(f"/courses/{again['course_id']}/modules/1").status_code == 200
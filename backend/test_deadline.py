@@ -0,0 +1,52 @@
+import asyncio
+import time
+import pytest
+from bench_utils import make_course_data
+from deadline import Deadline, DeadlineExceeded, watch_disconnect
+from metrics import AI_CANCELLATIONS
+
+class DisconnectingRequest:
+    def __init__(self, after: int):
+        self.polls = 0
+        self.after = after
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls > self.after
+
+def test_run_cancels_on_timeout_and_on_cancel():
+    async def scenario():
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with pytest.raises(DeadlineExceeded):
+            await Deadline(0.05).run(slow())
+        assert await Deadline(1).run(asyncio.sleep(0, result="ok")) == "ok"
+
+        deadline = Deadline()
+        watcher = asyncio.create_task(watch_disconnect(DisconnectingRequest(after=2), deadline, interval=0.01))
+        with pytest.raises(DeadlineExceeded, match="disconnected"):
+            await deadline.run(slow())
+        await watcher
+        return cancelled
+
+    assert asyncio.run(scenario()) == [True, True]
+
+def test_generation_stops_at_the_deadline(section_recordings, replay_service):
+    data = make_course_data(days=1)
+    sections = ("modules", "tasks", "quizzes", "practice_plan")
+    service, _ = replay_service(section_recordings({section: data[section] for section in sections}),
+                                latency="fixed:5")
+
+    before = AI_CANCELLATIONS.value(section="modules", reason="deadline")
+    started = time.perf_counter()
+    content = asyncio.run(service.generate_course_content("Python", "beginner", 1, Deadline(0.2)))
+    assert time.perf_counter() - started < 2
+    assert set(content["failures"]) == {"modules", "tasks", "quizzes", "practice_plan"}
+    assert AI_CANCELLATIONS.value(section="modules", reason="deadline") == before + 1
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import course_generator
+from ai_service import AIService, COURSE_SECTIONS
+from bench_utils import make_course_data
+from config import AI_MODEL
+from generation_mode import GenerationModeSelector, day_bucket
+from ollama_replay import prompt_key
+from structured_output import build_prompt, section_schema
+from token_budget import TokenBudgeter, section_units
+
+def test_day_buckets():
+    assert [day_bucket(days) for days in (1, 2, 3, 7, 8, 14, 30)] == ["1", "2-3", "2-3", "4-7", "8-14", "8-14", "15+"]
+
+def test_large_courses_are_split_and_small_ones_learned():
+    selector = GenerationModeSelector("auto", max_lessons=15, min_samples=2,
+                                      budgeter=TokenBudgeter(cap=16384, priors={"modules": 300, "tasks": 30}))
+    assert selector.choose(COURSE_SECTIONS, 7) == "multi"  # 35 lessons
+    assert selector.choose(("modules",), 1) == "multi"
+
+    # Both modes are tried before the measurements decide
+    tried = []
+    for _ in range(4):
+        mode = selector.choose(("modules", "tasks"), 2)
+        tried.append(mode)
+        selector.record(mode, 2, 1.0 if mode == "single" else 3.0, True)
+    assert sorted(tried) == ["multi", "multi", "single", "single"]
+    assert selector.choose(("modules", "tasks"), 2) == "single"
+    assert selector.stats()["2-3"]["single"]["samples"] == 2
+
+    # A fast mode that keeps failing loses to a slow reliable one
+    for _ in range(10):
+        selector.record("single", 2, 1.0, False)
+    assert selector.choose(("modules", "tasks"), 2) == "multi"
+    # Other course lengths are measured separately
+    assert selector.choose(("modules", "tasks"), 1) == "single"
+
+    assert GenerationModeSelector("single").choose(COURSE_SECTIONS, 30) == "single"
+
+def test_combined_schema_has_every_section():
+    schema = section_schema("tasks+practice_plan")
+    assert schema["required"] == ["tasks", "practice_plan"]
+    assert schema["properties"]["tasks"] == section_schema("tasks")["properties"]["tasks"]
+    assert section_schema("tasks+unknown") is None
+
+def test_single_call_generates_the_whole_course(tmp_path, replay_service, monkeypatch):
+    data = make_course_data(days=2)
+    prompt = build_prompt(AIService().course_prompt(COURSE_SECTIONS, "Python", "beginner", 2), "schema")
+    path = tmp_path / "recordings.jsonl"
+    with open(path, "w") as f:
+        f.write(json.dumps({"key": prompt_key(AI_MODEL, prompt), "model": AI_MODEL,
+                            "section": "+".join(COURSE_SECTIONS), "prompt": prompt,
+                            "response": json.dumps({section: data[section] for section in COURSE_SECTIONS})}) + "\n")
+    service, app = replay_service(path)
+    monkeypatch.setattr(course_generator, "AIService", lambda: service)
+    monkeypatch.setattr(course_generator, "PLAN_SOURCE", "ai")
+    selector = GenerationModeSelector("single")
+    monkeypatch.setattr(course_generator, "GENERATION_MODE_SELECTOR", selector)
+    hedged = []
+    hedge = service.hedger.run
+
+    def run(section, units, *args):
+        hedged.append((section, units))
+        return hedge(section, units, *args)
+
+    monkeypatch.setattr(service.hedger, "run", run)
+
+    course = asyncio.run(course_generator.generate_course_with_ai("Python", "beginner", 2))
+    assert set(course.section_sources.values()) == {"ai"}
+    # Latency is compared per unit of every section in the call
+    assert hedged == [("+".join(COURSE_SECTIONS), sum(section_units(section, 2) for section in COURSE_SECTIONS))]
+    assert [module.name for module in course.modules] == [module["name"] for module in data["modules"]]
+    assert app.state.stats["requests"] == 1 and app.state.stats["exact"] == 1
+    assert selector.stats()["2-3"]["single"]["success_rate"] == 1.0
+
+    # Every section was cached on its own, so a repeat makes no call and is not measured
+    content = asyncio.run(service.generate_course_combined("Python", "beginner", 2))
+    assert content["cached"] == list(COURSE_SECTIONS) and not content["failures"]
+    assert app.state.stats["requests"] == 1
+    assert selector.stats()["2-3"]["single"]["samples"] == 1
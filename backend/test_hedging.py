@@ -0,0 +1,108 @@
+import asyncio
+import json
+from ai_service import AIService
+from hedging import Hedger, percentile
+from metrics import AI_HEDGES
+from structured_output import OutputModeSelector
+
+def fast_hedger(**kwargs):
+    hedger = Hedger(budget=kwargs.pop("budget", 1.0), pct=50, min_samples=1, min_delay=0.02, **kwargs)
+    for _ in range(3):
+        hedger.observe("tasks", 1, 0.01)
+    return hedger
+
+class SlowFirstCall:
+    """Call that stalls the first time and answers right away after that."""
+
+    def __init__(self, results=("slow", "fast")):
+        self.results = list(results)
+        self.hosts = []
+        self.cancelled = False
+
+    async def __call__(self, host):
+        self.hosts.append(host)
+        result = self.results[len(self.hosts) - 1]
+        if len(self.hosts) == 1:
+            try:
+                await asyncio.sleep(0.3)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+        return result
+
+def test_hedge_delay_follows_the_latency_percentile():
+    hedger = Hedger(budget=0.05, pct=90, min_samples=10, min_delay=0.5)
+    for seconds in range(1, 10):
+        hedger.observe("modules", 2, seconds * 2)
+    assert hedger.delay("modules", 2) is None  # nine samples
+    hedger.observe("modules", 2, 20)
+    assert percentile([float(n) for n in range(1, 11)], 90) == 9
+    assert hedger.delay("modules", 3) == 27  # 9 s per day
+    assert hedger.delay("tasks") is None
+    assert Hedger(budget=0, min_samples=0).delay("modules") is None
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    hedger = fast_hedger(hosts=["http://a", "http://b"])
+    call = SlowFirstCall()
+    before = AI_HEDGES.value(section="tasks", outcome="hedge_won")
+    assert asyncio.run(hedger.run("tasks", 1, "http://a", call, lambda result: True)) == "fast"
+    assert call.hosts == ["http://a", "http://b"] and call.cancelled
+    assert AI_HEDGES.value(section="tasks", outcome="hedge_won") == before + 1
+
+def test_only_calls_that_lost_the_race_are_kept_as_tail_samples():
+    hedger = fast_hedger()
+    asyncio.run(hedger.run("tasks", 1, "http://a", SlowFirstCall(), lambda result: True))
+    # The winning hedge and the cancelled primary, which took at least the hedge delay
+    samples = list(hedger._seconds["tasks"])
+    assert len(samples) == 5 and samples[-1] >= 0.02
+
+    async def cancelled_by_deadline():
+        run = asyncio.ensure_future(hedger.run("tasks", 1, "http://a", SlowFirstCall(), lambda result: True))
+        await asyncio.sleep(0.01)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancelled_by_deadline())
+    assert len(hedger._seconds["tasks"]) == 5
+
+def test_invalid_hedge_does_not_win():
+    hedger = fast_hedger()
+    call = SlowFirstCall(("valid", "broken"))
+    result = asyncio.run(hedger.run("tasks", 1, "http://a", call, lambda result: result == "valid"))
+    assert result == "valid" and call.hosts == ["http://a", "http://a"] and not call.cancelled
+
+def test_budget_caps_hedges():
+    hedger = fast_hedger(budget=0.5)
+    call = SlowFirstCall()
+    before = AI_HEDGES.value(section="tasks", outcome="no_budget")
+    assert asyncio.run(hedger.run("tasks", 1, "http://a", call, lambda result: True)) == "slow"
+    assert call.hosts == ["http://a"]
+    assert AI_HEDGES.value(section="tasks", outcome="no_budget") == before + 1
+    # The second call earns the rest of a credit; the stalled call does not move the median
+    call = SlowFirstCall()
+    assert asyncio.run(hedger.run("tasks", 1, "http://a", call, lambda result: True)) == "fast"
+
+def test_generate_content_returns_the_hedged_response():
+    plan = {"practice_plan": ["Daily: Write code", "Weekly: Build a project", "Monthly: Review progress"]}
+
+    class StallingClient:
+        calls = 0
+
+        async def generate(self, **request):
+            StallingClient.calls += 1
+            if StallingClient.calls == 1:
+                await asyncio.sleep(5)
+            return {"response": json.dumps(plan), "done_reason": "stop", "eval_count": 20}
+
+    service = AIService()
+    service.client = StallingClient()
+    service.output_modes = OutputModeSelector("json")
+    service.hedger = Hedger(budget=1.0, min_samples=1, min_delay=0.02, hosts=[])
+    service.hedger.observe("practice_plan", 1, 0.01)
+    result = asyncio.run(asyncio.wait_for(
+        service.generate_content("practice plan", expect_json=True, section="practice_plan"), 2
+    ))
+    assert result == plan and StallingClient.calls == 2
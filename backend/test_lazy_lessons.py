@@ -0,0 +1,73 @@
+import asyncio
+import course_generator
+from bench_utils import make_course_data
+from course_store import CourseStore
+from models import CourseOutline, ModuleOutline
+
+def test_outline_pass_skips_lesson_bodies(section_recordings, replay_generator):
+    data = make_course_data(days=3)
+    outline = [{"name": module["name"], "lessons": [{"title": lesson["title"]} for lesson in module["lessons"]]}
+               for module in data["modules"]]
+    path = section_recordings({"outline": outline, "tasks": data["tasks"], "quizzes": data["quizzes"],
+                               "practice_plan": data["practice_plan"], "lesson": data["modules"][1]["lessons"][0]})
+    app = replay_generator(path)
+
+    course = asyncio.run(course_generator.generate_course_outline("Python", "beginner", 3))
+    assert isinstance(course, CourseOutline) and all(isinstance(module, ModuleOutline) for module in course.modules)
+    assert course.section_sources["modules"] == "ai" and course.section_sources["tasks"] == "derived"
+    assert app.state.stats["requests"] == 2  # outline and quizzes
+
+    lesson = asyncio.run(course_generator.generate_lesson_body("Python", "beginner", outline[0], 2))
+    assert lesson["title"] == outline[0]["lessons"][2]["title"]
+    assert lesson["explanation"] == data["modules"][1]["lessons"][0]["explanation"]
+
+def test_lesson_bodies_are_generated_once_and_memoised(tmp_path):
+    path = str(tmp_path / "courses.cca")
+    store = CourseStore(path)
+    data = make_course_data(days=2)
+    course = dict(data, modules=[{"name": module["name"], "lessons": [{"title": lesson["title"]}
+                                                                        for lesson in module["lessons"]]}
+                                 for module in data["modules"]])
+    calls = []
+
+    async def generate(module, index):
+        calls.append((module["name"], index))
+        await asyncio.sleep(0.01)
+        return dict(data["modules"][0]["lessons"][index], title=module["lessons"][index]["title"])
+
+    async def expand(store):
+        return await asyncio.gather(store.module("c1", course, 1, generate), store.module("c1", course, 1, generate),
+                                    store.lesson("c1", course, 1, 0, generate))
+
+    first, second, lesson = asyncio.run(expand(store))
+    assert first == second and lesson == first["lessons"][0] and "explanation" in lesson
+    assert len(calls) == len(course["modules"][0]["lessons"])
+    # Another worker reads the memoised bodies from the archive
+    again = asyncio.run(CourseStore(path).module("c1", course, 1, generate))
+    assert again == first and len(calls) == len(course["modules"][0]["lessons"])
+
+def test_lazy_request_returns_outline_and_expands_modules(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import course_store
+    import server
+    data = make_course_data(days=2)
+
+    async def outline(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        modules = [{"name": module["name"], "lessons": [{"title": lesson["title"]} for lesson in module["lessons"]]}
+                   for module in data["modules"]]
+        return CourseOutline(**dict(data, modules=modules, section_sources={"modules": "ai"}))
+
+    async def lesson_body(topic, level, module, index, deadline=None):
+        return data["modules"][0]["lessons"][index]
+
+    monkeypatch.setattr(course_generator, "generate_course_outline", outline)
+    monkeypatch.setattr(course_generator, "generate_lesson_body", lesson_body)
+    monkeypatch.setattr(server, "get_course_cache", lambda: None)
+    monkeypatch.setattr(course_store, "_store", CourseStore(str(tmp_path / "courses.cca")))
+    client = TestClient(server.app)
+    response = client.post("/generate-course", json={"topic": "Python", "level": "beginner", "days": 2, "lazy": True})
+    course_id = response.json()["course_id"]
+    assert response.json()["modules"][0]["href"] == f"/courses/{course_id}/modules/1"
+    assert client.get(f"/courses/{course_id}/modules/1").json() == data["modules"][0]
+    assert client.get(f"/courses/{course_id}/modules/1/lessons/2").json() == data["modules"][0]["lessons"][1]
+    assert client.get(f"/courses/{course_id}/modules/1/lessons/9").status_code == 404
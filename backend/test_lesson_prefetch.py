@@ -0,0 +1,138 @@
+import asyncio
+from bench_utils import make_course_data
+from course_store import CourseStore
+from lesson_prefetch import LessonPrefetcher
+
+def outline_course(days):
+    data = make_course_data(days=days)
+    modules = [{"name": module["name"], "lessons": [{"title": lesson["title"]} for lesson in module["lessons"]]}
+               for module in data["modules"]]
+    return dict(data, modules=modules), data
+
+def test_next_day_is_prefetched_and_hits_are_counted(tmp_path):
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    course, data = outline_course(3)
+    calls = []
+
+    def make_generator(course, deadline=None):
+        async def generate(module, index):
+            calls.append((module["name"], index))
+            return data["modules"][0]["lessons"][index]
+        return generate
+
+    async def scenario():
+        prefetcher = LessonPrefetcher(days=1, busy=lambda: False)
+        prefetcher.schedule(store, "c1", course, 1, make_generator)
+        await prefetcher._worker
+        generated = len(calls)
+        module = await store.module("c1", course, 2, make_generator(course))
+        assert len(calls) == generated  # served from the prefetched bodies
+        assert prefetcher.claim("c1", 2) == len(module["lessons"])
+        # The last day has nothing after it; a repeat schedule finds the lessons stored
+        prefetcher.schedule(store, "c1", course, 3, make_generator)
+        prefetcher.schedule(store, "c1", course, 1, make_generator)
+        await prefetcher._worker
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    lessons = len(course["modules"][1]["lessons"])
+    assert stats["prefetched"] == lessons and stats["hit"] == lessons and stats["stored"] == lessons
+    assert stats["hit_rate"] == 1.0 and stats["waste_rate"] == 0.0
+    assert {name for name, _ in calls} == {course["modules"][1]["name"]}
+
+def test_prefetch_stops_when_busy_and_unread_lessons_are_waste(tmp_path):
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    course, data = outline_course(4)
+    busy = [True]
+
+    def make_generator(course, deadline=None):
+        async def generate(module, index):
+            return data["modules"][0]["lessons"][index]
+        return generate
+
+    async def scenario():
+        prefetcher = LessonPrefetcher(days=2, waste_after=0.05, busy=lambda: busy[0])
+        prefetcher.schedule(store, "c1", course, 1, make_generator)
+        await prefetcher._worker
+        assert prefetcher.stats().get("prefetched", 0) == 0 and prefetcher.stats()["dropped_busy"] == 2
+        busy[0] = False
+        prefetcher.schedule(store, "c1", course, 2, make_generator)
+        await prefetcher._worker
+        await asyncio.sleep(0.1)
+        prefetcher.claim("c1", 3)
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["prefetched"] == stats["wasted"] > 0 and stats["waste_rate"] == 1.0
+
+def test_lesson_generation_is_cancelled_when_another_worker_gets_a_request(tmp_path):
+    from cache_warmer import HostActivity
+    store = CourseStore(str(tmp_path / "courses.cca"))
+    course, data = outline_course(3)
+    started = []
+
+    def make_generator(course, deadline=None):
+        async def generate(module, index):
+            started.append(index)
+            await deadline.run(asyncio.sleep(5))
+            return data["modules"][0]["lessons"][index]
+        return generate
+
+    async def scenario(wanted):
+        prefetcher = LessonPrefetcher(days=2, activity=HostActivity(str(tmp_path / "live")), poll_interval=0.01)
+        other_worker = HostActivity(str(tmp_path / "live"))
+        prefetcher.schedule(store, "c1", course, 1, make_generator)
+        while not started:
+            await asyncio.sleep(0.01)
+        if wanted:
+            prefetcher.claim("c1", 2, 0)
+        other_worker.enter()
+        try:
+            await asyncio.wait_for(prefetcher._worker, 1 if not wanted else 0.1)
+        except asyncio.TimeoutError:
+            prefetcher.stop()
+        finally:
+            other_worker.exit()
+        return prefetcher.counts
+
+    counts = asyncio.run(scenario(wanted=False))
+    assert counts == {"preempted": 1, "dropped_busy": 1} and started == [0]
+    assert not store.has_lesson("c1", 2, 0)
+    # A lesson a client is waiting for is not cancelled
+    started.clear()
+    counts = asyncio.run(scenario(wanted=True))
+    assert "preempted" not in counts
+
+def test_first_days_are_prefetched_after_a_cached_lazy_request(tmp_path, monkeypatch):
+    import time
+    from fastapi.testclient import TestClient
+    import course_generator
+    import course_store
+    import server
+    from course_cache import SharedCourseCache
+    from models import CourseOutline
+    course, data = outline_course(3)
+
+    async def outline(topic, level, days, deadline=None, quiz_source=None, plan_source=None):
+        return CourseOutline(**dict(course, section_sources={"modules": "ai"}))
+
+    async def lesson_body(topic, level, module, index, deadline=None):
+        return data["modules"][0]["lessons"][index]
+
+    cache = SharedCourseCache(str(tmp_path / "cache.sqlite3"))
+    prefetcher = LessonPrefetcher(days=1)
+    monkeypatch.setattr(course_generator, "generate_course_outline", outline)
+    monkeypatch.setattr(course_generator, "generate_lesson_body", lesson_body)
+    monkeypatch.setattr(server, "get_course_cache", lambda: cache)
+    monkeypatch.setattr(server, "PREFETCHER", prefetcher)
+    monkeypatch.setattr(course_store, "_store", CourseStore(str(tmp_path / "courses.cca")))
+    with TestClient(server.app) as client:
+        response = client.post("/generate-course",
+                               json={"topic": "Python", "level": "beginner", "days": 3, "lazy": True})
+        assert response.status_code == 200
+        waited = 0.0
+        while prefetcher._worker is not None and waited < 5:
+            time.sleep(0.01)
+            waited += 0.01
+    assert prefetcher.counts.get("dropped_busy", 0) == 0
+    assert prefetcher.counts["prefetched"] == len(course["modules"][0]["lessons"])
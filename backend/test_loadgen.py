@@ -0,0 +1,59 @@
+import json
+import os
+import pytest
+from loadgen import histogram_quantile, load_workload, metric_delta, parse_prometheus_text, summarize_stage
+
+METRICS_BEFORE = """# TYPE course_fallbacks_total counter
+course_fallbacks_total 2
+event_loop_lag_seconds_bucket{le="0.01"} 10
+event_loop_lag_seconds_bucket{le="0.1"} 10
+event_loop_lag_seconds_bucket{le="+Inf"} 10
+event_loop_lag_seconds_count 10
+event_loop_lag_seconds_sum 0.02
+"""
+
+METRICS_AFTER = """course_fallbacks_total 3
+event_loop_lag_seconds_bucket{le="0.01"} 15
+event_loop_lag_seconds_bucket{le="0.1"} 20
+event_loop_lag_seconds_bucket{le="+Inf"} 20
+event_loop_lag_seconds_count 20
+event_loop_lag_seconds_sum 0.5
+"""
+
+def test_metric_deltas_and_quantiles():
+    before = parse_prometheus_text(METRICS_BEFORE)
+    after = parse_prometheus_text(METRICS_AFTER)
+    assert metric_delta(before, after, "course_fallbacks_total") == {"course_fallbacks_total": 1}
+    buckets = metric_delta(before, after, "event_loop_lag_seconds_bucket")
+    assert buckets['event_loop_lag_seconds_bucket{le="0.1"}'] == 10
+    assert 0.01 < histogram_quantile(buckets, 0.99) <= 0.1
+
+def test_stage_summary():
+    results = [{"status": 200, "error": None, "latency": latency} for latency in (1.0, 2.0, 3.0, 4.0)]
+    results.append({"status": 503, "error": None, "latency": 0.1})
+    results.append({"status": None, "error": "ReadTimeout", "latency": 900.0})
+    summary = summarize_stage(
+        "rate=1", results, 10.0, 0,
+        parse_prometheus_text(METRICS_BEFORE), parse_prometheus_text(METRICS_AFTER), [0.001]
+    )
+    assert summary["requests"] == 6
+    assert summary["p50"] in (2.0, 3.0)
+    assert summary["p99"] == 4.0
+    assert summary["error_rate"] == 2 / 6
+    assert summary["errors"] == {"503": 1, "ReadTimeout": 1}
+    assert summary["fallback_rate"] == 1 / 6
+
+def test_workload_files():
+    sample = load_workload(os.path.join(os.path.dirname(__file__), "workload.jsonl"))
+    assert sample[0] == {"topic": "Python Programming", "level": "beginner", "days": 7}
+
+def test_workload_without_requests_is_rejected(tmp_path):
+    path = tmp_path / "backlog.jsonl"
+    path.write_text(json.dumps({"request_id": "user-031", "title": "Load generator", "body": "..."}) + "\n")
+    with pytest.raises(ValueError, match="topic, level and days"):
+        load_workload(str(path))
+
+if __name__ == "__main__":
+    test_metric_deltas_and_quantiles()
+    test_stage_summary()
+    print("All load generator tests passed")
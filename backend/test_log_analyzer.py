@@ -0,0 +1,63 @@
+import json
+import zipfile
+from log_analyzer import LogAnalyzer, expand_paths, json_error_signature, main, read_events
+
+def record(time, message, request_id, level="INFO"):
+    return json.dumps({"time": f"2025-06-01T10:00:{time:06.3f}+00:00", "level": level, "name": "server",
+                       "function": "f", "line": 1, "message": message, "request_id": request_id}) + "\n"
+
+def write_logs(tmp_path):
+    rotated = [
+        record(0, "Generating course for topic: Python, level: beginner, days: 3", "a"),
+        record(1, "Generating course for topic: Rust, level: advanced, days: 5", "b"),
+        record(2, "Error generating content with Ollama (attempt 1/3): Expecting ',' delimiter: line 4 column 7",
+               "a", "ERROR"),
+        record(3, "Using rule-based quizzes section", "a", "WARNING"),
+        record(4, "Course generated successfully", "a"),
+    ]
+    with zipfile.ZipFile(tmp_path / "api.2025-06-01_10-00-05_000000.jsonl.zip", "w") as archive:
+        archive.writestr("api.2025-06-01_10-00-05_000000.jsonl", "".join(rotated))
+    live = [
+        record(6, "Falling back to rule-based generation", "b", "INFO"),
+        record(9, "Course generated successfully", "b"),
+    ]
+    (tmp_path / "api.jsonl").write_text("".join(live))
+
+def test_reads_rotated_archives_and_reconstructs_requests(tmp_path):
+    write_logs(tmp_path)
+    paths = expand_paths([str(tmp_path / "api.jsonl")])
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["api.2025-06-01_10-00-05_000000.jsonl.zip", "api.jsonl"]
+
+    analyzer = LogAnalyzer()
+    for event in read_events(paths):
+        analyzer.feed(event)
+    report = analyzer.report()
+    assert report["outcomes"] == {"partial_fallback": 1, "fallback": 1}
+    assert report["fallback_rate"] == 0.5 and report["section_fallbacks"] == {"quizzes": 1}
+    assert report["retries_per_request"] == {"0": 1, "1": 1}
+    assert report["latency"]["max"] == 8.0
+    assert report["json_error_signatures"] == {
+        "Error generating content with Ollama (attempt N/N): Expecting '…' delimiter: line N column N": 1
+    }
+
+def test_request_timeline(tmp_path, capsys):
+    write_logs(tmp_path)
+    assert main([str(tmp_path / "api.jsonl"), "--request", "b"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3 and lines[-1].startswith("+    8.000s")
+
+def test_signatures_group_equal_errors():
+    assert json_error_signature("Extra data: line 3 column 9 (char 120)") == \
+        json_error_signature("Extra data: line 7 column 1 (char 88)")
+
+def test_text_logs_are_attributed_to_the_latest_request(tmp_path):
+    (tmp_path / "api.log").write_text(
+        "2025-06-01 10:00:00 | INFO | Generating course for topic: Go, level: beginner, days: 2\n"
+        "2025-06-01 10:00:01.500 | INFO     | server:generate_course_endpoint:75 - not a request line\n"
+        "2025-06-01 10:00:04 | INFO | Course generated successfully\n"
+    )
+    analyzer = LogAnalyzer()
+    for event in read_events(expand_paths([str(tmp_path / "api.log")])):
+        analyzer.feed(event)
+    report = analyzer.report()
+    assert report["events"] == 3 and report["outcomes"] == {"ai": 1} and report["latency"]["max"] == 4.0
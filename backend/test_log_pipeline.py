@@ -0,0 +1,46 @@
+import json
+from loguru import logger
+from log_pipeline import InfoSampler, request_id_var, setup_logging
+
+def test_structured_records_carry_request_id(tmp_path):
+    log_file = tmp_path / "api.jsonl"
+    text_file = tmp_path / "api.log"
+    setup_logging(str(text_file), "INFO", "{level} | {message}", "500 MB", "zip", json_path=str(log_file),
+                  enqueue=False)
+
+    token = request_id_var.set("req-123")
+    try:
+        logger.info("Generating course for topic: {}, level: {}", "C++", "beginner")
+    finally:
+        request_id_var.reset(token)
+    logger.debug("Filtered out {}", object())
+
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["message"] == "Generating course for topic: C++, level: beginner"
+    assert records[0]["request_id"] == "req-123"
+    assert records[0]["level"] == "INFO"
+    assert text_file.read_text() == "INFO | Generating course for topic: C++, level: beginner\n"
+
+def test_sampler_keeps_whole_requests_and_warnings():
+    sampler = InfoSampler(0.5)
+
+    class Level:
+        def __init__(self, no):
+            self.no = no
+
+    def record(no, request_id):
+        return {"level": Level(no), "extra": {"request_id": request_id}}
+
+    for request_id in ("a1", "b2", "c3", "d4"):
+        decisions = {sampler(record(20, request_id)) for _ in range(10)}
+        assert len(decisions) == 1
+        assert sampler(record(40, request_id))
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_structured_records_carry_request_id(Path(tmp))
+    test_sampler_keeps_whole_requests_and_warnings()
+    print("All log pipeline tests passed")
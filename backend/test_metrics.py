@@ -0,0 +1,38 @@
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+def test_prometheus_text_rendering():
+    registry = MetricsRegistry()
+    retries = registry.register(Counter("retries_total", "Retries", ["section"]))
+    depth = registry.register(Gauge("queue_depth", "Queue depth"))
+    latency = registry.register(Histogram("latency_seconds", "Latency", ["section"], buckets=(1, 5)))
+
+    retries.inc(section="quizzes")
+    retries.inc(2, section="quizzes")
+    depth.inc()
+    depth.inc()
+    depth.dec()
+    latency.observe(0.5, section="modules")
+    latency.observe(1, section="modules")
+    latency.observe(7, section="modules")
+
+    text = registry.render()
+    assert '# TYPE retries_total counter' in text
+    assert 'retries_total{section="quizzes"} 3' in text
+    assert 'queue_depth 1' in text
+    assert 'latency_seconds_bucket{section="modules",le="1"} 2' in text
+    assert 'latency_seconds_bucket{section="modules",le="5"} 2' in text
+    assert 'latency_seconds_bucket{section="modules",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{section="modules"} 3' in text
+    assert 'latency_seconds_sum{section="modules"} 8.5' in text
+
+def test_histogram_timer():
+    latency = Histogram("timer_seconds", "Timer")
+    with latency.time() as timer:
+        pass
+    assert timer.elapsed >= 0
+    assert latency.count() == 1
+
+if __name__ == "__main__":
+    test_prometheus_text_rendering()
+    test_histogram_timer()
+    print("All metrics tests passed")
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from adaptive import EXPLORE_INTERVAL
+from metrics import AI_MODEL_FALLBACKS
+from model_router import ModelRouter, is_simple
+from ollama_replay import prompt_key
+from structured_output import build_prompt
+
+def test_sections_are_split_by_difficulty():
+    assert is_simple("tasks", "advanced", 30) and is_simple("outline", None, None)
+    assert is_simple("modules", "beginner", 3) and not is_simple("modules", "beginner", 4)
+    assert not is_simple("modules", "intermediate", 1)
+    assert is_simple("quizzes", "intermediate", 7) and not is_simple("lesson", "advanced", 1)
+    assert not is_simple("modules+tasks", "beginner", 7) and not is_simple("content", "beginner", 1)
+
+def test_routes_prefer_a_tier_and_fall_back_to_the_other():
+    router = ModelRouter(large="mistral", small="phi3", min_samples=2)
+    assert router.route("practice_plan", "advanced", 30) == ["phi3", "mistral"]
+    assert router.route("modules", "advanced", 1) == ["mistral", "phi3"]
+    assert ModelRouter(large="mistral", small="").route("tasks", "beginner", 1) == ["mistral"]
+    assert ModelRouter(large="mistral", small="mistral").route("tasks", "beginner", 1) == ["mistral"]
+
+def test_live_statistics_override_the_static_choice():
+    router = ModelRouter(large="mistral", small="phi3", min_samples=2, min_json_validity=0.8)
+    for _ in range(3):
+        router.observe("phi3", "tasks", "invalid_json", 1.0, 7)
+    # Errors without a response say nothing about JSON validity
+    router.observe("phi3", "quizzes", "error")
+    assert router.stats()["phi3"]["quizzes"]["json_validity"] == 1.0
+
+    routes = [router.route("tasks", "beginner", 7)[0] for _ in range(EXPLORE_INTERVAL)]
+    assert routes[:-1] == ["mistral"] * (EXPLORE_INTERVAL - 1) and routes[-1] == "phi3"
+
+    for _ in range(2):
+        router.observe("phi3", "practice_plan", "ok", 2.0)
+        router.observe("mistral", "practice_plan", "ok", 1.5)
+    assert router.route("practice_plan", "beginner", 1) == ["mistral", "phi3"]
+
+def test_failed_small_model_call_is_retried_on_the_large_model(tmp_path, replay_service):
+    plan = {"practice_plan": ["Daily: Write code", "Weekly: Build a project", "Monthly: Review progress"]}
+    prompt = build_prompt("practice plan", "schema")
+    path = tmp_path / "recordings.jsonl"
+    with open(path, "w") as f:
+        for model, response in (("phi3", '{"practice_plan": ["Daily: Write code",'), ("mistral", json.dumps(plan))):
+            f.write(json.dumps({"key": prompt_key(model, prompt), "model": model, "section": "practice_plan",
+                                "prompt": prompt, "response": response}) + "\n")
+
+    service, _ = replay_service(path)
+    service.router = ModelRouter(large="mistral", small="phi3")
+    fallbacks = AI_MODEL_FALLBACKS.value(from_model="phi3", to_model="mistral")
+
+    result = asyncio.run(service.generate_content("practice plan", expect_json=True, section="practice_plan",
+                                                  level="beginner", days=1))
+    assert result == plan
+    assert AI_MODEL_FALLBACKS.value(from_model="phi3", to_model="mistral") == fallbacks + 1
+    stats = service.router.stats()
+    assert stats["phi3"]["practice_plan"]["json_validity"] < 1.0
+    assert stats["mistral"]["practice_plan"]["calls"] == 1
@@ -0,0 +1,62 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from ollama_replay import Recorder, create_replay_app, prompt_key
+
+TASKS_RESPONSE = json.dumps({"tasks": ["Day 1: Install the compiler", "Day 2: Write a first program"]})
+
+def write_recordings(tmp_path):
+    path = tmp_path / "recordings.jsonl"
+    prompt = 'Create a JSON array of daily tasks. Format: {"tasks": []}'
+    entry = {
+        "key": prompt_key("mistral", prompt), "model": "mistral", "section": "tasks",
+        "prompt": prompt, "response": TASKS_RESPONSE, "duration": 0.01,
+    }
+    path.write_text(json.dumps(entry) + "\n")
+    return path, prompt
+
+def test_replay_generate_streaming_and_non_streaming(tmp_path):
+    path, prompt = write_recordings(tmp_path)
+    client = TestClient(create_replay_app(str(path), tokens_per_second=0, seed=1))
+
+    body = client.post("/api/generate", json={"model": "mistral", "prompt": prompt, "stream": False}).json()
+    assert body["done"] and body["response"] == TASKS_RESPONSE
+
+    lines = client.post("/api/generate", json={"model": "mistral", "prompt": prompt}).text.splitlines()
+    chunks = [json.loads(line) for line in lines]
+    assert chunks[-1]["done"]
+    assert "".join(chunk["response"] for chunk in chunks) == TASKS_RESPONSE
+
+    # A different topic still gets an answer for the same section
+    other = client.post("/api/generate", json={"model": "mistral", "prompt": 'Rust tasks {"tasks": []}', "stream": False})
+    assert other.json()["response"] == TASKS_RESPONSE
+    assert client.get("/replay/stats").json()["section"] == 1
+
+def test_malformed_json_injection(tmp_path):
+    path, prompt = write_recordings(tmp_path)
+    client = TestClient(create_replay_app(str(path), malformed_rate=1.0, seed=3))
+    text = client.post("/api/generate", json={"model": "mistral", "prompt": prompt, "stream": False}).json()["response"]
+    try:
+        json.loads(text)
+        assert False, "response should have been corrupted"
+    except json.JSONDecodeError:
+        pass
+
+def test_ai_service_records_and_replays(tmp_path, replay_service):
+    path, prompt = write_recordings(tmp_path)
+    service, _ = replay_service(path)
+    service.recorder = Recorder(str(tmp_path / "recorded"))
+
+    result = asyncio.run(service.generate_content(prompt, section="tasks"))
+    assert result == TASKS_RESPONSE
+
+    recorded = [json.loads(line) for line in (tmp_path / "recorded" / "recordings.jsonl").read_text().splitlines()]
+    assert recorded[0]["prompt"] == prompt
+    assert recorded[0]["section"] == "tasks"
+    assert recorded[0]["response"] == TASKS_RESPONSE
+
+if __name__ == "__main__":
+    # The replay service comes from a conftest.py fixture, so these tests run under pytest
+    import sys
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
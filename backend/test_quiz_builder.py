@@ -0,0 +1,38 @@
+import asyncio
+from bench_utils import make_course_data
+from config import QUIZ_OPTIONS_COUNT
+from course_generator import generate_course_rule_based
+from quiz_builder import QuizBuilder, build_quizzes
+import course_generator
+
+def test_quizzes_are_valid_and_come_from_the_lessons():
+    modules = generate_course_rule_based("C++", "beginner", 3).modules + \
+        generate_course_rule_based("Web Development", "beginner", 3).modules
+    explanations = " ".join(lesson.explanation for module in modules for lesson in module.lessons)
+    quizzes = build_quizzes(modules, count=5, seed="C++")
+    assert len(quizzes) == 5 and len({quiz.question for quiz in quizzes}) == 5
+    for quiz in quizzes:
+        assert len(set(quiz.options)) == QUIZ_OPTIONS_COUNT and quiz.correct_answer in quiz.options
+        if quiz.question.startswith("Fill in the blank: "):
+            sentence = quiz.question[len("Fill in the blank: "):].replace("_____", quiz.correct_answer)
+            assert sentence in explanations
+    assert build_quizzes(modules, count=5, seed="C++") == quizzes
+
+def test_outlines_and_small_courses():
+    data = make_course_data(days=5)
+    outline = [{"name": module["name"], "lessons": [{"title": lesson["title"]} for lesson in module["lessons"]]}
+               for module in data["modules"]]
+    quizzes = build_quizzes(outline, count=3)
+    assert len(quizzes) == 3 and all(quiz.question.startswith("Which part of the course") for quiz in quizzes)
+    # One module of three lessons has too few other lessons for takeaway distractors
+    builder = QuizBuilder(make_course_data(days=1)["modules"])
+    assert builder.takeaway(0) is None and builder.module(0) is None
+
+def test_local_quizzes_skip_the_quiz_prompt(section_recordings, replay_generator):
+    data = make_course_data(days=4)
+    path = section_recordings({"modules": data["modules"], "tasks": data["tasks"], "quizzes": data["quizzes"],
+                               "practice_plan": data["practice_plan"]})
+    app = replay_generator(path)
+    course = asyncio.run(course_generator.generate_course_with_ai("Python", "beginner", 4, quiz_source="local"))
+    assert app.state.stats["requests"] == 1  # only the modules prompt
+    assert course.section_sources["quizzes"] == "derived" and len(course.quizzes) == 5
@@ -0,0 +1,45 @@
+import asyncio
+from bench_utils import make_course_data
+from section_cache import SectionCache
+
+def test_sections_are_keyed_by_what_they_depend_on():
+    data = make_course_data(days=3)
+    cache = SectionCache()
+    assert cache.put("quizzes", "Python", "beginner", 3, data["quizzes"])
+    assert cache.put("tasks", "Python", "beginner", 3, data["tasks"])
+    assert cache.put("modules", "Python", "beginner", 3, data["modules"])
+
+    assert cache.get("quizzes", " python ", "beginner", 10) == data["quizzes"]
+    assert cache.get("tasks", "Python", "beginner", 4) is None
+    assert cache.get("modules", "Python", "beginner", 3) == data["modules"]
+    # Modules are planned for the length of the course, so other lengths miss
+    assert cache.get("modules", "Python", "beginner", 2) is None
+    assert not cache.put("modules", "Python", "beginner", 4, data["modules"])
+    assert cache.get("quizzes", "Python", "advanced", 3) is None
+
+def test_invalid_sections_are_not_cached_and_eviction_is_per_section():
+    data = make_course_data(days=1)
+    cache = SectionCache(max_entries=2)
+    assert not cache.put("quizzes", "Python", "beginner", 1, [{"question": "Broken?", "options": []}])
+    assert not cache.put("tasks", "Python", "beginner", 3, ["Day 1: Only one"])
+    for topic in ("Python", "Rust", "Go"):
+        cache.put("practice_plan", topic, "beginner", 1, data["practice_plan"])
+    cache.put("quizzes", "Python", "beginner", 1, data["quizzes"])
+    assert cache.sizes()["practice_plan"] == 2 and cache.sizes()["quizzes"] == 1
+    assert cache.get("practice_plan", "Python", "beginner", 1) is None
+    assert cache.invalidate(topic="Rust") == 1
+    assert cache.invalidate(section="quizzes") == 1
+
+def test_cached_sections_skip_the_model(section_recordings, replay_service):
+    data = make_course_data(days=2)
+    sections = ("modules", "tasks", "quizzes", "practice_plan")
+    service, app = replay_service(section_recordings({section: data[section] for section in sections}))
+
+    first = asyncio.run(service.generate_course_content("Python", "beginner", 2))
+    assert app.state.stats["requests"] == 4 and not first["failures"]
+    # Other days: quizzes and practice plan come from the cache, modules and tasks are generated
+    second = asyncio.run(service.generate_course_content("Python", "beginner", 1))
+    assert app.state.stats["requests"] == 6
+    assert second["quizzes"] == first["quizzes"] and second["practice_plan"] == first["practice_plan"]
+    asyncio.run(service.generate_course_content("Python", "beginner", 2))
+    assert app.state.stats["requests"] == 6
@@ -0,0 +1,35 @@
+import asyncio
+import json
+from structured_output import build_prompt, request_format, section_schema
+
+def test_section_schemas_are_derived_from_models():
+    schema = section_schema("modules")
+    lesson = schema["properties"]["modules"]["items"]["properties"]["lessons"]["items"]
+    assert {"title", "explanation", "content"} <= set(lesson["required"])
+    quiz = section_schema("quizzes")["properties"]["quizzes"]["items"]
+    assert quiz["properties"]["options"]["minItems"] == quiz["properties"]["options"]["maxItems"]
+    assert "$ref" not in json.dumps(schema) and "title" not in schema
+
+def test_prompt_and_format_per_mode():
+    assert request_format("tasks", "schema")["required"] == ["tasks"]
+    assert request_format("tasks", "json") == "json"
+    assert request_format("tasks", "prompt") == ""
+    assert "Add commas" in build_prompt("x", "prompt")
+    assert "Add commas" not in build_prompt("x", "schema")
+
+def test_falls_back_to_weaker_mode_when_format_is_rejected(tmp_path, replay_service):
+    path = tmp_path / "recordings.jsonl"
+    plan = {"practice_plan": ["Daily: Code", "Weekly: Project", "Monthly: Review"]}
+    path.write_text(json.dumps({"key": "k", "model": "mistral", "section": "practice_plan",
+                                "prompt": "p", "response": json.dumps(plan)}) + "\n")
+    service, _ = replay_service(path, formats="json")
+
+    result = asyncio.run(service.generate_content("practice plan", expect_json=True, section="practice_plan"))
+    assert result == plan
+    assert service.output_modes.mode_for(service.model) == "json"
+
+if __name__ == "__main__":
+    # The replay service comes from a conftest.py fixture, so these tests run under pytest
+    import sys
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
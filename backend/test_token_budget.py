@@ -0,0 +1,43 @@
+import asyncio
+import json
+from ollama_replay import prompt_key
+from token_budget import TokenBudgeter, is_truncated, section_units
+
+def test_budgets_scale_with_days_and_learn():
+    budgeter = TokenBudgeter(cap=10000, min_budget=200, headroom=1.5, priors={"modules": 1000, "tasks": 30})
+    assert budgeter.budget("modules", section_units("modules", 7)) > budgeter.budget("modules", 1)
+    assert budgeter.budget("modules", 30) == 10000  # capped
+    assert budgeter.budget("tasks", 1) == 200  # floor
+
+    for _ in range(50):
+        budgeter.observe("modules", 2, 2 * 400 + budgeter.overhead)
+    assert 390 < budgeter.tokens_per_unit["modules"] < 420
+
+    assert budgeter.grow("tasks", 300) == 600
+    assert budgeter.tokens_per_unit["tasks"] == 45
+
+def test_truncation_detection():
+    assert is_truncated({"done_reason": "length"}, None)
+    assert is_truncated({"eval_count": 256}, 256)
+    assert not is_truncated({"done_reason": "stop", "eval_count": 100}, 256)
+
+def test_truncated_json_is_retried_with_larger_budget(tmp_path, replay_service):
+    plan = {"practice_plan": ["Daily: Write code", "Weekly: Build a project", "Monthly: Review progress"]}
+    prompt = "practice plan"
+    path = tmp_path / "recordings.jsonl"
+    entry = {"key": prompt_key("mistral", prompt), "model": "mistral", "section": "practice_plan",
+             "prompt": prompt, "response": json.dumps(plan)}
+    path.write_text(json.dumps(entry) + "\n")
+
+    service, _ = replay_service(path)
+    service.budgeter = TokenBudgeter(cap=64, min_budget=4, headroom=1.0, priors={"practice_plan": 4}, overhead=0)
+
+    result = asyncio.run(service.generate_content(prompt, expect_json=True, max_retries=4, section="practice_plan"))
+    assert result == plan
+    assert service.budgeter.tokens_per_unit["practice_plan"] > 4
+
+if __name__ == "__main__":
+    # The replay service comes from a conftest.py fixture, so these tests run under pytest
+    import sys
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,45 @@
+import asyncio
+from tracing import Tracer, to_chrome_trace, render_waterfall
+
+def test_nested_spans_form_one_trace():
+    tracer = Tracer(capacity=2)
+
+    async def section(name):
+        with tracer.span("AIService.generate_content", section=name):
+            await asyncio.sleep(0)
+
+    async def request():
+        with tracer.span("generate_course_endpoint"):
+            await asyncio.gather(section("modules"), section("quizzes"))
+
+    for _ in range(3):
+        asyncio.run(request())
+
+    traces = tracer.recent()
+    assert len(traces) == 2  # ring buffer keeps only the newest traces
+    spans = traces[0].spans
+    root = next(span for span in spans if span.parent_id is None)
+    children = [span for span in spans if span.parent_id == root.span_id]
+    assert sorted(span.attributes["section"] for span in children) == ["modules", "quizzes"]
+
+def test_errors_and_exports():
+    tracer = Tracer()
+    try:
+        with tracer.span("generate_course"):
+            with tracer.span("parse_json_response"):
+                raise ValueError("bad json")
+    except ValueError:
+        pass
+
+    trace = tracer.recent()[0]
+    assert all(span.error == "ValueError: bad json" for span in trace.spans)
+
+    events = to_chrome_trace([trace])["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in complete} == {"generate_course", "parse_json_response"}
+    assert "parse_json_response" in render_waterfall(trace)
+
+if __name__ == "__main__":
+    test_nested_spans_form_one_trace()
+    test_errors_and_exports()
+    print("All tracing tests passed")
@@ -0,0 +1,83 @@
+import math
+from typing import Dict, Mapping, Optional
+from adaptive import ema
+from config import (
+    MAX_LESSONS_PER_MODULE,
+    MAX_QUIZZES,
+    TOKEN_BUDGET_CAP,
+    TOKEN_BUDGET_HEADROOM,
+    TOKEN_BUDGET_MIN,
+)
+from metrics import AI_TRUNCATIONS, TOKEN_BUDGET_PER_UNIT
+
+# Prior estimate of output tokens per unit of each section, before anything is measured.
+# A unit is one day of modules or outline, one daily task, one quiz, one lesson or one whole practice plan.
+DEFAULT_TOKENS_PER_UNIT = {
+    "modules": MAX_LESSONS_PER_MODULE * 220 + 30,
+    "tasks": 30,
+    "quizzes": 70,
+    "practice_plan": 120,
+    "outline": MAX_LESSONS_PER_MODULE * 15 + 20,
+    "lesson": 250,
+    "content": 400,
+}
+
+# Fixed allowance for JSON braces, keys and stray whitespace
+JSON_OVERHEAD_TOKENS = 64
+
+def section_units(section: str, days: int) -> int:
+    """Number of budget units a section needs for a course of ``days`` days."""
+    if section in ("modules", "outline", "tasks"):
+        return max(1, days)
+    if section == "quizzes":
+        return MAX_QUIZZES
+    return 1
+
+def is_truncated(response: Mapping, num_predict: Optional[int]) -> bool:
+    """Whether Ollama stopped because it hit the generation limit."""
+    if response.get("done_reason") == "length":
+        return True
+    eval_count = response.get("eval_count")
+    return bool(num_predict and eval_count and eval_count >= num_predict)
+
+class TokenBudgeter:
+    """Computes num_predict limits per section and learns them from measured output sizes."""
+
+    def __init__(
+        self,
+        cap: int = TOKEN_BUDGET_CAP,
+        min_budget: int = TOKEN_BUDGET_MIN,
+        headroom: float = TOKEN_BUDGET_HEADROOM,
+        priors: Optional[Dict[str, float]] = None,
+        overhead: int = JSON_OVERHEAD_TOKENS,
+    ):
+        self.cap = cap
+        self.min_budget = min_budget
+        self.headroom = headroom
+        self.overhead = overhead
+        self.tokens_per_unit: Dict[str, float] = dict(priors or DEFAULT_TOKENS_PER_UNIT)
+
+    def _per_unit(self, section: str) -> float:
+        return self.tokens_per_unit.get(section, self.tokens_per_unit.get("content", 400))
+
+    def budget(self, section: str, units: int = 1) -> int:
+        """Token limit for generating ``units`` units of ``section``."""
+        estimate = math.ceil(self._per_unit(section) * units * self.headroom) + self.overhead
+        return max(self.min_budget, min(self.cap, estimate))
+
+    def observe(self, section: str, units: int, eval_count: Optional[int]) -> None:
+        """Fold the size of a complete (non-truncated) generation into the estimate."""
+        if not eval_count or units <= 0:
+            return
+        measured = max(1.0, (eval_count - self.overhead) / units)
+        self.tokens_per_unit[section] = ema(self._per_unit(section), measured)
+        TOKEN_BUDGET_PER_UNIT.set(self.tokens_per_unit[section], section=section)
+
+    def grow(self, section: str, num_predict: int) -> int:
+        """Record a truncated generation and return the limit to retry with."""
+        AI_TRUNCATIONS.inc(section=section)
+        self.tokens_per_unit[section] = self._per_unit(section) * 1.5
+        TOKEN_BUDGET_PER_UNIT.set(self.tokens_per_unit[section], section=section)
+        return min(self.cap, max(num_predict * 2, self.min_budget))
+
+TOKEN_BUDGETER = TokenBudgeter()
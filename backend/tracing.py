@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+from config import TRACE_BUFFER_SIZE, TRACE_MAX_SPANS
+from log_pipeline import get_request_id, new_request_id
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "trace", "start", "duration", "attributes", "error")
+
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], trace: "Trace", attributes: Dict):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.trace = trace
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        """Attach extra attributes to the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Trace:
+    """All spans recorded for one request."""
+
+    __slots__ = ("trace_id", "start", "spans", "dropped", "_ids")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.start = time.time()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def duration(self) -> float:
+        return max((span.start + span.duration for span in self.spans), default=self.start) - self.start
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "start": self.start,
+            "duration": self.duration,
+            "dropped_spans": self.dropped,
+            "spans": [span.to_dict() for span in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class Tracer:
+    """Records spans and keeps the most recent traces in a ring buffer."""
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE, max_spans: int = TRACE_MAX_SPANS):
+        self.max_spans = max_spans
+        self._traces: deque = deque(maxlen=capacity)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Time the enclosed block as a span of the current trace.
+
+        Without an enclosing span a new trace is started, identified by the
+        current request id so traces can be matched with log records.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            trace = Trace(get_request_id() or new_request_id())
+            parent_id = None
+        else:
+            trace = parent.trace
+            parent_id = parent.span_id
+
+        span = Span(name, next(trace._ids), parent_id, trace, attributes)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            if len(trace.spans) < self.max_spans:
+                trace.spans.append(span)
+            else:
+                trace.dropped += 1
+            if parent is None:
+                self._traces.append(trace)
+
+    def recent(self, limit: int = 20) -> List[Trace]:
+        """Return the most recent traces, newest first."""
+        traces = list(self._traces)
+        traces.reverse()
+        return traces[:limit]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        for trace in reversed(self._traces):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+def to_chrome_trace(traces: List[Trace]) -> Dict:
+    """Export traces in the Chrome trace-event format (chrome://tracing, Perfetto)."""
+    events = []
+    for tid, trace in enumerate(traces, start=1):
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+            "args": {"name": f"trace {trace.trace_id}"},
+        })
+        for span in trace.spans:
+            args = dict(span.attributes)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": "course",
+                "ph": "X",
+                "pid": 1,
+                "tid": tid,
+                "ts": int(span.start * 1_000_000),
+                "dur": int(span.duration * 1_000_000),
+                "args": args,
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def render_waterfall(trace: Trace, width: int = 60) -> str:
+    """Render a trace as a plain-text waterfall, one span per line."""
+    total = trace.duration or 1e-9
+    depth: Dict[Optional[int], int] = {None: -1}
+    lines = [f"trace {trace.trace_id}  {trace.duration * 1000:.1f} ms  {len(trace.spans)} spans"]
+    for span in sorted(trace.spans, key=lambda s: s.start):
+        depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+        offset = int((span.start - trace.start) / total * width)
+        length = max(1, int(span.duration / total * width))
+        bar = " " * offset + "#" * min(length, width - offset if offset < width else 1)
+        label = "  " * depth[span.span_id] + span.name
+        attrs = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        flag = " !" if span.error else ""
+        lines.append(f"{label:<40.40} |{bar:<{width}}| {span.duration * 1000:9.1f} ms {attrs}{flag}")
+    return "\n".join(lines) + "\n"
+
+TRACER = Tracer()
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator that records each call of a sync or async function as a span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with TRACER.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator